@@ -2,7 +2,28 @@
 # exit on error
 set -o errexit
 
+TAILWIND_VERSION=v3.4.17
+FONTAWESOME_VERSION=6.4.0
+
 pip install -r requirements.txt
 
+# --- Static assets ---
+# Tailwind: compile only the classes used in templates/ (replaces the runtime CDN compiler)
+if [ ! -x bin/tailwindcss ]; then
+    mkdir -p bin
+    curl -sSLo bin/tailwindcss "https://github.com/tailwindlabs/tailwindcss/releases/download/${TAILWIND_VERSION}/tailwindcss-linux-x64"
+    chmod +x bin/tailwindcss
+fi
+bin/tailwindcss -c tailwind.config.js -i assets/tailwind.css -o static/css/app.css --minify
+
+# Font Awesome: subset the webfonts to the icons templates/ actually use
+if [ ! -d assets/vendor/fontawesome-free ]; then
+    mkdir -p assets/vendor/fontawesome-free
+    curl -sSL "https://registry.npmjs.org/@fortawesome/fontawesome-free/-/fontawesome-free-${FONTAWESOME_VERSION}.tgz" \
+        | tar xz -C assets/vendor/fontawesome-free --strip-components=1
+fi
+python manage.py build_icons
+
+# Hashed names + gzip/brotli copies, served by whitenoise
 python manage.py collectstatic --no-input
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
@@ -11,8 +11,12 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from importlib.util import find_spec
 import os
+import tempfile
 import dj_database_url
+import django
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,11 +28,14 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('SECRET_KEY', 'default-unsafe-key-for-dev')
 
+# DJANGO_ENV=production switches on the production profile (cached templates,
+# cache-backed sessions, secure cookies). It is the default on Render.
+PRODUCTION = os.environ.get('DJANGO_ENV', 'production' if 'RENDER' in os.environ else 'development') == 'production'
+
 # SECURITY WARNING: don't run with debug turned on in production!
-# DEBUG = 'RENDER' not in os.environ
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '0' if PRODUCTION else '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [h for h in os.environ.get('ALLOWED_HOSTS', '').split(',') if h]
 RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
 if RENDER_EXTERNAL_HOSTNAME:
     ALLOWED_HOSTS.append(RENDER_EXTERNAL_HOSTNAME)
@@ -50,10 +57,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CampusMiddleware',
+    'core.middleware.UploadLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,24 +81,120 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.assets',
+                'core.context_processors.upload_limits',
             ],
         },
     },
 ]
 
+if PRODUCTION:
+    # Parse each template once per process instead of on every render
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
+# Cache & sessions
+# REDIS_URL shares the cache between workers; otherwise each process keeps
+# its own in-memory cache. Sessions are read from the cache and only fall
+# back to the database on a miss.
+#
+# Set REDIS_URL whenever more than one process serves the site (gunicorn
+# with several workers, or the outbox dispatcher next to the web process).
+# These rely on every process seeing the same cache:
+# - live dashboard updates (core/live.py): the dispatcher bumps, web workers read;
+# - the throttle scopes (core/throttling.py): with a per-process cache each
+#   limit is multiplied by the number of workers;
+# - the /metrics totals (core/metrics.py) and the typeahead invalidation
+#   (core/suggest.py).
+# The Redis backend needs the `redis` client from requirements.txt.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.metrics.RedisCache',  # counts hits and misses for /metrics
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.metrics.LocMemCache',
+        }
+    }
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+if PRODUCTION:
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+    SESSION_COOKIE_SECURE = True
+    CSRF_COOKIE_SECURE = True
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Each gunicorn thread keeps its connection for DB_CONN_MAX_AGE seconds;
+# health checks replace connections that died (e.g. Postgres restarted)
+# instead of failing the request that picks them up.
+#
+# DB_POOL=1 switches to a psycopg 3 connection pool per worker process
+# (needs Django 5.1+ and `psycopg[pool]`), sized by DB_POOL_MIN_SIZE and
+# DB_POOL_MAX_SIZE (default: one connection per gunicorn thread).
+# DB_PGBOUNCER=1 is for running behind deploy/pgbouncer.ini in transaction mode.
+
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///db.sqlite3',
-        conn_max_age=600
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        conn_health_checks=True,
+        disable_server_side_cursors=os.environ.get('DB_PGBOUNCER') == '1',
     )
 }
 
+# Optional read replica for public pages, staff listings and reports
+# (see core/routers.py). For a local test, point it at a second SQLite file
+# and run `migrate --database replica`.
+if os.environ.get('REPLICA_DATABASE_URL'):
+    DATABASES['replica'] = dj_database_url.parse(
+        os.environ['REPLICA_DATABASE_URL'],
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        conn_health_checks=True,
+        disable_server_side_cursors=os.environ.get('DB_PGBOUNCER') == '1',
+        test_options={'MIRROR': 'default'},
+    )
+
+# SQLite (local dev): take the write lock when a transaction starts. With
+# the default deferred mode, two threads that both read and then write (see
+# core/transitions.py) fail with "database is locked" instead of waiting.
+# The option only exists from Django 5.1 (requirements.txt still pins 4.2).
+for _db in DATABASES.values():
+    if _db['ENGINE'] == 'django.db.backends.sqlite3' and django.VERSION >= (5, 1):
+        _db.setdefault('OPTIONS', {}).setdefault('transaction_mode', 'IMMEDIATE')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# How long a browser reads from the primary after it POSTs something
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and os.environ.get('DB_POOL') == '1':
+    # Older Django ignores the option and psycopg2 has no pool: fail now, not on the first query
+    if django.VERSION < (5, 1) or not find_spec('psycopg_pool'):
+        raise ImproperlyConfigured("DB_POOL=1 needs Django 5.1+ and psycopg 3 with the pool extra (psycopg[pool]).")
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # the pool owns connection lifetime
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', os.environ.get('GUNICORN_THREADS', 4))),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -108,6 +215,20 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# PASSWORD_HASHER picks the algorithm for new passwords. The rest stay listed
+# so existing hashes still verify and get upgraded on the next login.
+# argon2 needs `argon2-cffi` and bcrypt needs `bcrypt` installed.
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+}
+_preferred_hasher = _PASSWORD_HASHERS[os.environ.get('PASSWORD_HASHER', 'pbkdf2')]
+PASSWORD_HASHERS = [_preferred_hasher] + [h for h in _PASSWORD_HASHERS.values() if h != _preferred_hasher]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -133,9 +254,21 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
-# Keep the storage engine inside the check (optional, but good practice)
-if not DEBUG:
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Hashed file names plus gzip/brotli copies, built by collectstatic. In DEBUG
+# Django serves the unhashed names, so this is safe to leave on everywhere.
+# Whitenoise sends far-future immutable cache headers for the hashed files.
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.media.MediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# CSS compiled by build.sh (Tailwind + Font Awesome subset). Local checkouts
+# that haven't run it fall back to the CDN builds in DEBUG.
+USE_CDN_ASSETS = DEBUG and not os.path.exists(os.path.join(BASE_DIR, 'static', 'css', 'app.css'))
 
 # Redirects after login/logout
 LOGIN_REDIRECT_URL = 'home'
@@ -152,6 +285,154 @@ AUTH_USER_MODEL = 'core.CustomUser'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media delivery (see core/media.py). Found-item photos are public and cached
+# forever; lost-ticket photos and claim evidence need a signed URL.
+MEDIA_PUBLIC_PREFIXES = ['found_items/']
+MEDIA_SIGNED_URL_TTL = int(os.environ.get('MEDIA_SIGNED_URL_TTL', 300))
+# Let the web server send the bytes. For nginx, point an `internal` location
+# at MEDIA_ROOT and set e.g. MEDIA_ACCEL_REDIRECT_PREFIX=/protected-media/
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '')
+MEDIA_SENDFILE_HEADER = os.environ.get('MEDIA_SENDFILE_HEADER', '')  # e.g. X-Sendfile
+
+# MEDIA_STORAGE=s3 keeps uploads in an S3-compatible bucket instead (needs
+# django-storages and boto3). For local testing, MinIO works as the endpoint:
+#   MEDIA_S3_ENDPOINT_URL=http://127.0.0.1:9000 MEDIA_BUCKET=findmyitem
+# with AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY set. Every URL is presigned.
+if os.environ.get('MEDIA_STORAGE') == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ['MEDIA_BUCKET'],
+            'endpoint_url': os.environ.get('MEDIA_S3_ENDPOINT_URL'),
+            'file_overwrite': False,
+            'querystring_auth': True,
+            'querystring_expire': MEDIA_SIGNED_URL_TTL,
+            'object_parameters': {'CacheControl': 'private, max-age=%d' % MEDIA_SIGNED_URL_TTL},
+        },
+    }
+
+# Uploads (core/uploads.py). Files over FILE_UPLOAD_MAX_MEMORY_SIZE stream to
+# a temp file instead of memory, nothing over UPLOAD_MAX_BYTES is kept, and
+# photos are checked against PHOTO_MAX_PIXELS from their header, then stored
+# at most PHOTO_MAX_EDGE px wide/high.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.CappedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+PHOTO_MAX_PIXELS = int(os.environ.get('PHOTO_MAX_PIXELS', 40_000_000))
+PHOTO_MAX_EDGE = int(os.environ.get('PHOTO_MAX_EDGE', 2048))
+# Resumable uploads from the browser: chunk size, where the pieces are
+# assembled (must be shared by all web processes on a host) and how long
+# unused ones are kept before `manage.py purge_uploads` removes them
+UPLOAD_CHUNK_BYTES = 512 * 1024
+UPLOAD_STAGING_DIR = os.environ.get('UPLOAD_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'findmyitem-uploads'))
+UPLOAD_STAGING_HOURS = int(os.environ.get('UPLOAD_STAGING_HOURS', 24))
+
+# Server-side folder the staff import page reads item photos from
+IMPORT_IMAGE_DIR = os.environ.get('IMPORT_IMAGE_DIR')
+
+# Campuses served by this deployment live in the Campus table (core/tenancy.py).
+# Visitors who come in on no campus hostname and haven't picked one get this one.
+DEFAULT_CAMPUS = os.environ.get('DEFAULT_CAMPUS', 'main')
+# Let staff search other campuses' inventory from the match tool
+CROSS_CAMPUS_MATCHING = os.environ.get('CROSS_CAMPUS_MATCHING', '0') == '1'
+
+# Token-bucket limits for the public endpoints (core/throttling.py), as
+# "<requests>/<s|m|h|d>". A scope missing here isn't throttled.
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', '1') == '1'
+THROTTLE_RATES = {
+    'hand_in': os.environ.get('THROTTLE_HAND_IN', '10/h'),
+    'search': os.environ.get('THROTTLE_SEARCH', '30/m'),
+    # Typeahead fires on every keystroke pause, so it gets a much bigger bucket
+    'suggest': os.environ.get('THROTTLE_SUGGEST', '120/m'),
+    # One request per 512 KB chunk of a photo upload
+    'upload': os.environ.get('THROTTLE_UPLOAD', '300/m'),
+    # Desk kiosk batches (core/kiosk.py), per staff account
+    'kiosk_sync': os.environ.get('THROTTLE_KIOSK_SYNC', '30/m'),
+}
+# Reverse proxies in front of gunicorn whose X-Forwarded-For we trust
+# (1 on Render/behind nginx; 0 means use REMOTE_ADDR)
+THROTTLE_PROXY_COUNT = int(os.environ.get('THROTTLE_PROXY_COUNT', 1 if PRODUCTION else 0))
+
+# Finished records older than this many days move to the archive
+# (core/archive.py, run by `manage.py archive_records`). Keep these well above
+# the refresh_rollups window.
+ARCHIVE_AFTER_DAYS = {
+    'LOST_TICKET': int(os.environ.get('ARCHIVE_TICKETS_AFTER_DAYS', 365)),
+    'FOUND_ITEM': int(os.environ.get('ARCHIVE_ITEMS_AFTER_DAYS', 365)),
+    'HAND_IN': int(os.environ.get('ARCHIVE_HAND_INS_AFTER_DAYS', 365)),
+}
+
+# Unclaimed items are donated/disposed after this many days from date_found
+# (core/disposal.py, run daily by `manage.py dispose_unclaimed`). Owners of
+# matched tickets are warned DISPOSAL_NOTICE_DAYS before.
+DISPOSAL_RETENTION_DAYS = {
+    'default': int(os.environ.get('DISPOSAL_RETENTION_DAYS', 180)),
+    'IDS': 365,          # school IDs and cards are usually reissued, but keep them longest
+    'ELECTRONICS': 365,
+    'CLOTHING': 90,
+    'TUMBLERS': 60,
+}
+DISPOSAL_NOTICE_DAYS = int(os.environ.get('DISPOSAL_NOTICE_DAYS', 14))
+
+# Audit entries, duplicate/photo indexing and dashboard notifications run from
+# the outbox (core/outbox.py), drained by `manage.py dispatch_events`: the
+# `worker` process in the Procfile, which production must run next to the
+# web process. With OUTBOX_EAGER the web process also drains right after each
+# commit, so development works without a dispatcher running.
+OUTBOX_EAGER = os.environ.get('OUTBOX_EAGER', '1' if DEBUG else '0') == '1'
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', 60))  # longer than a batch takes
+OUTBOX_RETRY_SECONDS = 5  # first retry of a failed handler; doubles every attempt
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_LAG_WARNING = int(os.environ.get('OUTBOX_LAG_WARNING', 60))  # seconds behind before the dispatcher warns
+OUTBOX_KEEP_DAYS = int(os.environ.get('OUTBOX_KEEP_DAYS', 7))
+
+# How long a list page's detail modal stays cached (core/views.py detail_fragment).
+# The key includes the object's updated_at, so edits show up at once anyway.
+FRAGMENT_CACHE_SECONDS = int(os.environ.get('FRAGMENT_CACHE_SECONDS', 24 * 3600))
+
+# Most hand-ins the desk kiosk may send in one sync request
+KIOSK_SYNC_MAX_BATCH = int(os.environ.get('KIOSK_SYNC_MAX_BATCH', 100))
+
+# Student dashboard live updates (core/live.py). The dispatcher bumps the
+# versions, so web workers only see them through a shared cache: off by
+# default without REDIS_URL, except in development where the outbox drains
+# in the web process (OUTBOX_EAGER).
+LIVE_UPDATES = os.environ.get('LIVE_UPDATES', '1' if os.environ.get('REDIS_URL') or DEBUG else '0') == '1'
+LIVE_POLL_SECONDS = int(os.environ.get('LIVE_POLL_SECONDS', 15))
+
+# Prometheus metrics (core/metrics.py). Scrapers send "Authorization: Bearer <METRICS_TOKEN>";
+# without a token only logged-in staff can read /metrics.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_FLUSH_SECONDS = int(os.environ.get('METRICS_FLUSH_SECONDS', 10))  # how stale one worker's numbers may be
+METRICS_WORKER_TTL = 300  # a worker that hasn't flushed for this long is dropped from the totals
+METRICS_SLOW_REQUEST_SECONDS = float(os.environ.get('METRICS_SLOW_REQUEST_SECONDS', 1.0))
+
+# Logs are written by a background thread (core/logs.py) so a slow stderr never
+# stalls a worker; JSON lines in production for the log shipper.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_JSON = os.environ.get('LOG_JSON', '1' if PRODUCTION else '0') == '1'
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'core.logs.JsonFormatter'},
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'queue': {'class': 'core.logs.QueuedHandler', 'formatter': 'json' if LOG_JSON else 'plain'},
+    },
+    'root': {'handlers': ['queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        # Instead of Django's own console handler, which would print everything twice
+        'django': {'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
 # Use the standard SMTP backend to send real emails
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
@@ -15,9 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.media import serve_media
 
 # Import built-in auth views for login/logout
 from django.contrib.auth import views as auth_views
@@ -36,6 +37,9 @@ urlpatterns = [
     path('reset/done/', auth_views.PasswordResetCompleteView.as_view(template_name='registration/password_reset_complete.html'), name='password_reset_complete'),
 ]
 
-# Serve images in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Uploaded images: public ones directly, private ones via signed URLs.
+# With MEDIA_STORAGE=s3 the bucket serves them instead.
+if settings.STORAGES['default']['BACKEND'] == 'core.media.MediaStorage':
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
+    ]
\ No newline at end of file
@@ -1,43 +1,190 @@
+"""
+Admin registrations.
+
+The core tables get large (AuditLog above all), so the changelists here avoid
+what makes the stock admin slow on them:
+- no exact COUNT(*) over big results: on Postgres the paginator takes the
+  planner's row estimate once it is above ESTIMATE_COUNTS_ABOVE, and the
+  unfiltered "(N total)" count is switched off;
+- FKs shown in the list are fetched with list_select_related, not per row;
+- user and item FKs use autocomplete widgets instead of <select>s with every row;
+- date_hierarchy drilldowns use a plain index on their date column;
+- filters on free-text columns offer fixed choices instead of SELECT DISTINCT.
+"""
+import json
+
 from django.contrib import admin
-from .models import CustomUser, HandInReport, FoundItem, LostItemTicket, ClaimRequest, AuditLog
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
+
+from .models import CustomUser, HandInReport, FoundItem, LostItemTicket, ClaimRequest, AuditLog, ArchivedRecord, Campus, OutboxEvent
+from . import audit, outbox
+
+ESTIMATE_COUNTS_ABOVE = 10000
+
+
+def estimated_count(queryset):
+    """The planner's row estimate for `queryset` on Postgres, else None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Exact counts for small results, the planner's estimate for big ones."""
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list) if hasattr(self.object_list, 'query') else None
+        if estimate is not None and estimate > ESTIMATE_COUNTS_ABOVE:
+            return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)  # what the changelist does anyway; autocomplete pages need it too
+
+
+class ChoicesFilter(admin.SimpleListFilter):
+    """Filter a CharField without choices on a fixed list instead of SELECT DISTINCT over the table."""
+    choices_list = []
+
+    def lookups(self, request, model_admin):
+        return [(value, value) for value in self.choices_list]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class ActionFilter(ChoicesFilter):
+    title = 'action'
+    parameter_name = 'action'
+    choices_list = audit.ACTIONS
+
+
+class TargetModelFilter(ChoicesFilter):
+    title = 'target model'
+    parameter_name = 'target_model'
+    choices_list = sorted(audit.TARGET_MODELS.values())
+
 
 # 1. User Admin
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(LargeTableAdmin):
+    ordering = ('username',)
     list_display = ('username', 'role', 'student_id', 'program_year', 'email')
-    list_filter = ('role', 'program_year')
+    list_filter = ('campus', 'role', 'program_year')
     search_fields = ('username', 'student_id', 'first_name', 'last_name')
 
 # 2. Hand In Reports
 @admin.register(HandInReport)
-class HandInReportAdmin(admin.ModelAdmin):
+class HandInReportAdmin(LargeTableAdmin):
     list_display = ('item_name', 'reference_code', 'category', 'date_reported', 'is_received')
-    list_filter = ('is_received', 'category', 'date_reported')
+    list_filter = ('campus', 'is_received', 'category')
     search_fields = ('reference_code', 'item_name', 'finder_name')
+    date_hierarchy = 'date_reported'
 
 # 3. Found Items
+class DeletedFilter(admin.SimpleListFilter):
+    title = 'deleted'
+    parameter_name = 'deleted'
+
+    def lookups(self, request, model_admin):
+        return [('no', 'No'), ('yes', 'Yes')]
+
+    def queryset(self, request, queryset):
+        if self.value() in ('yes', 'no'):
+            return queryset.filter(deleted_at__isnull=self.value() == 'no')
+        return queryset
+
+
 @admin.register(FoundItem)
-class FoundItemAdmin(admin.ModelAdmin):
-    list_display = ('item_name', 'category', 'current_status', 'location_found', 'date_found')
-    list_filter = ('current_status', 'category', 'date_found')
+class FoundItemAdmin(LargeTableAdmin):
+    list_display = ('item_name', 'category', 'current_status', 'location_found', 'date_found', 'deleted_at')
+    list_filter = ('campus', 'current_status', DeletedFilter, 'category')
     search_fields = ('item_name', 'description', 'location_found')
+    date_hierarchy = 'date_found'
+    autocomplete_fields = ('registered_by', 'hand_in_ref')
+    actions = ['restore']
+
+    def get_queryset(self, request):
+        # The default manager hides soft-deleted items; the admin is where they get restored
+        return FoundItem.all_objects.get_queryset()
+
+    @admin.action(description="Restore selected deleted items")
+    def restore(self, request, queryset):
+        restored = 0
+        for item in queryset.filter(deleted_at__isnull=False):
+            item.deleted_at = None
+            with transaction.atomic():  # post_save: the audit entry's event commits with the row
+                item.save(update_fields=['deleted_at', 'updated_at'])
+            restored += 1
+        self.message_user(request, f"Restored {restored} items.")
 
 # 4. Lost Tickets
 @admin.register(LostItemTicket)
-class LostItemTicketAdmin(admin.ModelAdmin):
+class LostItemTicketAdmin(LargeTableAdmin):
     list_display = ('item_name', 'owner', 'status', 'date_lost')
-    list_filter = ('status', 'category')
+    list_filter = ('campus', 'status', 'category')
+    list_select_related = ('owner',)
     search_fields = ('item_name', 'owner__username', 'description')
+    date_hierarchy = 'date_submitted'
+    autocomplete_fields = ('owner', 'matched_item')
 
 # 5. Claims
 @admin.register(ClaimRequest)
-class ClaimRequestAdmin(admin.ModelAdmin):
+class ClaimRequestAdmin(LargeTableAdmin):
     list_display = ('found_item', 'claimant', 'status', 'request_date')
     list_filter = ('status',)
+    list_select_related = ('found_item', 'claimant')
+    date_hierarchy = 'request_date'
+    autocomplete_fields = ('ticket', 'found_item', 'claimant', 'reviewed_by')
 
 # 6. Audit Logs (Read Only is best for logs)
 @admin.register(AuditLog)
-class AuditLogAdmin(admin.ModelAdmin):
+class AuditLogAdmin(LargeTableAdmin):
     list_display = ('actor', 'action', 'target_model', 'timestamp')
-    list_filter = ('action', 'target_model')
-    readonly_fields = ('actor', 'action', 'ip_address', 'timestamp', 'target_model', 'target_object_id', 'changes')
\ No newline at end of file
+    list_filter = (ActionFilter, TargetModelFilter)
+    list_select_related = ('actor',)
+    date_hierarchy = 'timestamp'
+    readonly_fields = ('actor', 'action', 'ip_address', 'timestamp', 'target_model', 'target_object_id', 'changes')
+
+# 7. Archive (written only by archive_records)
+@admin.register(ArchivedRecord)
+class ArchivedRecordAdmin(LargeTableAdmin):
+    list_display = ('title', 'kind', 'reference', 'status', 'happened_at', 'archived_at')
+    list_filter = ('kind', 'category')
+    search_fields = ('title', 'reference', 'location')
+    readonly_fields = ('kind', 'object_id', 'title', 'reference', 'category', 'location', 'status', 'happened_at', 'archived_at', 'data')
+
+# 8. Campuses
+@admin.register(Campus)
+class CampusAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'hostname')
+    search_fields = ('name', 'code', 'hostname')
+
+# 9. Outbox (delivered by dispatch_events)
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(LargeTableAdmin):
+    list_display = ('event_type', 'created_at', 'attempts', 'dispatched_at', 'last_error')
+    list_filter = ('event_type', ('dispatched_at', admin.EmptyFieldListFilter))
+    search_fields = ('idempotency_key',)
+    readonly_fields = ('event_type', 'payload', 'idempotency_key', 'created_at', 'available_at',
+                       'attempts', 'handled', 'last_error', 'dispatched_at')
+    actions = ['retry_events']
+
+    @admin.action(description="Retry selected undelivered events")
+    def retry_events(self, request, queryset):
+        self.message_user(request, f"{outbox.retry(queryset)} events queued again.")
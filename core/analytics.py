@@ -0,0 +1,160 @@
+"""
+Recovery-rate and turnaround analytics.
+
+`refresh()` rebuilds DailyRollup rows for a window of days from the base
+tables, using GROUP BYs limited to that window. The `refresh_rollups` command
+runs it from cron, typically hourly over the last couple of days plus a
+one-off `--full` backfill. The reports page only reads the rollups, so its cost
+doesn't grow with the size of the inventory.
+
+Rollups are per campus, and DailyRollup's manager scopes the report like the
+other campus models. They count every item enrolled on a day, soft-deleted
+ones included (all_objects), so deleting an item doesn't rewrite the past.
+"""
+import datetime
+import string
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    DailyRollup, FoundItem, HandInReport, LostItemTicket, ClaimRequest, ItemCategory
+)
+
+Metric = DailyRollup.Metric
+
+
+def normalize_location(value):
+    """'  library 2nd FLOOR ' and 'Library 2nd Floor' are the same hotspot."""
+    return string.capwords(value or '')[:100] or 'Unknown'
+
+
+def _count_rows(queryset, date_field, location_field, start, end):
+    return (
+        queryset.filter(**{f'{date_field}__date__range': (start, end)})
+        .annotate(day=TruncDate(date_field))
+        .values('day', 'campus', 'category', location_field)
+        .annotate(n=Count('id'))
+        .values_list('day', 'campus', 'category', location_field, 'n')
+    )
+
+
+def refresh(start, end):
+    """Recompute every rollup for days start..end (inclusive), every campus."""
+    counts = defaultdict(int)
+    turnaround = defaultdict(Counter)
+
+    # _base_manager: no campus scoping, and soft-deleted items still happened
+    sources = [
+        (Metric.FOUND, FoundItem._base_manager.all(), 'date_enrolled', 'location_found'),
+        (Metric.HAND_IN, HandInReport._base_manager.all(), 'date_reported', 'location_found'),
+        (Metric.TICKET_OPENED, LostItemTicket._base_manager.all(), 'date_submitted', 'location_lost'),
+    ]
+    for metric, queryset, date_field, location_field in sources:
+        for day, campus, category, location, n in _count_rows(queryset, date_field, location_field, start, end):
+            counts[(day, campus, metric, category, normalize_location(location))] += n
+
+    approved = ClaimRequest._base_manager.filter(
+        status__in=[ClaimRequest.Status.APPROVED, ClaimRequest.Status.COMPLETED],
+        reviewed_at__date__range=(start, end),
+    ).annotate(day=TruncDate('reviewed_at')).values_list(
+        'day', 'found_item__campus', 'found_item__category', 'found_item__location_found', 'reviewed_at',
+        'found_item__date_enrolled',
+    )
+    for day, campus, category, location, reviewed_at, enrolled in approved:
+        key = (day, campus, Metric.CLAIMED, category, normalize_location(location))
+        counts[key] += 1
+        turnaround[key][str(max((reviewed_at - enrolled).days, 0))] += 1
+
+    rollups = []
+    for key, n in counts.items():
+        day, campus, metric, category, location = key
+        rollups.append(DailyRollup(day=day, campus_id=campus, metric=metric, category=category, location=location,
+                                   count=n, turnaround_days=dict(turnaround.get(key, {}))))
+    with transaction.atomic():
+        DailyRollup._base_manager.filter(day__range=(start, end)).delete()
+        DailyRollup._base_manager.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def earliest_activity():
+    dates = [
+        FoundItem._base_manager.aggregate(d=Min('date_enrolled'))['d'],
+        HandInReport._base_manager.aggregate(d=Min('date_reported'))['d'],
+        LostItemTicket._base_manager.aggregate(d=Min('date_submitted'))['d'],
+    ]
+    dates = [timezone.localdate(d) for d in dates if d]
+    return min(dates) if dates else None
+
+
+# --- Reading -----------------------------------------------------------------
+
+def _median(histogram):
+    total = sum(histogram.values())
+    if not total:
+        return None
+    seen = 0
+    for days in sorted(histogram, key=int):
+        seen += histogram[days]
+        if seen * 2 >= total:
+            return int(days)
+
+
+def report(since):
+    rollups = DailyRollup.objects.filter(day__gte=since)
+
+    totals = defaultdict(lambda: defaultdict(int))
+    for metric, category, total in rollups.values('metric', 'category').annotate(total=Sum('count')).values_list('metric', 'category', 'total'):
+        totals[category][metric] = total
+
+    histograms = defaultdict(Counter)
+    for category, histogram in rollups.filter(metric=Metric.CLAIMED).values_list('category', 'turnaround_days'):
+        histograms[category].update(histogram)
+    overall_histogram = sum(histograms.values(), Counter())
+
+    by_category = []
+    for value, label in ItemCategory.choices:
+        found, claimed = totals[value][Metric.FOUND], totals[value][Metric.CLAIMED]
+        by_category.append({
+            'category': label,
+            'found': found,
+            'claimed': claimed,
+            'tickets': totals[value][Metric.TICKET_OPENED],
+            'recovery_rate': round(claimed * 100 / found, 1) if found else None,
+            'median_days': _median(histograms[value]),
+        })
+
+    hotspots = (
+        rollups.filter(metric=Metric.FOUND).values('location')
+        .annotate(total=Sum('count')).order_by('-total')[:10]
+    )
+
+    monthly = defaultdict(lambda: defaultdict(int))
+    for month, metric, total in (
+        rollups.annotate(month=TruncMonth('day')).values('month', 'metric')
+        .annotate(total=Sum('count')).values_list('month', 'metric', 'total')
+    ):
+        monthly[month][metric] = total
+
+    found_total = sum(row['found'] for row in by_category)
+    claimed_total = sum(row['claimed'] for row in by_category)
+    return {
+        'by_category': by_category,
+        'hotspots': list(hotspots),
+        'monthly': [
+            {'month': month, 'found': m[Metric.FOUND], 'claimed': m[Metric.CLAIMED],
+             'tickets': m[Metric.TICKET_OPENED], 'hand_ins': m[Metric.HAND_IN]}
+            for month, m in sorted(monthly.items())
+        ],
+        'recovery_rate': round(claimed_total * 100 / found_total, 1) if found_total else None,
+        'median_days': _median(overall_histogram),
+        'latest_day': DailyRollup.objects.order_by('-day').values_list('day', flat=True).first(),
+    }
+
+
+def default_window_start(days=365):
+    # In TIME_ZONE, like the days TruncDate groups by; the server's own date may differ
+    return timezone.localdate() - datetime.timedelta(days=days)
@@ -5,4 +5,6 @@ class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self):
-        import core.signals # <--- Add this line
\ No newline at end of file
+        import core.signals # <--- Add this line
+        import core.events  # outbox handlers
+        import core.checks
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Archival of finished records.
+
+Closed tickets, claimed/donated/deleted items and received hand-ins stop
+mattering after a while, but they used to stay in the live tables forever.
+Every list, search and count paid for them. archive_records (cron, e.g.
+nightly) moves those finished more than settings.ARCHIVE_AFTER_DAYS ago into
+ArchivedRecord, in small batches, each in its own transaction. Each record
+keeps the row as JSON plus its claims. The staff Archive page searches them.
+
+Age counts from the last change (updated_at), not from when the record was
+created: an item enrolled a year ago and claimed yesterday is not old.
+
+Order matters, because deleting a row cascades to its claims:
+- Items go first, with their claims copied into the item's record. An item
+  with a pending claim stays. So does one with an approved claim awaiting
+  pickup, until staff mark it picked up (COMPLETED) or the approval itself
+  is older than the cutoff: nobody came, or the pickup was never recorded.
+- Then tickets, but only those with no claims left. A claim always points
+  at a live item, so archiving its ticket would delete it from under that
+  item; the ticket waits until the item has been archived.
+- Hand-ins only go once their inventory item is gone, so a live item never
+  loses its hand_in_ref.
+
+Rollups for archived days are left alone; see frozen_before().
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import ArchivedRecord, ClaimRequest, FoundItem, HandInReport, LostItemTicket
+
+Kind = ArchivedRecord.Kind
+
+
+def _row(instance):
+    data = serializers.serialize('python', [instance])[0]['fields']
+    data['id'] = instance.pk
+    return data
+
+
+def _claims(claims):
+    return [_row(claim) for claim in claims]
+
+
+def _eligible(kind, cutoff):
+    """Live rows of `kind` that are finished and haven't changed since `cutoff`."""
+    if kind == Kind.LOST_TICKET:
+        return LostItemTicket.objects.filter(
+            status=LostItemTicket.Status.CLOSED, updated_at__lt=cutoff, claimrequest__isnull=True,
+        )
+    if kind == Kind.FOUND_ITEM:
+        open_tickets = [s for s in LostItemTicket.Status.values if s != LostItemTicket.Status.CLOSED]
+        return (
+            FoundItem.all_objects.filter(
+                Q(current_status__in=[FoundItem.Status.CLAIMED, FoundItem.Status.DONATED]) | Q(deleted_at__isnull=False),
+                updated_at__lt=cutoff,
+            )
+            .exclude(matched_tickets__status__in=open_tickets)
+            .exclude(claims__status=ClaimRequest.Status.PENDING)
+            # A subquery, so both conditions hold for the same claim
+            .exclude(pk__in=ClaimRequest._base_manager.filter(
+                status=ClaimRequest.Status.APPROVED, updated_at__gte=cutoff,
+            ).values('found_item_id'))
+        )
+    return HandInReport.objects.filter(is_received=True, updated_at__lt=cutoff, founditem__isnull=True)
+
+
+def _record(kind, obj):
+    if kind == Kind.LOST_TICKET:
+        return ArchivedRecord(
+            kind=kind, object_id=obj.pk, title=obj.item_name, category=obj.category,
+            location=obj.location_lost, status=obj.status, happened_at=obj.date_submitted,
+            data={**_row(obj), 'claims': _claims(obj.claimrequest_set.all())},
+        )
+    if kind == Kind.FOUND_ITEM:
+        return ArchivedRecord(
+            kind=kind, object_id=obj.pk, title=obj.item_name, category=obj.category,
+            reference=obj.hand_in_ref.reference_code if obj.hand_in_ref else '',
+            location=obj.location_found,
+            status='DELETED' if obj.deleted_at else obj.current_status, happened_at=obj.date_enrolled,
+            data={**_row(obj), 'claims': _claims(obj.claims.all())},
+        )
+    return ArchivedRecord(
+        kind=kind, object_id=obj.pk, title=obj.item_name, category=obj.category,
+        reference=obj.reference_code, location=obj.location_found, status='RECEIVED',
+        happened_at=obj.date_reported, data=_row(obj),
+    )
+
+
+def archive_batch(kind, cutoff, batch_size):
+    """Move up to batch_size rows; returns how many were moved (0 when done)."""
+    with transaction.atomic():
+        queryset = _eligible(kind, cutoff)
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True).distinct()[:batch_size])
+        if not ids:
+            return 0
+        rows = queryset.model._base_manager.filter(pk__in=ids)
+        if kind == Kind.LOST_TICKET:
+            rows = rows.prefetch_related('claimrequest_set')
+        elif kind == Kind.FOUND_ITEM:
+            rows = rows.select_related('hand_in_ref').prefetch_related('claims')
+        ArchivedRecord.objects.bulk_create([_record(kind, obj) for obj in rows], ignore_conflicts=True)
+        queryset.model._base_manager.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def cutoffs(now=None):
+    now = now or timezone.now()
+    return {
+        Kind(kind): now - datetime.timedelta(days=days)
+        for kind, days in settings.ARCHIVE_AFTER_DAYS.items()
+    }
+
+
+def pending(now=None):
+    """How many rows each kind would move right now."""
+    return {kind: _eligible(kind, cutoff).distinct().count() for kind, cutoff in cutoffs(now).items()}
+
+
+def run(batch_size=500, pause=0, log=None):
+    """Archive everything that is due, batch by batch. Returns {kind: moved}."""
+    moved = {}
+    for kind in (Kind.FOUND_ITEM, Kind.LOST_TICKET, Kind.HAND_IN):
+        cutoff = cutoffs().get(kind)
+        if cutoff is None:
+            continue
+        moved[kind] = 0
+        while True:
+            n = archive_batch(kind, cutoff, batch_size)
+            if not n:
+                break
+            moved[kind] += n
+            if log:
+                log(f"{kind.label}: {moved[kind]} archived")
+            if pause:
+                time.sleep(pause)  # let the live traffic through between batches
+    return moved
+
+
+def frozen_before():
+    """Days up to this date have rows in the archive, so their rollups must not be rebuilt."""
+    latest = ArchivedRecord.objects.aggregate(d=Max('happened_at'))['d']
+    return latest.date() + datetime.timedelta(days=1) if latest else None
@@ -0,0 +1,159 @@
+"""
+Queries over the audit trail.
+
+AuditLog rows point at their subject with (target_model, target_object_id).
+`changes` holds either a full snapshot (FoundItem saves) or a few fields
+(claims, ticket matches, bulk jobs). This module answers two questions:
+
+- search(): the Audit Trail page. It filters on actor, action, target and
+  values inside `changes`, and pages by (timestamp, id) instead of cutting
+  at 100 rows. Not by id alone: the outbox dispatcher writes entries late,
+  stamped with when the change happened, so ids aren't in timestamp order.
+- timeline(): everything that happened to one object, oldest first. Each
+  entry is diffed against the previous state of the same target, so a
+  snapshot only shows the fields that actually changed.
+
+Per-object lookups use audit_target_idx. Value searches use jsonb
+containment (`changes @> {...}`) on Postgres, which audit_changes_gin
+serves. Other backends compare JSON keys one by one and scan instead.
+"""
+import datetime
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import AuditLog, ClaimRequest, FoundItem
+
+PAGE_SIZE = 100
+
+ACTIONS = [
+    'CREATED_ITEM', 'UPDATED_ITEM', 'CLAIM_APPROVED', 'CLAIM_REJECTED', 'CLAIM_PENDING',
+    'MATCH_LINKED', 'BULK_IMPORT', 'IMPORT_FINISHED', 'BULK_DISPOSAL',
+]
+
+# "FoundItem #123" / "founditem 123"
+_TARGET = re.compile(r'^\s*([A-Za-z]+)\s*#?\s*(\d+)\s*$')
+# "status=APPROVED"
+_CHANGE = re.compile(r'^\s*(\w+)\s*=\s*(.+?)\s*$')
+
+TARGET_MODELS = {name.lower(): name for name in ['FoundItem', 'ClaimRequest', 'LostItemTicket', 'HandInReport']}
+
+
+def changes_match(fields):
+    """Q for entries whose `changes` contain all of `fields`."""
+    if connection.vendor == 'postgresql':
+        return Q(changes__contains=fields)
+    return Q(**{f'changes__{key}': value for key, value in fields.items()})
+
+
+def parse_target(text):
+    """'FoundItem #12' -> ('FoundItem', '12'), else None."""
+    match = _TARGET.match(text or '')
+    if not match or match.group(1).lower() not in TARGET_MODELS:
+        return None
+    return TARGET_MODELS[match.group(1).lower()], match.group(2)
+
+
+def parse_change(text):
+    """'status=APPROVED' -> {'status': 'APPROVED'}, else None."""
+    match = _CHANGE.match(text or '')
+    return {match.group(1): match.group(2)} if match else None
+
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def cursor(entry):
+    """The `before` value for the page after `entry`: '<timestamp in microseconds>_<id>'."""
+    return f'{(entry.timestamp - _EPOCH) // _MICROSECOND}_{entry.id}'
+
+
+def parse_cursor(text):
+    """cursor() back to (timestamp, id), else None."""
+    match = re.fullmatch(r'(\d+)_(\d+)', text or '')
+    if not match:
+        return None
+    try:
+        timestamp, pk = _EPOCH + int(match.group(1)) * _MICROSECOND, int(match.group(2))
+    except (OverflowError, ValueError):  # past datetime.max, or too many digits for int()
+        return None
+    return (timestamp, pk) if pk < 2 ** 63 else None
+
+
+def search(query='', action='', change='', before=None):
+    """One page of the audit trail, newest first. Returns (entries, cursor to pass as `before` for the next page)."""
+    logs = AuditLog.objects.select_related('actor').order_by('-timestamp', '-id')
+
+    target = parse_target(query)
+    if target:
+        logs = logs.filter(target_model=target[0], target_object_id=target[1])
+    elif query:
+        logs = logs.filter(
+            Q(actor__username__icontains=query) |
+            Q(action__icontains=query) |
+            Q(target_model__icontains=query)
+        )
+    if action:
+        logs = logs.filter(action=action)
+    fields = parse_change(change)
+    if fields:
+        logs = logs.filter(changes_match(fields))
+    before = parse_cursor(before)
+    if before:
+        timestamp, pk = before
+        logs = logs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    entries = list(logs[:PAGE_SIZE + 1])
+    older = cursor(entries[PAGE_SIZE - 1]) if len(entries) > PAGE_SIZE else None
+    return entries[:PAGE_SIZE], older
+
+
+def diff(before, after):
+    """[(field, old, new)] for the fields of `after` that differ from `before`."""
+    if not isinstance(after, dict):
+        return []
+    before = before or {}
+    return [
+        (field, before.get(field), value) for field, value in after.items()
+        if (before.get(field) != value if field in before else value not in (None, ''))
+    ]
+
+
+def _related(model, object_id):
+    """Entries about other rows that still concern this object."""
+    if model != 'FoundItem':
+        return Q(pk__in=[])
+    claims = ClaimRequest.objects.filter(found_item_id=object_id).values_list('id', flat=True)
+    related = (
+        Q(target_model='ClaimRequest', target_object_id__in=[str(pk) for pk in claims]) |
+        Q(target_model='LostItemTicket') & changes_match({'matched_item_id': str(object_id)})
+    )
+    if connection.vendor == 'postgresql':
+        # Bulk jobs list their ids inside `changes`; only jsonb can look into those lists
+        related |= Q(action='BULK_IMPORT') & changes_match({'ids': [int(object_id)]})
+        item = FoundItem.all_objects.filter(pk=object_id).only('category').first()
+        if item:
+            related |= Q(action='BULK_DISPOSAL') & changes_match({'disposed': {item.category: [int(object_id)]}})
+    return related
+
+
+def timeline(model, object_id):
+    """Everything that happened to one object, oldest first, each entry with a .diff."""
+    object_id = str(object_id)
+    entries = list(
+        AuditLog.objects.filter(Q(target_model=model, target_object_id=object_id) | _related(model, object_id))
+        .select_related('actor').order_by('timestamp', 'id')
+    )
+    states = {}
+    for entry in entries:
+        subject = (entry.target_model, entry.target_object_id)
+        entry.is_related = subject != (model, object_id)
+        if entry.action.startswith('BULK_'):
+            entry.diff = []  # the whole job's payload, not this object's state
+            continue
+        entry.diff = diff(states.get(subject), entry.changes)
+        if isinstance(entry.changes, dict):
+            states[subject] = {**states.get(subject, {}), **entry.changes}
+    return entries
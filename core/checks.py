@@ -0,0 +1,58 @@
+"""
+Startup self-check for the production profile.
+
+Runs with `manage.py check --deploy`, and gunicorn.conf.py runs it in the
+master before forking, so a misconfigured release fails at boot.
+"""
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Error, Warning, register
+from django.db import DatabaseError, connections
+
+
+@register('core', deploy=True)
+def production_profile_check(app_configs, **kwargs):
+    if not settings.PRODUCTION:
+        return []
+    problems = []
+
+    if settings.DEBUG:
+        problems.append(Error("DEBUG is on in the production profile.", hint="Unset DEBUG or set DEBUG=0.", id='core.E001'))
+    if settings.SECRET_KEY == 'default-unsafe-key-for-dev':
+        problems.append(Error("SECRET_KEY is the development default.", hint="Set the SECRET_KEY env var.", id='core.E002'))
+    if not settings.ALLOWED_HOSTS:
+        problems.append(Error("ALLOWED_HOSTS is empty.", hint="Set ALLOWED_HOSTS or RENDER_EXTERNAL_HOSTNAME.", id='core.E003'))
+    if not os.path.exists(os.path.join(settings.STATIC_ROOT, 'staticfiles.json')):
+        problems.append(Error("Static files haven't been collected; every {% static %} tag will fail.",
+                              hint="Run build.sh (or collectstatic).", id='core.E004'))
+
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            problems.append(Error(f"Database '{alias}' is unreachable: {e}", id='core.E005'))
+
+    try:
+        cache.set('core.selfcheck', 1, 5)
+        ok = cache.get('core.selfcheck') == 1
+    except Exception:
+        ok = False
+    if not ok:
+        problems.append(Warning("The default cache isn't answering; sessions will hit the database.", id='core.W001'))
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        problems.append(Warning("Each worker has its own in-memory cache.",
+                                hint="Set REDIS_URL to share sessions and counters between workers. Throttle limits "
+                                     "multiply by the worker count and /metrics only sees one worker without it.",
+                                id='core.W002'))
+    if settings.LIVE_UPDATES and settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        problems.append(Error("LIVE_UPDATES is on without a shared cache; dashboards would never see the "
+                              "dispatcher's changes.", hint="Set REDIS_URL, or LIVE_UPDATES=0.", id='core.E007'))
+    if settings.CACHES['default']['BACKEND'].endswith('RedisCache'):
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            problems.append(Error("REDIS_URL is set but the redis client isn't installed.",
+                                  hint="pip install -r requirements.txt", id='core.E006'))
+    return problems
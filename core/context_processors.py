@@ -0,0 +1,11 @@
+from django.conf import settings
+
+
+def assets(request):
+    """Tells the base templates whether the compiled CSS exists (see build.sh)."""
+    return {'use_cdn_assets': settings.USE_CDN_ASSETS}
+
+
+def upload_limits(request):
+    """Limits the photo inputs enforce in the browser before uploading (see core/uploads.py)."""
+    return {'upload_limits': {'max_edge': settings.PHOTO_MAX_EDGE, 'max_bytes': settings.UPLOAD_MAX_BYTES}}
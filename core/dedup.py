@@ -0,0 +1,170 @@
+"""
+Near-duplicate detection between hand-in reports and found items.
+
+The same item is often handed in at the desk and also registered directly by
+staff. Each open HandInReport and each FoundItem without a hand-in link gets a
+MinHash signature over its name, description, colour, location and date. The
+signature is split into LSH bands, and each band's hash is stored as an
+indexed SignatureBucket row. Finding candidates is therefore an index lookup on the
+item's own band keys, not a scan of the inventory. Pairs whose estimated
+Jaccard similarity reaches SIMILARITY_THRESHOLD land in the DuplicateCandidate
+merge queue.
+"""
+import hashlib
+import random
+import re
+
+from django.db import transaction
+
+from . import transitions
+from .models import (
+    HandInReport, FoundItem, ItemSignature, SignatureBucket, DuplicateCandidate
+)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# With 16 bands of 4 rows, pairs around 0.5 Jaccard have an even chance of
+# sharing a bucket and pairs above 0.7 almost always do.
+SIMILARITY_THRESHOLD = 0.5
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)  # fixed so signatures are stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r'[a-z0-9]+')
+_STOPWORDS = {'a', 'an', 'and', 'the', 'of', 'in', 'on', 'at', 'with', 'near', 'my', 'is', 'it'}
+
+
+def _words(text):
+    return [w for w in _WORD.findall((text or '').lower()) if w not in _STOPWORDS]
+
+
+def shingles(item_name, description, color, location, date):
+    tokens = set(_words(item_name))
+    tokens.update(_words(description))
+    # Prefix the short fields so "black" the colour and "black" in a
+    # description don't count as the same evidence.
+    tokens.update(f"color:{w}" for w in _words(color))
+    tokens.update(f"loc:{w}" for w in _words(location))
+    if date:
+        year, week, _ = date.isocalendar()
+        tokens.add(f"week:{year}-{week}")
+    return tokens
+
+
+def minhash(tokens):
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), 'big') for t in tokens]
+    if not hashes:
+        return []
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_keys(signature):
+    """One key per band; the band number is hashed in so keys never collide across bands."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        keys.append(hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).hexdigest())
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+# --- Indexing -----------------------------------------------------------------
+
+def _signature_for(source, instance):
+    if source == ItemSignature.Source.HAND_IN:
+        return minhash(shingles(
+            instance.item_name, instance.description, instance.color,
+            instance.location_found, instance.date_reported.date() if instance.date_reported else None,
+        ))
+    return minhash(shingles(
+        instance.item_name, instance.description, instance.color,
+        instance.location_found, instance.date_found,
+    ))
+
+
+def _is_open(source, instance):
+    """Only unlinked records can still turn out to be duplicates."""
+    if source == ItemSignature.Source.HAND_IN:
+        return not instance.is_received
+    return instance.hand_in_ref_id is None and instance.deleted_at is None
+
+
+def forget(source, object_id):
+    forget_many(source, [object_id])
+
+
+def forget_many(source, object_ids):
+    ItemSignature.objects.filter(source=source, object_id__in=object_ids).delete()
+    field = 'hand_in_id' if source == ItemSignature.Source.HAND_IN else 'found_item_id'
+    DuplicateCandidate.objects.filter(status=DuplicateCandidate.Status.PENDING, **{f'{field}__in': object_ids}).delete()
+
+
+@transaction.atomic
+def index(instance):
+    """(Re)compute the signature of a HandInReport or FoundItem and queue any duplicates."""
+    if isinstance(instance, HandInReport):
+        source, other = ItemSignature.Source.HAND_IN, ItemSignature.Source.FOUND_ITEM
+    else:
+        source, other = ItemSignature.Source.FOUND_ITEM, ItemSignature.Source.HAND_IN
+
+    if not _is_open(source, instance):
+        forget(source, instance.pk)
+        return []
+
+    signature = _signature_for(source, instance)
+    keys = band_keys(signature) if signature else []
+    record, _ = ItemSignature.objects.update_or_create(
+        source=source, object_id=instance.pk, defaults={'minhash': signature}
+    )
+    record.buckets.all().delete()
+    SignatureBucket.objects.bulk_create(
+        SignatureBucket(signature=record, key=key) for key in keys
+    )
+    if not keys:
+        return []
+
+    # Other-side signatures sharing at least one band bucket
+    candidates = ItemSignature.objects.filter(
+        source=other,
+        id__in=SignatureBucket.objects.filter(key__in=keys).values('signature_id'),
+    ).values_list('object_id', 'minhash')
+
+    # Buckets are shared by every campus; only pair records of the same one
+    candidates = list(candidates)
+    other_model = HandInReport if other == ItemSignature.Source.HAND_IN else FoundItem
+    same_campus = set(other_model._base_manager.filter(
+        pk__in=[object_id for object_id, _ in candidates], campus_id=instance.campus_id,
+    ).values_list('pk', flat=True))
+
+    found = []
+    for object_id, other_signature in candidates:
+        if object_id not in same_campus:
+            continue
+        score = similarity(signature, other_signature)
+        if score < SIMILARITY_THRESHOLD:
+            continue
+        pair = {'hand_in_id': instance.pk, 'found_item_id': object_id} if source == ItemSignature.Source.HAND_IN \
+            else {'hand_in_id': object_id, 'found_item_id': instance.pk}
+        candidate, created = DuplicateCandidate.objects.get_or_create(**pair, defaults={'similarity': score})
+        if not created and candidate.status == DuplicateCandidate.Status.PENDING and candidate.similarity != score:
+            candidate.similarity = score
+            candidate.save(update_fields=['similarity'])
+        found.append(candidate)
+    return found
+
+
+@transaction.atomic
+def merge(candidate, user):
+    """Link the hand-in to the existing inventory record instead of receiving it again."""
+    candidate.status = DuplicateCandidate.Status.MERGED
+    candidate.reviewed_by = user
+    candidate.save()
+
+    transitions.mark_received(candidate.hand_in)
+    transitions.link_hand_in(candidate.found_item, candidate.hand_in)
@@ -0,0 +1,139 @@
+"""
+Aging and disposal of unclaimed items.
+
+Items that stay AVAILABLE past their category's retention period
+(settings.DISPOSAL_RETENTION_DAYS) get donated/disposed by
+`manage.py dispose_unclaimed`, run daily from cron. It works in two steps:
+
+1. Notice: DISPOSAL_NOTICE_DAYS before the deadline, the item is stamped
+   with disposal_notice_at. Owners of tickets matched to it get an email
+   and a dashboard refresh.
+2. Disposal: once the item is past retention and was stamped at least
+   DISPOSAL_NOTICE_DAYS ago, transitions.dispose_items moves it to DONATED
+   in bulk batches. Items with a pending claim are skipped.
+
+Both steps query founditem_aging_idx (status, category, date_found) one
+category at a time. Each run writes one BULK_DISPOSAL audit record instead
+of a log line per item.
+"""
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.utils import timezone
+
+from . import dedup, live, suggest, transitions
+from .models import AuditLog, ClaimRequest, FoundItem, ItemCategory, ItemSignature, LostItemTicket
+
+WAITING = [LostItemTicket.Status.MATCH_FOUND, LostItemTicket.Status.CLAIM_PENDING]
+
+
+def retention_days(category):
+    return settings.DISPOSAL_RETENTION_DAYS.get(category, settings.DISPOSAL_RETENTION_DAYS['default'])
+
+
+def _aging(category, found_before):
+    return FoundItem.objects.filter(
+        current_status=FoundItem.Status.AVAILABLE, category=category, date_found__lt=found_before,
+    )
+
+
+def due_for_notice(category, today):
+    days = retention_days(category) - settings.DISPOSAL_NOTICE_DAYS
+    return _aging(category, today - datetime.timedelta(days=days)).filter(disposal_notice_at__isnull=True)
+
+
+def due_for_disposal(category, today, now):
+    notice = datetime.timedelta(days=settings.DISPOSAL_NOTICE_DAYS)
+    return _aging(category, today - datetime.timedelta(days=retention_days(category))).filter(
+        disposal_notice_at__lte=now - notice,
+    ).exclude(claims__status=ClaimRequest.Status.PENDING)
+
+
+def _notice_email(ticket, deadline):
+    return (
+        f"Claim your {ticket.matched_item.item_name} before {deadline:%B %d, %Y}",
+        f"Hi {ticket.owner.first_name or ticket.owner.username},\n\n"
+        f"The item we matched to your lost item ticket \"{ticket.item_name}\" "
+        f"has been at the Lost & Found office for a while. Unless it is claimed by "
+        f"{deadline:%B %d, %Y}, it will be donated or disposed of.\n\n"
+        f"Log in to your dashboard to submit a claim.\n",
+        None,
+        [ticket.owner.email],
+    )
+
+
+def send_notices(batch_size=500, now=None):
+    """Stamp items entering the notice window and warn owners of tickets matched to them."""
+    now = now or timezone.now()
+    today = now.date()
+    deadline = today + datetime.timedelta(days=settings.DISPOSAL_NOTICE_DAYS)
+    noticed, tickets, emails, owners = [], [], [], set()
+
+    for category in ItemCategory.values:
+        queryset = due_for_notice(category, today)
+        while True:
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            for ticket in LostItemTicket.objects.filter(matched_item_id__in=ids, status__in=WAITING).select_related('owner', 'matched_item'):
+                tickets.append(ticket.pk)
+                owners.add(ticket.owner_id)
+                if ticket.owner.email:
+                    emails.append(_notice_email(ticket, deadline))
+            FoundItem.objects.filter(pk__in=ids, disposal_notice_at__isnull=True).update(disposal_notice_at=now, updated_at=now)
+            noticed.extend(ids)
+
+    if emails:
+        send_mass_mail(emails, fail_silently=True)
+    live.bump(*owners)
+    return noticed, tickets
+
+
+def dispose(batch_size=500, now=None):
+    """Donate everything past retention. Returns {category: [item ids]}."""
+    now = now or timezone.now()
+    disposed, owners = defaultdict(list), set()
+
+    for category in ItemCategory.values:
+        queryset = due_for_disposal(category, now.date(), now)
+        skipped = set()
+        while True:
+            ids = list(queryset.exclude(pk__in=skipped).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            moved, reset = transitions.dispose_items(ids)
+            skipped.update(set(ids) - set(moved))  # claimed while we looked; stays for staff
+            if moved:
+                disposed[category].extend(moved)
+            owners |= reset
+            dedup.forget_many(ItemSignature.Source.FOUND_ITEM, moved)
+
+    if disposed:
+        suggest.invalidate('item', 'location')
+    live.bump(*owners)
+    return dict(disposed)
+
+
+def run(batch_size=500, now=None):
+    now = now or timezone.now()
+    noticed, tickets = send_notices(batch_size, now)
+    disposed = dispose(batch_size, now)
+
+    total = sum(len(ids) for ids in disposed.values())
+    if noticed or total:
+        AuditLog.objects.create(
+            actor=None,
+            action='BULK_DISPOSAL',
+            target_model='FoundItem',
+            target_object_id=f'{total} items',
+            changes={
+                'disposed': disposed,
+                'noticed_items': noticed,
+                'notified_tickets': tickets,
+                'notice_days': settings.DISPOSAL_NOTICE_DAYS,
+                'retention_days': {category: retention_days(category) for category in disposed},
+            },
+        )
+    return noticed, tickets, disposed
@@ -0,0 +1,94 @@
+"""
+Outbox event handlers (see core/outbox.py), run by the dispatcher.
+
+Events emitted by core/signals.py for every save:
+    ItemSaved, ClaimSaved, TicketSaved, HandInSaved
+        {'id', 'fields': update_fields or None, 'audit': AuditLog values or None}
+Events emitted by core/transitions.py:
+    ClaimApproved, ClaimRejected, ClaimCompleted, MatchConfirmed, ItemWithdrawn
+        {..., 'notify': ids of the students whose dashboard changed}
+Emitted by the staff import page (core/importers.py):
+    ImportRequested
+        {'path', 'source', 'format', 'user', 'campus', 'batch_size', 'progress' once a batch is in}
+
+Handlers reload rows by id rather than trusting the payload, so a late
+delivery works on the current state. A row deleted in the meantime is
+skipped; its post_delete receiver already cleaned up.
+"""
+from django.db import transaction
+
+from . import dedup, fingerprints, importers, live, outbox
+from .models import AuditLog, ClaimRequest, FoundItem, HandInReport, LostItemTicket
+from .outbox import handler
+
+MODELS = {
+    'ItemSaved': FoundItem,
+    'ClaimSaved': ClaimRequest,
+    'TicketSaved': LostItemTicket,
+    'HandInSaved': HandInReport,
+}
+
+
+def _load(event):
+    # _base_manager: no campus scoping, and soft-deleted items still count
+    return MODELS[event.event_type]._base_manager.filter(pk=event.payload['id']).first()
+
+
+@handler('ItemSaved', 'ClaimSaved', 'TicketSaved')
+def write_audit(event):
+    entry = event.payload.get('audit')
+    if not entry:
+        return
+    # Redelivery: the same event gives the same target and timestamp (audit_target_idx)
+    if AuditLog.objects.filter(
+        target_model=entry['target_model'], target_object_id=entry['target_object_id'],
+        timestamp=event.created_at, action=entry['action'],
+    ).exists():
+        return
+    AuditLog.objects.create(timestamp=event.created_at, **entry)
+
+
+@handler('ItemSaved', 'HandInSaved')
+def index_for_duplicates(event):
+    instance = _load(event)
+    if instance:
+        dedup.index(instance)
+
+
+@handler('ItemSaved', 'ClaimSaved', 'TicketSaved')
+def fingerprint_photo(event):
+    model = MODELS[event.event_type]
+    _, field = fingerprints.IMAGE_FIELDS[model]
+    fields = event.payload.get('fields')
+    if fields is not None and field not in fields:
+        return
+    instance = _load(event)
+    if instance:
+        fingerprints.index(instance)
+
+
+@handler('ClaimApproved', 'ClaimRejected', 'ClaimCompleted', 'MatchConfirmed', 'ItemWithdrawn')
+def refresh_dashboards(event):
+    live.bump(*event.payload.get('notify', []))
+
+
+@handler('ImportRequested', atomic=False)
+def run_import(event):
+    # Outside a transaction so each batch really commits; renewing the lease
+    # after every batch keeps other dispatchers off this event meanwhile
+    result = importers.run_queued(event.payload, on_batch=lambda progress: outbox.renew(event, progress=progress))
+    if result is None:
+        return
+    with transaction.atomic():
+        AuditLog.objects.create(
+            actor_id=event.payload['user'],
+            action='IMPORT_FINISHED',
+            target_model='FoundItem',
+            target_object_id='',
+            campus_id=event.payload['campus'],
+            changes={
+                'source': event.payload['source'], 'created': result.created, 'skipped': result.skipped,
+                'errors': [f"row {number}: {message}" for number, message in result.errors[:50]],
+            },
+        )
+        transaction.on_commit(lambda: importers.discard_queued(event.payload))
@@ -0,0 +1,254 @@
+"""
+Photo fingerprints for matching tickets to items and checking claim proofs.
+
+Every uploaded photo (found items, lost tickets, claim proofs) gets:
+- a 64-bit pHash: DCT of a 32x32 grayscale thumbnail, low frequencies vs
+  their median. It survives resizing, recompression and small crops.
+- a 64-bit dHash: gradient signs of a 9x8 thumbnail. Cheap, and it
+  catches what pHash smooths over.
+- a 64-bin RGB histogram (4 levels per channel), for "same colours at
+  least".
+
+Computing one is a few milliseconds on the CPU, because JPEGs are decoded
+at reduced size (Image.draft). The outbox dispatcher computes it after a
+save that changed the image commits (see core/events.py), and the match tool
+computes a missing one on demand. `fingerprint_images` backfills older
+uploads.
+
+"Items that look like this photo" uses a BK-tree over the pHashes of
+inventory photos. The tree is built once per worker process and rebuilt
+only when an item photo changes (a version counter in the cache), so a
+lookup is a few hundred hamming distance checks rather than a table scan.
+"""
+import logging
+import threading
+
+import numpy as np
+from django.core.cache import cache
+from PIL import Image, ImageOps
+
+from .models import ImageFingerprint, FoundItem, LostItemTicket, ClaimRequest
+
+logger = logging.getLogger(__name__)
+
+Source = ImageFingerprint.Source
+
+IMAGE_FIELDS = {
+    FoundItem: (Source.FOUND_ITEM, 'item_image'),
+    LostItemTicket: (Source.LOST_TICKET, 'item_image'),
+    ClaimRequest: (Source.CLAIM_PROOF, 'proof_image'),
+}
+
+# pHash distance up to which a photo counts as "looks like" (out of 64)
+SEARCH_RADIUS = 20
+# At or below this the two files are the same picture (re-saved or resized)
+SAME_PHOTO_DISTANCE = 4
+
+_MASK = (1 << 64) - 1
+
+
+# --- Hashing -----------------------------------------------------------------
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+_DCT32 = _dct_matrix(32)
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.ravel():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _signed(value):
+    """Unsigned 64-bit -> what fits a BigIntegerField."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a, b):
+    return ((a ^ b) & _MASK).bit_count()
+
+
+def compute(fileobj):
+    """Return (phash, dhash, histogram) for an image file; hashes as unsigned ints."""
+    with Image.open(fileobj) as img:
+        img.draft('RGB', (160, 160))  # JPEG: decode at 1/2..1/8 scale, much faster
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        small = img.resize((64, 64), Image.Resampling.BILINEAR)
+
+    gray = small.convert('L')
+    pixels = np.asarray(gray.resize((32, 32), Image.Resampling.LANCZOS), dtype=np.float64)
+    low = (_DCT32 @ pixels @ _DCT32.T)[:8, :8]
+    phash = _bits_to_int(low > np.median(low.ravel()[1:]))  # DC term skews the median
+
+    thumb = np.asarray(gray.resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+    dhash = _bits_to_int(thumb[:, 1:] > thumb[:, :-1])
+
+    rgb = np.asarray(small, dtype=np.uint8) // 64
+    bins = np.bincount((rgb[..., 0] * 16 + rgb[..., 1] * 4 + rgb[..., 2]).ravel(), minlength=64)
+    histogram = [round(float(v), 4) for v in bins / bins.sum()]
+    return phash, dhash, histogram
+
+
+def similarity(a, b):
+    """0..1 score between two fingerprints; unrelated photos land around 0.3-0.4."""
+    ph = max(0.0, 1 - hamming(a.phash_u, b.phash_u) / 32)
+    dh = max(0.0, 1 - hamming(a.dhash_u, b.dhash_u) / 32)
+    colours = sum(min(x, y) for x, y in zip(a.histogram, b.histogram))
+    return round(0.45 * ph + 0.25 * dh + 0.30 * colours, 3)
+
+
+# --- Keeping fingerprints in sync with uploads ---------------------------------
+
+def index(instance):
+    """(Re)fingerprint the instance's photo if it changed; drop the fingerprint if the photo is gone."""
+    source, field = IMAGE_FIELDS[type(instance)]
+    image = getattr(instance, field)
+    existing = ImageFingerprint.objects.filter(source=source, object_id=instance.pk).first()
+
+    if not image:
+        if existing:
+            forget(source, instance.pk)
+        return None
+    if existing and existing.image_name == image.name:
+        return existing
+
+    try:
+        image.open('rb')
+        try:
+            phash, dhash, histogram = compute(image)
+        finally:
+            image.close()
+    except Exception:
+        # A broken upload shouldn't break the save; it just won't be matched by photo
+        logger.warning("Could not fingerprint %s", image.name, exc_info=True)
+        return None
+
+    fingerprint, _ = ImageFingerprint.objects.update_or_create(
+        source=source, object_id=instance.pk,
+        defaults={'image_name': image.name, 'phash': _signed(phash), 'dhash': _signed(dhash), 'histogram': histogram},
+    )
+    if source == Source.FOUND_ITEM:
+        _bump_tree()
+    return fingerprint
+
+
+def forget(source, object_id):
+    ImageFingerprint.objects.filter(source=source, object_id=object_id).delete()
+    if source == Source.FOUND_ITEM:
+        _bump_tree()
+
+
+def fingerprint_for(instance):
+    source, _ = IMAGE_FIELDS[type(instance)]
+    return ImageFingerprint.objects.filter(source=source, object_id=instance.pk).first()
+
+
+# --- BK-tree over inventory photos ---------------------------------------------
+
+class BKTree:
+    """Metric tree for hamming distance: only branches that can hold a match get visited."""
+
+    def __init__(self):
+        self.root = None  # [hash, payload, {distance: child}]
+        self.size = 0
+
+    def add(self, value, payload):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, payload, {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, payload, {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                found.append((d, node[1]))
+            for child_distance, child in node[2].items():
+                if d - radius <= child_distance <= d + radius:
+                    stack.append(child)
+        return found
+
+
+_TREE_VERSION_KEY = 'fingerprints:items:version'
+_tree_lock = threading.Lock()
+_tree = (None, None)
+
+
+def _bump_tree():
+    try:
+        cache.incr(_TREE_VERSION_KEY)
+    except ValueError:
+        cache.set(_TREE_VERSION_KEY, 1, timeout=None)
+
+
+def item_tree():
+    """The BK-tree of inventory photos, rebuilt when an item photo changed since the last build."""
+    global _tree
+    version = cache.get(_TREE_VERSION_KEY, 0)
+    if _tree[0] == version:
+        return _tree[1]
+    with _tree_lock:
+        if _tree[0] != version:
+            tree = BKTree()
+            for fingerprint in ImageFingerprint.objects.filter(source=Source.FOUND_ITEM).iterator(chunk_size=2000):
+                tree.add(fingerprint.phash_u, fingerprint)
+            _tree = (version, tree)
+    return _tree[1]
+
+
+def similar_items(fingerprint, limit=10, radius=SEARCH_RADIUS, exclude=(), among=None):
+    """
+    {found item id: score} for the inventory photos closest to `fingerprint`.
+
+    The tree holds every campus's photos, claimed items included. Pass the
+    items the caller can show as `among` (a FoundItem queryset) so they are
+    picked before the limit, not filtered out after it.
+    """
+    hits = item_tree().search(fingerprint.phash_u, radius)
+    scores = {
+        other.object_id: similarity(fingerprint, other)
+        for _, other in hits if other.object_id not in exclude
+    }
+    if among is not None and scores:
+        allowed = set(among.filter(pk__in=scores).values_list('pk', flat=True))
+        scores = {pk: score for pk, score in scores.items() if pk in allowed}
+    best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return dict(best)
+
+
+def score_claims(claims):
+    """Set claim.photo_score / claim.same_photo for claims whose proof and item both have photos."""
+    claims = [c for c in claims if c.proof_image and c.found_item.item_image]
+    if not claims:
+        return
+    fingerprints = {
+        (f.source, f.object_id): f
+        for f in ImageFingerprint.objects.filter(
+            source__in=[Source.CLAIM_PROOF, Source.FOUND_ITEM],
+            object_id__in={c.pk for c in claims} | {c.found_item_id for c in claims},
+        )
+    }
+    for claim in claims:
+        proof = fingerprints.get((Source.CLAIM_PROOF, claim.pk))
+        item = fingerprints.get((Source.FOUND_ITEM, claim.found_item_id))
+        if proof and item:
+            claim.photo_score = round(similarity(proof, item) * 100)
+            # The gallery photo is public; a "proof" that is the same picture proves nothing
+            claim.same_photo = hamming(proof.phash_u, item.phash_u) <= SAME_PHOTO_DISTANCE
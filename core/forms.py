@@ -1,6 +1,30 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from .models import CustomUser, LostItemTicket, HandInReport, FoundItem, ClaimRequest
+from django.db import IntegrityError, transaction
+from . import uploads
+from .models import Campus, CustomUser, LostItemTicket, HandInReport, FoundItem, ClaimRequest
+
+# Photo inputs (see core/uploads.py)
+class PhotoInput(forms.ClearableFileInput):
+    """File input that also accepts a finished chunked upload posted as `<name>_upload`."""
+    def __init__(self, attrs=None):
+        super().__init__({'accept': 'image/*', 'data-photo': '', **(attrs or {})})
+
+    def value_from_datadict(self, data, files, name):
+        value = super().value_from_datadict(data, files, name)
+        if value is None and data.get(f'{name}_upload'):
+            return uploads.staged_file(data[f'{name}_upload'])
+        return value
+
+class PhotoField(forms.ImageField):
+    widget = PhotoInput
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return None
+        # Format, size and pixel count come from the header; only then is anything decoded
+        uploads.inspect(data)
+        return super().to_python(uploads.downscale(data))
 
 class StudentSignUpForm(UserCreationForm):
     # Enforce strict input on the frontend form widget
@@ -29,17 +53,31 @@ class StudentSignUpForm(UserCreationForm):
             raise forms.ValidationError("Student ID must be exactly 7 digits.")
             
         # 3. Check Uniqueness (The new logic)
-        # We look for any user who has this ID
+        # We look for any user who has this ID. This is only the friendly
+        # early check; the unique_student_id constraint settles races in save().
         if CustomUser.objects.filter(student_id=sid).exists():
             raise forms.ValidationError("This Student ID is already registered. Please log in or contact support.")
             
         return sid
 
     def save(self, commit=True):
+        """
+        Returns None (with the error attached to the form) if another signup
+        took the same username or student ID between validation and insert.
+        """
         user = super().save(commit=False)
         user.role = CustomUser.Roles.STUDENT
         if commit:
-            user.save()
+            try:
+                with transaction.atomic():
+                    user.save()
+            except IntegrityError:
+                # Ask the table rather than parse the backend's error text
+                if user.student_id and CustomUser.objects.filter(student_id=user.student_id).exists():
+                    self.add_error('student_id', "This Student ID is already registered. Please log in or contact support.")
+                else:
+                    self.add_error('username', "A user with that username already exists.")
+                return None
         return user
     
 
@@ -48,9 +86,11 @@ class LostItemForm(forms.ModelForm):
     class Meta:
         model = LostItemTicket
         fields = ['category', 'item_name', 'description', 'color', 'date_lost', 'location_lost', 'item_image']
+        field_classes = {'item_image': PhotoField}
         widgets = {
             'date_lost': forms.DateInput(attrs={'type': 'date'}),
             'description': forms.Textarea(attrs={'rows': 3}),
+            'location_lost': forms.TextInput(attrs={'data-suggest': 'location'}),
         }
 
 #Public: Hand In Item
@@ -60,12 +100,14 @@ class HandInForm(forms.ModelForm):
         fields = ['finder_name', 'finder_contact', 'category', 'item_name', 'description', 'color', 'location_found']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
+            'location_found': forms.TextInput(attrs={'data-suggest': 'location'}),
         }
 
 class ClaimForm(forms.ModelForm):
     class Meta:
         model = ClaimRequest
         fields = ['proof_of_ownership', 'proof_image']
+        field_classes = {'proof_image': PhotoField}
         widgets = {
             'proof_of_ownership': forms.Textarea(attrs={'rows': 4, 'placeholder': 'Describe unique features, contents, or scratches to prove this is yours.'}),
         }
@@ -74,17 +116,32 @@ class FoundItemAdminForm(forms.ModelForm):
     class Meta:
         model = FoundItem
         fields = ['category', 'item_name', 'description', 'color', 'date_found', 'location_found', 'item_image', 'current_status']
+        field_classes = {'item_image': PhotoField}
         widgets = {
             'date_found': forms.DateInput(attrs={'type': 'date'}),
             'description': forms.Textarea(attrs={'rows': 3}),
+            'location_found': forms.TextInput(attrs={'data-suggest': 'location'}),
         }
 
+# Staff: bulk import of legacy inventory (see core/importers.py)
+class FoundItemImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, or JSON Lines (.jsonl).", validators=[uploads.validate_size])
+    batch_size = forms.IntegerField(min_value=1, max_value=5000, initial=500)
+
 # Form for Admin to add new Staff users
 class StaffCreationForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput)
     class Meta:
         model = CustomUser
-        fields = ['username', 'first_name', 'last_name', 'email', 'password']
+        fields = ['username', 'first_name', 'last_name', 'email', 'password', 'campus']
+
+    def __init__(self, *args, campus=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Staff always work at one campus; an admin scoped to a campus can only add to theirs
+        self.fields['campus'].required = True
+        if campus:
+            self.fields['campus'].queryset = Campus.objects.filter(pk=campus.pk)
+            self.fields['campus'].initial = campus
     
     def save(self, commit=True):
         user = super().save(commit=False)
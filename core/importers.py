@@ -0,0 +1,247 @@
+"""
+Bulk import of found-item inventory from CSV or JSON Lines.
+
+Rows are read one at a time, validated with FoundItemAdminForm (the same
+rules as the "Add Found Item" page) and written with bulk_create in batches.
+bulk_create doesn't send post_save, so the per-item audit signal never fires;
+instead each batch writes a single BULK_IMPORT AuditLog entry and one
+ItemSaved outbox event per item, which the dispatcher turns into duplicate
+signatures and photo fingerprints (core/events.py).
+
+Photos are copied into storage after the batch commits, so a failed batch
+leaves no orphan files behind. The items are then pointed at their photos
+with a bulk_update, and ItemSaved events for item_image fingerprint them.
+
+Used by the `import_found_items` management command, and by the staff upload
+page through an ImportRequested outbox event (see queue_upload()). The
+dispatcher runs those outside a transaction, so every batch commits on its
+own. After each batch it renews its lease on the event and saves how far it
+got, and a redelivery after a crash or a failed batch carries on from there
+instead of importing the committed rows again.
+"""
+import csv
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import outbox, suggest, tenancy
+from .forms import FoundItemAdminForm
+from .models import FoundItem, AuditLog
+
+IMAGE_COLUMNS = ('item_image', 'image')
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    batches: int = 0
+    errors: list = field(default_factory=list)  # (row number, message)
+    omitted: int = 0  # skipped rows of an earlier, resumed run that aren't in `errors`
+
+    @property
+    def skipped(self):
+        return len(self.errors) + self.omitted
+
+
+def iter_rows(stream, fmt):
+    """Yield (row number, dict) pairs from a text stream without reading it all."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for number, row in enumerate(reader, start=2):  # line 1 is the header
+            yield number, row
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, e
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def _resolve_image(image_dir, name):
+    # Only allow files inside image_dir
+    root = os.path.realpath(image_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+def _store_image(path):
+    upload_to = FoundItem._meta.get_field('item_image').upload_to
+    with open(path, 'rb') as fh:
+        return default_storage.save(os.path.join(upload_to, os.path.basename(path)), File(fh))
+
+
+def import_found_items(rows, registered_by=None, batch_size=500, image_dir=None, workers=4, source='', campus=None,
+                       result=None, start_after=0, on_batch=None):
+    """
+    Import `rows`; returns an ImportResult. To resume, pass the earlier `result`
+    and the last row number it covered as `start_after`. `on_batch(row number,
+    result)` is called after each batch commits.
+    """
+    result = result or ImportResult()
+    batch = []
+    # bulk_create skips the pre_save that normally fills this in
+    campus = campus or tenancy.current() or (registered_by and registered_by.campus) or tenancy.default()
+
+    for number, row in rows:
+        if number <= start_after:
+            continue
+        if isinstance(row, Exception):
+            result.errors.append((number, f"Invalid JSON: {row}"))
+            continue
+
+        data = {k: (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+        data.setdefault('current_status', FoundItem.Status.AVAILABLE)
+        image_name = next((data.pop(col) for col in IMAGE_COLUMNS if data.get(col)), None)
+
+        form = FoundItemAdminForm(data)
+        if not form.is_valid():
+            message = "; ".join(f"{name}: {errs[0]}" for name, errs in form.errors.items())
+            result.errors.append((number, message))
+            continue
+
+        image_path = None
+        if image_name:
+            if not image_dir:
+                result.errors.append((number, f"item_image: no image directory given for '{image_name}'"))
+                continue
+            image_path = _resolve_image(image_dir, image_name)
+            if image_path is None:
+                result.errors.append((number, f"item_image: '{image_name}' not found"))
+                continue
+
+        item = form.save(commit=False)
+        item.registered_by = registered_by
+        item.campus = campus
+        batch.append((item, image_path))
+
+        if len(batch) >= batch_size:
+            _flush(batch, result, registered_by, workers, source)
+            batch = []
+            if on_batch:
+                on_batch(number, result)
+
+    if batch:
+        _flush(batch, result, registered_by, workers, source)
+        if on_batch:
+            on_batch(number, result)
+    return result
+
+
+def _flush(batch, result, registered_by, workers, source):
+    items = [item for item, _ in batch]
+    with transaction.atomic():
+        created = [item for item in FoundItem.objects.bulk_create(items) if item.pk is not None]
+        ids = [item.pk for item in created]
+        AuditLog.objects.create(
+            actor=registered_by,
+            action="BULK_IMPORT",
+            target_model="FoundItem",
+            target_object_id="",  # a whole batch; the ids are in `changes`
+            changes={'count': len(items), 'ids': ids, 'source': source},
+            campus_id=items[0].campus_id,  # one import, one campus
+        )
+        outbox.emit_many('ItemSaved', [{'id': pk, 'fields': None, 'audit': None} for pk in ids])
+        with_images = [(item, path) for item, path in batch if path and item.pk is not None]
+        if with_images:
+            transaction.on_commit(lambda: _attach_images(with_images, workers))
+        # One version bump per batch instead of one per row
+        transaction.on_commit(lambda: suggest.invalidate('item', 'location'))
+
+    result.created += len(items)
+    result.batches += 1
+
+
+def _attach_images(with_images, workers):
+    # Copy photos into storage in parallel; this is I/O bound.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        names = list(pool.map(_store_image, [path for _, path in with_images]))
+    for (item, _), name in zip(with_images, names):
+        item.item_image.name = name
+    items = [item for item, _ in with_images]
+    with transaction.atomic():
+        FoundItem._base_manager.bulk_update(items, ['item_image'])
+        outbox.emit_many('ItemSaved', [{'id': item.pk, 'fields': ['item_image'], 'audit': None} for item in items])
+
+
+# --- Staff uploads ----------------------------------------------------------------
+
+def queue_upload(upload, registered_by, batch_size, campus=None):
+    """
+    Stage an uploaded file and leave the import to the outbox dispatcher, so a
+    large file doesn't hold a web worker for the whole import.
+    """
+    os.makedirs(settings.UPLOAD_STAGING_DIR, exist_ok=True)
+    path = os.path.join(settings.UPLOAD_STAGING_DIR, f'import-{uuid.uuid4().hex}')
+    with open(path, 'wb') as fh:
+        for chunk in upload.chunks():
+            fh.write(chunk)
+    outbox.emit(
+        'ImportRequested', path=path, source=upload.name, format=detect_format(upload.name),
+        user=registered_by.pk if registered_by else None, campus=campus.pk if campus else None,
+        batch_size=batch_size,
+    )
+
+
+def run_queued(payload, on_batch=None):
+    """
+    The ImportRequested handler's work. Returns the ImportResult, or None if it
+    already finished. `on_batch(progress)` gets a dict to keep in the payload;
+    passed back in as payload['progress'], the import resumes after it.
+    """
+    from .models import Campus, CustomUser
+
+    path = payload['path']
+    if not os.path.exists(path):
+        return None  # a redelivery after the import finished
+    user = CustomUser.objects.filter(pk=payload['user']).first() if payload['user'] else None
+    campus = Campus.objects.filter(pk=payload['campus']).first() if payload['campus'] else None
+
+    progress = payload.get('progress') or {'row': 0, 'created': 0, 'batches': 0, 'skipped': 0, 'errors': []}
+    errors = [tuple(error) for error in progress['errors']]
+    result = ImportResult(
+        created=progress['created'], batches=progress['batches'], errors=errors,
+        omitted=progress['skipped'] - len(errors),
+    )
+
+    def report(row, result):
+        if on_batch:
+            on_batch({
+                'row': row, 'created': result.created, 'batches': result.batches,
+                'skipped': result.skipped, 'errors': result.errors[:50],
+            })
+
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        return import_found_items(
+            iter_rows(stream, payload['format']),
+            registered_by=user,
+            batch_size=payload['batch_size'],
+            image_dir=getattr(settings, 'IMPORT_IMAGE_DIR', None),
+            source=payload['source'],
+            campus=campus,
+            result=result,
+            start_after=progress['row'],
+            on_batch=report,
+        )
+
+
+def discard_queued(payload):
+    """Remove a finished import's staged file; run_queued() then treats a redelivery as done."""
+    if os.path.exists(payload['path']):
+        os.remove(payload['path'])
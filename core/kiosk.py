@@ -0,0 +1,114 @@
+"""
+Batch sync for the hand-in kiosk at the security desk.
+
+The desk's connection drops often. The kiosk queues hand-ins locally and
+posts them in batches to /kiosk/handins/sync/ as a logged-in staff account,
+with the CSRF token in X-CSRFToken:
+
+    {"handins": [{"key": "<uuid made by the kiosk>", "item_name": ..., ...}, ...]}
+
+Each entry is checked with HandInForm, the rules of the public hand-in page.
+The valid ones are written with a single bulk_create. The answer has one
+result per entry, in order:
+
+    {"key": ..., "status": "created" | "duplicate", "reference_code": ...}
+    {"key": ..., "status": "invalid", "errors": {field: [messages]}}
+
+The keys make the sync idempotent. A batch re-sent after a timeout returns
+the codes of the reports it already created, as "duplicate", and doesn't
+create them again. The kiosk can retry until it gets an answer, then drop
+every entry that isn't "invalid".
+
+bulk_create skips save() and the model signals. So the reference codes and
+the campus are assigned here. The HandInSaved outbox events (duplicate
+detection) and the typeahead updates are done explicitly.
+"""
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import metrics, outbox, refcodes, suggest, tenancy
+from .forms import HandInForm
+from .models import HandInReport
+
+KEY_LENGTH = HandInReport._meta.get_field('client_key').max_length
+
+
+class SyncError(Exception):
+    """The request as a whole is unusable; nothing was saved."""
+
+
+def parse(body):
+    """The list of entries from a request body."""
+    try:
+        data = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        raise SyncError("The body must be JSON.")
+    entries = data.get('handins') if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        raise SyncError('Expected {"handins": [...]}.')
+    if len(entries) > settings.KIOSK_SYNC_MAX_BATCH:
+        raise SyncError(f"At most {settings.KIOSK_SYNC_MAX_BATCH} hand-ins per request.")
+    return entries
+
+
+def _key(entry):
+    key = entry.get('key') if isinstance(entry, dict) else None
+    if isinstance(key, str) and 0 < len(key.strip()) <= KEY_LENGTH:
+        return key.strip()
+    return None
+
+
+def sync(entries, campus=None, retry=True):
+    """Create the hand-ins not seen before. Returns one result dict per entry."""
+    campus = campus or tenancy.current() or tenancy.default()
+    keys = [_key(entry) for entry in entries]
+    # _base_manager: a key is unique across campuses
+    known = dict(
+        HandInReport._base_manager.filter(client_key__in={key for key in keys if key})
+        .values_list('client_key', 'reference_code')
+    )
+
+    results = []
+    reports = {}
+    for entry, key in zip(entries, keys):
+        if key is None:
+            results.append({'key': entry.get('key') if isinstance(entry, dict) else None, 'status': 'invalid',
+                            'errors': {'key': [f"A key of 1 to {KEY_LENGTH} characters is required."]}})
+            continue
+        if key in known or key in reports:
+            results.append({'key': key, 'status': 'duplicate'})
+            continue
+        form = HandInForm({name: value for name, value in entry.items() if name != 'key'})
+        if not form.is_valid():
+            results.append({'key': key, 'status': 'invalid',
+                            'errors': {name: list(errors) for name, errors in form.errors.items()}})
+            continue
+        report = form.save(commit=False)
+        report.client_key = key
+        report.campus = campus
+        reports[key] = report
+        results.append({'key': key, 'status': 'created'})
+
+    for report, code in zip(reports.values(), refcodes.next_reference_codes(len(reports))):
+        report.reference_code = code
+    try:
+        with transaction.atomic():
+            created = HandInReport.objects.bulk_create(reports.values())
+            outbox.emit_many('HandInSaved', [{'id': report.pk} for report in created])
+    except IntegrityError:
+        # The same batch is being synced by another request that got there first; its reports win
+        if not retry:
+            raise
+        return sync(entries, campus, retry=False)
+    for report in created:
+        suggest.record(report)
+    if created:
+        metrics.inc('handins_reported_total', len(created), source='kiosk')
+
+    codes = {**known, **{key: report.reference_code for key, report in reports.items()}}
+    for result in results:
+        if result['status'] != 'invalid':
+            result['reference_code'] = codes[result['key']]
+    return results
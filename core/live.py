@@ -0,0 +1,45 @@
+"""
+Live status for the student dashboard.
+
+Each student has a version counter in the cache. The outbox dispatcher
+calls bump() when a transition changes a student's tickets or claims. The
+dashboard polls `student_status` every LIVE_POLL_SECONDS, which compares the
+version it has with the cached one and answers at once, without touching
+the database. The page only re-fetches itself when something actually
+changed, instead of students hammering refresh.
+
+A short poll rather than a long-poll or SSE: with gthread workers, a request
+that waits pins a thread for as long as it waits, and a few dozen open tabs
+would take every thread. A poll costs one cache read and frees its thread
+straight away. Tabs in the background don't poll.
+
+The bumps come from the dispatcher process, so the web workers only see
+them through a shared cache (REDIS_URL). LIVE_UPDATES is off without one,
+and the deploy check core.E007 refuses to boot with it forced on.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _key(user_id):
+    return f'live:student:{user_id}'
+
+
+def version(user_id):
+    value = cache.get(_key(user_id))
+    if value is None:
+        # Seed from the clock so a cache flush never hands out an old number again
+        cache.add(_key(user_id), int(time.time() * 1000), timeout=None)
+        value = cache.get(_key(user_id))
+    return value
+
+
+def bump(*user_ids):
+    for user_id in set(filter(None, user_ids)):
+        try:
+            cache.incr(_key(user_id))
+        except ValueError:  # not in the cache yet
+            version(user_id)
+            cache.incr(_key(user_id))
+
@@ -0,0 +1,94 @@
+"""
+Log handling that never makes a request wait.
+
+settings.LOGGING sends every record to QueuedHandler. The handler only puts
+the record on a bounded queue. A background QueueListener thread formats it
+and writes it to stderr. A slow or blocked stderr pipe (a stalled log shipper,
+a full disk) then stalls that thread instead of a gunicorn worker. When the
+queue is full the record is dropped and counted; /metrics reports the count
+as log_records_dropped_total.
+
+JsonFormatter writes one JSON object per line for the log shipper. Fields
+passed with `extra=` become top-level keys.
+
+Settings load this module before the apps are ready, so it must not import
+models or anything that does.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+dropped = 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _STANDARD)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class QueuedHandler(logging.handlers.QueueHandler):
+    """Hands records to a background thread that writes them to stderr. The formatter applies there."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.target = logging.StreamHandler(sys.stderr)
+        super().__init__(queue.Queue(maxsize))
+        self._start()
+        atexit.register(self.close)
+
+    def _start(self):
+        self.pid = os.getpid()
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Render what depends on live objects now; the thread may see them after they changed
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        global dropped
+        if os.getpid() != self.pid:
+            # Forked after logging was set up (gunicorn --preload): the listener thread stayed in the parent
+            self.queue = queue.Queue(self.maxsize)
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped += 1
+
+    def close(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()  # writes out what is still queued
+        self.listener = None
+        super().close()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = "Move finished records past ARCHIVE_AFTER_DAYS into the archive (run nightly from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.2, help="Seconds to sleep between batches")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be moved")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for kind, n in archive.pending().items():
+                self.stdout.write(f"{kind.label}: {n} due")
+            return
+
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        moved = archive.run(batch_size=options['batch_size'], pause=options['pause'], log=log)
+        summary = ', '.join(f"{kind.label}: {n}" for kind, n in moved.items())
+        self.stdout.write(self.style.SUCCESS(f"Archived. {summary}"))
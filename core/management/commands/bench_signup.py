@@ -0,0 +1,68 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from core.forms import StudentSignUpForm
+from core.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure signup throughput of one worker: StudentSignUpForm validation "
+        "(including the password validators) plus hashing and insert. "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50)
+        parser.add_argument('--hasher', action='append', dest='hashers',
+                            help="Hasher class path to test; repeat to compare. Defaults to PASSWORD_HASHERS[0].")
+
+    def handle(self, *args, **options):
+        hashers = options['hashers'] or [settings.PASSWORD_HASHERS[0]]
+        for hasher in hashers:
+            order = [hasher] + [h for h in settings.PASSWORD_HASHERS if h != hasher]
+            with override_settings(PASSWORD_HASHERS=order):
+                validate, save = self.run(options['count'])
+            total = validate + save
+            self.stdout.write(
+                f"{hasher.rsplit('.', 1)[-1]}: {options['count'] / total:.1f} signups/s "
+                f"(validate {validate / options['count'] * 1000:.1f} ms, "
+                f"hash+insert {save / options['count'] * 1000:.1f} ms per signup)"
+            )
+
+    def run(self, count):
+        # Find a block of unused student IDs so the uniqueness check passes
+        base = 9000000
+        while CustomUser.objects.filter(student_id__gte=str(base), student_id__lt=str(base + count)).exists():
+            base -= count
+            if base < 1000000:
+                raise CommandError("No free block of student IDs for the benchmark.")
+
+        validate = save = 0.0
+        with transaction.atomic():
+            for i in range(count):
+                password = uuid.uuid4().hex
+                form = StudentSignUpForm({
+                    'username': f"bench_{uuid.uuid4().hex[:12]}",
+                    'email': 'bench@example.com',
+                    'first_name': 'Bench',
+                    'last_name': 'Mark',
+                    'student_id': str(base + i),
+                    'password1': password,
+                    'password2': password,
+                })
+                start = time.perf_counter()
+                if not form.is_valid():
+                    raise CommandError(f"Benchmark form invalid: {form.errors.as_text()}")
+                middle = time.perf_counter()
+                form.save()
+                end = time.perf_counter()
+                validate += middle - start
+                save += end - middle
+            transaction.set_rollback(True)
+        return validate, save
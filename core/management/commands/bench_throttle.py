@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core import throttling
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what the throttle costs per request against the configured cache "
+        "(LocMem by default, Redis when REDIS_URL is set)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=1000, help="Distinct client addresses to spread hits over")
+
+    def handle(self, *args, **options):
+        n, clients = options['iterations'], options['clients']
+        backend = settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]
+
+        # A rate nobody reaches, so every call does the full get + set
+        rate = f'{n * 10}/s'
+        per_call = self.timed(n, lambda i: throttling.hit('bench', f'ip:10.0.{i % clients // 256}.{i % 256}', rate))
+        self.report("hit() allowed", per_call)
+
+        # Empty bucket: the rejection path is a get only
+        throttling.hit('bench-full', 'ip:10.9.9.9', '1/d')
+        per_call = self.timed(n, lambda i: throttling.hit('bench-full', 'ip:10.9.9.9', '1/d'))
+        self.report("hit() rejected", per_call)
+
+        # Whole decorator around a view that does nothing
+        def view(request):
+            return HttpResponse()
+        settings.THROTTLE_RATES['bench'] = rate
+        throttled_view = throttling.throttle('bench', methods=['POST'])(view)
+        factory = RequestFactory()
+        requests = [factory.post('/', REMOTE_ADDR=f'10.1.{i // 256 % 256}.{i % 256}') for i in range(clients)]
+        for request in requests:
+            request.user = AnonymousUser()
+
+        bare = self.timed(n, lambda i: view(requests[i % clients]))
+        wrapped = self.timed(n, lambda i: throttled_view(requests[i % clients]))
+        self.report("decorator overhead", wrapped - bare)
+
+        cache.delete('throttle:bench-full:ip:10.9.9.9')
+        self.stdout.write(self.style.SUCCESS(f"{n} iterations against {backend}"))
+
+    def timed(self, n, fn):
+        started = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        return (time.perf_counter() - started) / n
+
+    def report(self, label, seconds):
+        self.stdout.write(f"{label:20} {seconds * 1e6:8.1f} µs/request")
@@ -0,0 +1,104 @@
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import NoReverseMatch, reverse
+
+from core.models import CustomUser
+
+DEFAULT_URLS = ['home', 'item_gallery', 'hand_in']
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive views through the full middleware stack from a thread pool, the way "
+        "gunicorn threads would, and report latency and how many DB connections were "
+        "opened. Run it against the real database, e.g. once with DB_POOL=0 and once "
+        "with DB_POOL=1, to compare connection settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help=f"URL name or path; repeatable (default: {', '.join(DEFAULT_URLS)})")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per URL")
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--user', help="Log in as this user first (for dashboard pages)")
+
+    def handle(self, *args, **options):
+        urls = [self.resolve(u) for u in (options['urls'] or DEFAULT_URLS)]
+        user = None
+        if options['user']:
+            try:
+                user = CustomUser.objects.get(username=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"No user named {options['user']}")
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+
+        lock = threading.Lock()
+        opened = [0]
+        timings = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+        local = threading.local()
+
+        def count_connection(sender, **kwargs):
+            with lock:
+                opened[0] += 1
+
+        def fetch(url):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client(HTTP_HOST=host)
+                if user:
+                    client.force_login(user)
+            start = time.perf_counter()
+            # The test client skips the request_started/finished connection
+            # handling, so do it here to match a real worker.
+            close_old_connections()
+            response = client.get(url)
+            close_old_connections()
+            elapsed = time.perf_counter() - start
+            with lock:
+                timings[url].append(elapsed)
+                statuses[url][response.status_code] += 1
+
+        def close_thread_connections(_):
+            connections.close_all()
+
+        work = [url for _ in range(options['requests']) for url in urls]
+        connection_created.connect(count_connection)
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                list(pool.map(fetch, work))
+                list(pool.map(close_thread_connections, range(options['threads'])))
+            wall = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(count_connection)
+
+        for url in urls:
+            samples = sorted(timings[url])
+            p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) >= 20 else samples[-1]
+            codes = ', '.join(f"{code}x{n}" for code, n in sorted(statuses[url].items()))
+            self.stdout.write(
+                f"{url:40} p50 {statistics.median(samples) * 1000:7.1f} ms   "
+                f"p95 {p95 * 1000:7.1f} ms   max {samples[-1] * 1000:7.1f} ms   [{codes}]"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(work)} requests in {wall:.2f}s = {len(work) / wall:.1f} req/s "
+            f"with {options['threads']} threads; {opened[0]} DB connections opened"
+        ))
+
+    def resolve(self, url):
+        if url.startswith('/'):
+            return url
+        try:
+            return reverse(url)
+        except NoReverseMatch:
+            raise CommandError(f"Unknown URL name: {url}")
@@ -0,0 +1,101 @@
+import json
+import os
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Style classes, not icons
+STYLES = {
+    'fa-solid': ('solid', 'fa-solid-900.woff2', '"Font Awesome 6 Free"', 900),
+    'fa-regular': ('regular', 'fa-regular-400.woff2', '"Font Awesome 6 Free"', 400),
+    'fa-brands': ('brands', 'fa-brands-400.woff2', '"Font Awesome 6 Brands"', 400),
+}
+ICON_CLASS = re.compile(r'\bfa-[a-z0-9-]+\b')
+
+
+class Command(BaseCommand):
+    help = (
+        "Self-host only the Font Awesome icons the templates use: subsets the "
+        "webfonts to those glyphs and writes a matching stylesheet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=os.path.join(settings.BASE_DIR, 'assets', 'vendor', 'fontawesome-free'),
+                            help="Unpacked @fortawesome/fontawesome-free package")
+        parser.add_argument('--output', default=os.path.join(settings.BASE_DIR, 'static', 'vendor', 'fontawesome'))
+
+    def handle(self, *args, **options):
+        try:
+            from fontTools import subset
+        except ImportError:
+            raise CommandError("build_icons needs fonttools (and brotli for woff2): pip install fonttools brotli")
+
+        metadata_path = os.path.join(options['source'], 'metadata', 'icons.json')
+        if not os.path.exists(metadata_path):
+            raise CommandError(f"Font Awesome metadata not found at {metadata_path}")
+        with open(metadata_path, encoding='utf-8') as fh:
+            metadata = json.load(fh)
+
+        # Old names like fa-search still work through the aliases
+        by_name = {}
+        for name, icon in metadata.items():
+            by_name[name] = icon
+            for alias in (icon.get('aliases') or {}).get('names', []):
+                by_name[alias] = icon
+
+        used_classes, used_styles = self.scan_templates()
+        icons, unknown = {}, []
+        for css_class in sorted(used_classes):
+            icon = by_name.get(css_class[len('fa-'):])
+            if icon is None:
+                unknown.append(css_class)
+            else:
+                icons[css_class] = icon
+        for css_class in unknown:
+            self.stderr.write(f"Skipping {css_class}: not a Font Awesome icon")
+
+        os.makedirs(options['output'], exist_ok=True)
+        css = []
+        for style_class in sorted(used_styles):
+            style, font_file, family, weight = STYLES[style_class]
+            codepoints = {int(icon['unicode'], 16) for icon in icons.values() if style in icon['styles']}
+            if not codepoints:
+                continue
+
+            font = subset.load_font(os.path.join(options['source'], 'webfonts', font_file), subset.Options())
+            subsetter = subset.Subsetter(subset.Options())
+            subsetter.populate(unicodes=codepoints)
+            subsetter.subset(font)
+            font.flavor = 'woff2'
+            font.save(os.path.join(options['output'], font_file))
+
+            css.append(
+                f'@font-face{{font-family:{family};font-style:normal;font-weight:{weight};'
+                f'font-display:block;src:url({font_file}) format("woff2")}}'
+            )
+            css.append(f'.{style_class}{{font-family:{family};font-weight:{weight}}}')
+
+        css.append(
+            ','.join(f'.{c}' for c in sorted(used_styles)) +
+            '{-moz-osx-font-smoothing:grayscale;-webkit-font-smoothing:antialiased;'
+            'display:inline-block;font-style:normal;font-variant:normal;line-height:1;text-rendering:auto}'
+        )
+        for css_class, icon in icons.items():
+            css.append(f'.{css_class}::before{{content:"\\{icon["unicode"]}"}}')
+
+        with open(os.path.join(options['output'], 'icons.css'), 'w', encoding='utf-8') as fh:
+            fh.write('\n'.join(css) + '\n')
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(icons)} icons in {len(used_styles)} styles to {options['output']}"))
+
+    def scan_templates(self):
+        classes, styles = set(), set()
+        for template_dir in settings.TEMPLATES[0]['DIRS']:
+            for root, _, files in os.walk(template_dir):
+                for filename in files:
+                    if not filename.endswith('.html'):
+                        continue
+                    with open(os.path.join(root, filename), encoding='utf-8') as fh:
+                        for match in ICON_CLASS.findall(fh.read()):
+                            (styles if match in STYLES else classes).add(match)
+        return classes, styles
@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver outbox events (audit entries, duplicate/photo indexing, dashboard refreshes). "
+        "Runs as a long-lived worker next to the web process; several can run at once on Postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--stats-every', type=float, default=60.0, help="Seconds between backlog reports")
+        parser.add_argument('--once', action='store_true', help="Drain what is due now, then exit")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        next_report = 0
+        next_purge = 0
+        try:
+            while True:
+                close_old_connections()
+                taken = outbox.dispatch(batch_size)
+
+                now = time.monotonic()
+                if now >= next_report:
+                    self.report(outbox.stats())
+                    next_report = now + options['stats_every']
+                if now >= next_purge:
+                    purged = outbox.purge()
+                    if purged:
+                        self.stdout.write(f"Purged {purged} delivered events.")
+                    next_purge = now + 3600
+
+                if taken < batch_size:
+                    if options['once']:
+                        break
+                    # A full batch means there is more waiting: go again without sleeping
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+        self.report(outbox.stats())
+
+    def report(self, stats):
+        line = (
+            f"outbox: {stats['pending']} pending ({stats['retrying']} retrying), {stats['dead']} dead, "
+            f"lag {stats['lag_seconds']}s, {stats['dispatched_last_minute']} delivered in the last minute"
+        )
+        if stats['lag_seconds'] > settings.OUTBOX_LAG_WARNING or stats['dead']:
+            self.stderr.write(self.style.WARNING(line))
+        else:
+            self.stdout.write(line)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import disposal
+from core.models import ItemCategory
+
+
+class Command(BaseCommand):
+    help = (
+        "Warn owners of matched tickets about items nearing their retention limit and "
+        "donate the ones past it (run daily from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Only count what is due, per category")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            now = timezone.now()
+            for category, label in ItemCategory.choices:
+                notice = disposal.due_for_notice(category, now.date()).count()
+                due = disposal.due_for_disposal(category, now.date(), now).count()
+                self.stdout.write(f"{label:20} retention {disposal.retention_days(category):4} days   "
+                                  f"notice due {notice:5}   disposal due {due:5}")
+            return
+
+        noticed, tickets, disposed = disposal.run(batch_size=options['batch_size'])
+        total = sum(len(ids) for ids in disposed.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Warned about {len(noticed)} items ({len(tickets)} matched tickets); disposed of {total} items."
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import fingerprints
+
+
+class Command(BaseCommand):
+    help = (
+        "Fingerprint photos uploaded before photo matching existed (or after a failed "
+        "upload-time attempt). Photos that already have an up-to-date fingerprint are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=fingerprints.Source.values,
+                            help="Only one kind of photo")
+
+    def handle(self, *args, **options):
+        for model, (source, field) in fingerprints.IMAGE_FIELDS.items():
+            if options['source'] and source != options['source']:
+                continue
+            manager = model._base_manager
+            queryset = manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            done = set(fingerprints.ImageFingerprint.objects.filter(source=source).values_list('object_id', flat=True))
+
+            started, count, failed = time.perf_counter(), 0, 0
+            for instance in queryset.exclude(pk__in=done).iterator(chunk_size=200):
+                if fingerprints.index(instance):
+                    count += 1
+                else:
+                    failed += 1
+            self.stdout.write(
+                f"{fingerprints.Source(source).label}: {count} fingerprinted, {failed} unreadable "
+                f"({time.perf_counter() - started:.1f}s)"
+            )
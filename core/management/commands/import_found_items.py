@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importers import detect_format, import_found_items, iter_rows
+from core.models import Campus, CustomUser
+
+
+class Command(BaseCommand):
+    help = "Import found items from a CSV or JSON Lines file (e.g. the paper-ledger backlog)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or .jsonl file to import")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension")
+        parser.add_argument('--images', dest='image_dir', help="Directory holding the photos named in the item_image column")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=4, help="Parallel image copies")
+        parser.add_argument('--user', help="Username recorded as registered_by")
+        parser.add_argument('--campus', help="Campus code the items belong to (default: the user's, else DEFAULT_CAMPUS)")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = CustomUser.objects.get(username=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"No user named {options['user']}")
+
+        campus = None
+        if options['campus']:
+            campus = Campus.objects.filter(code=options['campus']).first()
+            if campus is None:
+                raise CommandError(f"No campus with code {options['campus']}")
+
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        try:
+            stream = open(path, encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with stream:
+            result = import_found_items(
+                iter_rows(stream, fmt),
+                registered_by=user,
+                batch_size=options['batch_size'],
+                image_dir=options['image_dir'],
+                workers=options['workers'],
+                source=path,
+                campus=campus,
+            )
+
+        for number, message in result.errors:
+            self.stderr.write(f"row {number}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} items in {result.batches} batches ({result.skipped} rows skipped)."
+        ))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import uploads
+
+
+class Command(BaseCommand):
+    help = "Delete staged chunked uploads that were abandoned or already used (run from cron, e.g. hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=settings.UPLOAD_STAGING_HOURS,
+            help="Keep uploads started within this many hours",
+        )
+
+    def handle(self, *args, **options):
+        purged = uploads.purge(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} staged uploads."))
@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import analytics, archive
+
+
+class Command(BaseCommand):
+    help = "Rebuild the analytics rollups for recent days (run from cron, e.g. hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help="How many days back to rebuild, including today")
+        parser.add_argument('--full', action='store_true', help="Rebuild everything since the first record")
+
+    def handle(self, *args, **options):
+        end = timezone.localdate()  # the day TruncDate puts today's rows in
+        if options['full']:
+            start = analytics.earliest_activity() or end
+            # Part of those days now lives in the archive; rebuilding them would undercount
+            frozen = archive.frozen_before()
+            if frozen and frozen > start:
+                self.stdout.write(f"Keeping the rollups before {frozen}; those days are partly archived.")
+                start = frozen
+        else:
+            start = end - datetime.timedelta(days=options['days'] - 1)
+
+        # Rebuild a month at a time so a full backfill never holds one huge transaction
+        rows = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + datetime.timedelta(days=30), end)
+            rows += analytics.refresh(chunk_start, chunk_end)
+            chunk_start = chunk_end + datetime.timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup rows for {start} to {end}."))
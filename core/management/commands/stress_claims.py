@@ -0,0 +1,110 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from core import transitions
+from core.models import AuditLog, ClaimRequest, CustomUser, FoundItem, ItemCategory, OutboxEvent
+from core.transitions import TransitionError
+
+PREFIX = 'stress-claims'
+
+
+def free_student_ids(count):
+    """`count` unused 7-digit student IDs, counting down from 9999999 (real IDs start low)."""
+    taken = set(CustomUser.objects.filter(student_id__startswith='9').values_list('student_id', flat=True))
+    return list(islice((sid for sid in map(str, range(9999999, 999999, -1)) if sid not in taken), count))
+
+
+class Command(BaseCommand):
+    help = (
+        "Race approvals of competing claims on the same item from a thread pool and "
+        "check that exactly one wins. Run it against a local Postgres; on SQLite "
+        "writers are serialised anyway, so it proves much less. Creates its own "
+        "users and items and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--claims', type=int, default=8, help="Competing claims per item")
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                f"Running on {connection.vendor}: select_for_update is a no-op here, only the CAS writes are exercised."
+            ))
+
+        staff = CustomUser.objects.create_user(f'{PREFIX}-staff', role='STAFF')
+        students = [
+            CustomUser.objects.create_user(f'{PREFIX}-{i}', role='STUDENT', student_id=student_id)
+            for i, student_id in enumerate(free_student_ids(options['claims']))
+        ]
+        items = []
+        started = timezone.now()
+        barrier = threading.Barrier(options['threads'])
+        failures = []
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                for n in range(options['rounds']):
+                    item = FoundItem.objects.create(
+                        item_name=f'{PREFIX} item {n}', category=ItemCategory.OTHERS, description='-', color='-',
+                        date_found=timezone.now().date(), location_found='-', registered_by=staff,
+                    )
+                    items.append(item)
+
+                    # Two tabs submitting the same claim: the constraint lets one through
+                    opened = list(pool.map(
+                        lambda _: self.attempt(barrier, transitions.open_claim,
+                                               ClaimRequest(proof_of_ownership='-'), item, students[0]),
+                        range(options['threads']),
+                    ))
+                    if opened.count(True) != 1:
+                        failures.append(f"round {n}: {opened.count(True)} duplicate claims were accepted")
+
+                    claims = [ClaimRequest.objects.get(found_item=item, claimant=students[0])] + [
+                        transitions.open_claim(ClaimRequest(proof_of_ownership='-'), item, student)
+                        for student in students[1:]
+                    ]
+                    # Every thread approves a different claim on the same item at the same moment
+                    work = [claims[i % len(claims)].id for i in range(options['threads'])]
+                    approved = list(pool.map(
+                        lambda claim_id: self.attempt(barrier, transitions.approve_claim, claim_id, staff), work,
+                    ))
+
+                    statuses = list(ClaimRequest.objects.filter(found_item=item).values_list('status', flat=True))
+                    item.refresh_from_db()
+                    if approved.count(True) != 1:
+                        failures.append(f"round {n}: {approved.count(True)} approvals succeeded")
+                    if statuses.count(ClaimRequest.Status.APPROVED) != 1 or ClaimRequest.Status.PENDING in statuses:
+                        failures.append(f"round {n}: claim statuses ended as {sorted(statuses)}")
+                    if item.current_status != FoundItem.Status.CLAIMED:
+                        failures.append(f"round {n}: item ended as {item.current_status}")
+
+                list(pool.map(lambda _: connections.close_all(), range(options['threads'])))
+        finally:
+            AuditLog.objects.filter(target_model='FoundItem', target_object_id__in=[str(i.id) for i in items]).delete()
+            AuditLog.objects.filter(actor__username__startswith=PREFIX).delete()
+            # Undelivered events about the rows we delete would only fail in the dispatcher
+            OutboxEvent.objects.filter(created_at__gte=started, dispatched_at__isnull=True).delete()
+            FoundItem.objects.filter(id__in=[i.id for i in items]).delete()
+            CustomUser.objects.filter(username__startswith=PREFIX).delete()
+
+        for failure in failures:
+            self.stderr.write(failure)
+        if failures:
+            raise CommandError(f"{len(failures)} invariant violations in {options['rounds']} rounds")
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['rounds']} rounds x {options['threads']} threads: one claim approved per item every time."
+        ))
+
+    def attempt(self, barrier, transition, *args):
+        barrier.wait()
+        try:
+            transition(*args)
+            return True
+        except TransitionError:
+            return False
@@ -0,0 +1,98 @@
+"""
+Media delivery.
+
+Found-item photos are public. Everything else (lost-ticket photos, claim
+evidence) is only reachable through short-lived signed URLs. MediaStorage
+adds the signature in url(), so templates keep using `{{ obj.image.url }}`.
+Only pages already limited to the right staff/owner render those URLs.
+
+serve_media hands the actual bytes to the web server when it can:
+- MEDIA_ACCEL_REDIRECT_PREFIX: nginx internal location (X-Accel-Redirect)
+- MEDIA_SENDFILE_HEADER: e.g. X-Sendfile for Apache/lighttpd
+- otherwise a FileResponse, which gunicorn sends with sendfile(2)
+
+Stored names never change (storage doesn't overwrite), so public files are
+cached as immutable.
+"""
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.views.decorators.http import require_GET
+
+_signer = signing.TimestampSigner(salt='core.media')
+
+PUBLIC_CACHE = 'public, max-age=31536000, immutable'
+
+
+def is_public(name):
+    return name.startswith(tuple(settings.MEDIA_PUBLIC_PREFIXES))
+
+
+def sign(name):
+    # Keep only the timestamp:signature part; the path is already in the URL
+    return _signer.sign(name)[len(name) + 1:]
+
+
+def verify(name, token):
+    try:
+        _signer.unsign(f"{name}:{token}", max_age=settings.MEDIA_SIGNED_URL_TTL)
+        return True
+    except signing.BadSignature:  # includes SignatureExpired
+        return False
+
+
+class MediaStorage(FileSystemStorage):
+    def url(self, name):
+        url = super().url(name)
+        if name and not is_public(name):
+            url += '?' + urlencode({'t': sign(name)})
+        return url
+
+
+def clean_name(path):
+    """The storage name a URL path stands for, or None if it tries to leave its folder."""
+    if not path or path.startswith('/') or '\\' in path or '..' in path.split('/'):
+        return None
+    name = posixpath.normpath(path)
+    if name in ('.', '..') or name.startswith(('/', '../')):
+        return None
+    return name
+
+
+@require_GET
+def serve_media(request, path):
+    # Checked on the normalised name: "found_items/../claims_evidence/x" isn't public
+    name = clean_name(path)
+    if name is None:
+        raise Http404()
+    if not is_public(name) and not verify(name, request.GET.get('t', '')):
+        raise Http404("Media link expired or invalid.")
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except ValueError:
+        raise Http404()
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    cache_control = PUBLIC_CACHE if is_public(name) else f'private, max-age={settings.MEDIA_SIGNED_URL_TTL}'
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+    elif settings.MEDIA_SENDFILE_HEADER:
+        response = HttpResponse(content_type=content_type)
+        response[settings.MEDIA_SENDFILE_HEADER] = full_path
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,262 @@
+"""
+Prometheus metrics, served at /metrics.
+
+MetricsMiddleware records every request under its URL name:
+- the count, by method and status;
+- the latency, as a histogram;
+- the number of database queries it ran and the time they took.
+
+The cache backends below count hits and misses. Domain counters (hand-ins,
+claims, the match tool) are bumped where those things happen, with inc(),
+observe() and timer().
+
+Each gunicorn worker keeps its numbers in memory. An observation is a dict
+update under a lock. At most every METRICS_FLUSH_SECONDS, the worker copies
+a snapshot into the cache under its own key. /metrics adds up the snapshots
+of every live worker, so whichever worker answers the scrape reports the
+whole deployment. A worker that stops flushing drops out after
+METRICS_WORKER_TTL, and Prometheus reads the lower total as a counter reset.
+Like live.py, this needs the shared cache (REDIS_URL) once there is more
+than one worker process.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends import locmem, redis
+from django.db import connections
+
+from . import logs
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics:'
+WORKERS_KEY = 'metrics:workers'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', "Requests by URL name, method and status.", None),
+    'http_request_duration_seconds': ('histogram', "Request latency by URL name.", LATENCY_BUCKETS),
+    'db_queries_total': ('counter', "Database queries by URL name.", None),
+    'db_query_seconds_total': ('counter', "Time spent in database queries by URL name.", None),
+    'cache_requests_total': ('counter', "Cache lookups by key prefix and result (hit or miss).", None),
+    'handins_reported_total': ('counter', "Hand-in reports created, by source (form or kiosk).", None),
+    'handins_received_total': ('counter', "Hand-ins turned into inventory items.", None),
+    'claims_approved_total': ('counter', "Claims approved.", None),
+    'claims_rejected_total': ('counter', "Claims rejected by staff.", None),
+    'claims_completed_total': ('counter', "Approved claims whose item was picked up.", None),
+    'match_tool_duration_seconds': ('histogram', "Time to run the match tool's searches.", LATENCY_BUCKETS),
+    'log_records_dropped_total': ('counter', "Log records dropped because the log queue was full.", None),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)  # (name, labels) -> value
+_histograms = {}                # (name, labels) -> [count per bucket..., count over the last bucket, sum]
+_next_flush = 0.0
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        _counters[name, _labels(labels)] += amount
+
+
+def observe(name, value, **labels):
+    buckets = METRICS[name][2]
+    with _lock:
+        series = _histograms.get((name, _labels(labels)))
+        if series is None:
+            series = _histograms[name, _labels(labels)] = [0] * (len(buckets) + 1) + [0.0]
+        series[next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))] += 1
+        series[-1] += value
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+# --- Requests ---------------------------------------------------------------------
+
+class QueryTimer:
+    """execute_wrapper that counts and times a request's queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+    @contextmanager
+    def watching(self):
+        with ExitStack() as stack:
+            for alias in connections:  # the replica too; no connection is opened by this
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield
+
+
+def record_request(request, response, duration, queries):
+    match = request.resolver_match
+    view = match.view_name if match else 'unmatched'
+    inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+    observe('http_request_duration_seconds', duration, view=view)
+    if queries.count:
+        inc('db_queries_total', queries.count, view=view)
+        inc('db_query_seconds_total', queries.seconds, view=view)
+    if duration >= settings.METRICS_SLOW_REQUEST_SECONDS:
+        logger.warning("Slow request: %s %s", request.method, request.path, extra={
+            'view': view, 'status': response.status_code, 'duration_ms': round(duration * 1000),
+            'queries': queries.count, 'query_ms': round(queries.seconds * 1000),
+        })
+    flush()
+
+
+# --- Cache hit ratio --------------------------------------------------------------
+
+def _count_lookup(key, hits, misses):
+    if key.startswith(KEY_PREFIX):
+        return  # our own flushes
+    prefix = key.split(':', 1)[0] if ':' in key else 'other'  # sessions' keys have no prefix worth a label
+    with _lock:
+        if hits:
+            _counters['cache_requests_total', (('prefix', prefix), ('result', 'hit'))] += hits
+        if misses:
+            _counters['cache_requests_total', (('prefix', prefix), ('result', 'miss'))] += misses
+
+
+class CountingCacheMixin:
+    _unset = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._unset, version)
+        found = value is not self._unset
+        _count_lookup(str(key), int(found), int(not found))
+        return value if found else default
+
+
+class LocMemCache(CountingCacheMixin, locmem.LocMemCache):
+    pass  # get_many() goes through get()
+
+
+class RedisCache(CountingCacheMixin, redis.RedisCache):
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        for key in keys:
+            _count_lookup(str(key), int(key in values), int(key not in values))
+        return values
+
+
+# --- Sharing between workers ------------------------------------------------------
+
+def _worker():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _snapshot():
+    with _lock:
+        if logs.dropped:
+            _counters['log_records_dropped_total', ()] = logs.dropped
+        return {'counters': dict(_counters), 'histograms': {key: list(series) for key, series in _histograms.items()}}
+
+
+def flush(force=False):
+    """Publish this worker's numbers, at most every METRICS_FLUSH_SECONDS."""
+    global _next_flush
+    now = time.monotonic()
+    if not force and now < _next_flush:
+        return
+    _next_flush = now + settings.METRICS_FLUSH_SECONDS
+    worker = _worker()
+    try:
+        cache.set(KEY_PREFIX + worker, _snapshot(), settings.METRICS_WORKER_TTL)
+        workers = cache.get(WORKERS_KEY) or []
+        # Read-modify-write: a worker that loses a race adds itself again on its next flush
+        if worker not in workers:
+            cache.set(WORKERS_KEY, workers + [worker], None)
+    except Exception:
+        logger.warning("Could not publish metrics", exc_info=True)
+
+
+def collect():
+    """Everyone's numbers added up: (counters, histograms)."""
+    flush(force=True)
+    workers = cache.get(WORKERS_KEY) or []
+    snapshots = cache.get_many([KEY_PREFIX + worker for worker in workers])
+    if len(snapshots) < len(workers):  # forget the workers that stopped
+        cache.set(WORKERS_KEY, [worker for worker in workers if KEY_PREFIX + worker in snapshots], None)
+
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots.values():
+        for key, value in snapshot['counters'].items():
+            counters[key] += value
+        for key, series in snapshot['histograms'].items():
+            total = histograms.setdefault(key, [0] * len(series))
+            histograms[key] = [a + b for a, b in zip(total, series)]
+    return counters, histograms
+
+
+# --- Exposition -------------------------------------------------------------------
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render():
+    """The Prometheus text format (0.0.4)."""
+    from . import outbox  # needs the models; this module is loaded with the cache backend
+
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_number(value)}')
+            continue
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), series[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels((*labels, ("le", str(bound))))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_number(series[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    # Read from the database at scrape time, not collected
+    stats = outbox.stats()
+    lines += ['# HELP outbox_events Outbox events not yet delivered, by state.', '# TYPE outbox_events gauge']
+    lines += [f'outbox_events{{state="{state}"}} {stats[state]}' for state in ('pending', 'retrying', 'dead')]
+    lines += ['# HELP outbox_lag_seconds Age of the oldest undelivered outbox event.', '# TYPE outbox_lag_seconds gauge',
+              f'outbox_lag_seconds {stats["lag_seconds"]}']
+    return '\n'.join(lines) + '\n'
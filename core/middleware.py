@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.shortcuts import render
+
+from . import metrics, tenancy, uploads
+from .routers import pinned_to_primary
+
+PIN_COOKIE = 'db_pin'
+
+
+class MetricsMiddleware:
+    """Latency, status and database time of every request, per URL name (see core/metrics.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = metrics.QueryTimer()
+        start = time.perf_counter()
+        with queries.watching():
+            response = self.get_response(request)
+        metrics.record_request(request, response, time.perf_counter() - start, queries)
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    After a non-GET request, keep the same browser on the primary database for
+    REPLICA_PIN_SECONDS so it reads its own writes (see core/routers.py).
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = PIN_COOKIE in request.COOKIES or request.method not in self.SAFE_METHODS
+        with pinned_to_primary(pinned):
+            response = self.get_response(request)
+
+        if request.method not in self.SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class CampusMiddleware:
+    """Scope the request's queries to one campus (see core/tenancy.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.campus = tenancy.resolve(request)
+        with tenancy.activate(request.campus):
+            return self.get_response(request)
+
+
+class UploadLimitMiddleware:
+    """Answer 413 to uploads far over UPLOAD_MAX_BYTES before their body is read (see core/uploads.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if uploads.request_too_large(request):
+            return render(request, 'upload_too_large.html', {
+                'limit_mb': settings.UPLOAD_MAX_BYTES // (1024 * 1024),
+            }, status=413)
+        return self.get_response(request)
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:52
+
+from django.db import migrations, models
+
+SEQUENCE_NAME = 'core_handin_reference_seq'
+
+
+def create_sequence(apps, schema_editor):
+    # Postgres hands out reference numbers from a native sequence; other
+    # backends fall back to the SequenceCounter table.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} START 1 CACHE 20")
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_lostitemticket_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
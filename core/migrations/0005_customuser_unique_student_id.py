@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:54
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+
+def clear_duplicate_student_ids(apps, schema_editor):
+    # Keep the ID on the oldest account; later sign-ups with the same ID lose
+    # it and are listed so support can sort out who the student really is
+    CustomUser = apps.get_model('core', 'CustomUser')
+    duplicated = (
+        CustomUser.objects.exclude(student_id__isnull=True).exclude(student_id='')
+        .values('student_id').annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for row in duplicated:
+        accounts = CustomUser.objects.filter(student_id=row['student_id']).order_by('date_joined', 'id')
+        later = list(accounts.values_list('id', 'username')[1:])
+        CustomUser.objects.filter(id__in=[pk for pk, _ in later]).update(student_id=None)
+        logger.warning(
+            "Student ID %s was shared; cleared it on: %s", row['student_id'], ', '.join(name for _, name in later),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0004_handin_reference_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_student_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(condition=models.Q(('student_id__isnull', False), models.Q(('student_id', ''), _negated=True)), fields=('student_id',), name='unique_student_id'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_customuser_unique_student_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('HANDIN', 'Hand-in Report'), ('ITEM', 'Found Item')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('minhash', models.JSONField(default=list)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'object_id'), name='unique_item_signature')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SignatureBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=16)),
+                ('signature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='core.itemsignature')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Review'), ('MERGED', 'Merged'), ('DISMISSED', 'Not a Duplicate')], default='PENDING', max_length=20)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('found_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='core.founditem')),
+                ('hand_in', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='core.handinreport')),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviewed_duplicates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hand_in', 'found_item'), name='unique_duplicate_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:04
+
+from django.db import migrations, models
+
+
+def backfill_reviewed_at(apps, schema_editor):
+    # Reviews before this migration only left a trace in the audit log
+    ClaimRequest = apps.get_model('core', 'ClaimRequest')
+    AuditLog = apps.get_model('core', 'AuditLog')
+    reviewed = ClaimRequest.objects.filter(reviewed_at__isnull=True).exclude(status='PENDING')
+    for claim in reviewed.iterator():
+        log = AuditLog.objects.filter(
+            target_model='ClaimRequest', target_object_id=str(claim.id), action=f'CLAIM_{claim.status}'
+        ).order_by('timestamp').first()
+        claim.reviewed_at = log.timestamp if log else claim.request_date
+        claim.save(update_fields=['reviewed_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claimrequest',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(choices=[('FOUND', 'Items Registered'), ('CLAIMED', 'Items Claimed'), ('TICKET_OPENED', 'Lost Tickets Opened'), ('HAND_IN', 'Hand-in Reports')], max_length=20)),
+                ('category', models.CharField(choices=[('ELECTRONICS', 'Electronics'), ('CLOTHING', 'Clothing'), ('IDS', 'IDs & Cards'), ('KEYS', 'Keys'), ('BOOKS', 'Books & Stationery'), ('BAGS', 'Bags & Wallets'), ('TUMBLERS', 'Tumblers/Bottles'), ('OTHERS', 'Others')], max_length=50)),
+                ('location', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('turnaround_days', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric', 'day'], name='rollup_metric_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'metric', 'category', 'location'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_reviewed_at, migrations.RunPython.noop),
+    ]
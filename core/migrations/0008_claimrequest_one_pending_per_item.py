@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:09
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def reject_stacked_claims(apps, schema_editor):
+    # Keep the oldest pending claim per student and item; the rest were double submits
+    ClaimRequest = apps.get_model('core', 'ClaimRequest')
+    stacked = (
+        ClaimRequest.objects.filter(status='PENDING').values('claimant', 'found_item')
+        .annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for pair in stacked:
+        pending = ClaimRequest.objects.filter(status='PENDING', **pair).order_by('request_date', 'id')
+        ClaimRequest.objects.filter(id__in=list(pending.values_list('id', flat=True)[1:])).update(status='REJECTED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(reject_stacked_claims, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='claimrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'PENDING')), fields=('claimant', 'found_item'), name='one_pending_claim_per_item'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:14
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_claimrequest_one_pending_per_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='founditem',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('FOUND_ITEM', 'Found Item'), ('LOST_TICKET', 'Lost Ticket'), ('HAND_IN', 'Hand-in Report')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=100)),
+                ('reference', models.CharField(blank=True, max_length=20)),
+                ('category', models.CharField(choices=[('ELECTRONICS', 'Electronics'), ('CLOTHING', 'Clothing'), ('IDS', 'IDs & Cards'), ('KEYS', 'Keys'), ('BOOKS', 'Books & Stationery'), ('BAGS', 'Bags & Wallets'), ('TUMBLERS', 'Tumblers/Bottles'), ('OTHERS', 'Others')], max_length=50)),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(max_length=20)),
+                ('happened_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'happened_at'], name='archive_kind_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_archived_record')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_archive_and_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='founditem',
+            name='disposal_notice_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='founditem',
+            index=models.Index(fields=['current_status', 'category', 'date_found'], name='founditem_aging_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_founditem_disposal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('FOUND_ITEM', 'Found Item Photo'), ('LOST_TICKET', 'Lost Ticket Photo'), ('CLAIM_PROOF', 'Claim Proof Photo')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('image_name', models.CharField(max_length=255)),
+                ('phash', models.BigIntegerField(db_index=True)),
+                ('dhash', models.BigIntegerField(db_index=True)),
+                ('histogram', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'object_id'), name='unique_image_fingerprint')],
+            },
+        ),
+    ]
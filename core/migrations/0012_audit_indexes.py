@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:25
+
+from django.db import migrations, models
+
+GIN_INDEX = 'audit_changes_gin'
+
+
+def create_gin_index(apps, schema_editor):
+    # jsonb containment (changes @> {...}) for core/audit.py. jsonb_path_ops is
+    # smaller and faster than the default opclass and @> is all we ask of it.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON core_auditlog USING gin (changes jsonb_path_ops)"
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIN_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_image_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['target_model', 'target_object_id', 'timestamp'], name='audit_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp'], name='audit_timestamp_idx'),
+        ),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
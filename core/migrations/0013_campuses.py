@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0012_audit_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.SlugField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('hostname', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'verbose_name_plural': 'campuses',
+            },
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='campus',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='users', to='core.campus'),
+        ),
+        migrations.AddField(
+            model_name='founditem',
+            name='campus',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.campus'),
+        ),
+        migrations.AddField(
+            model_name='handinreport',
+            name='campus',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.campus'),
+        ),
+        migrations.AddField(
+            model_name='lostitemticket',
+            name='campus',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.campus'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['campus', 'role'], name='user_campus_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='founditem',
+            index=models.Index(fields=['campus', 'current_status', 'category', 'date_found'], name='founditem_campus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='handinreport',
+            index=models.Index(fields=['campus', 'is_received', 'date_reported'], name='handin_campus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lostitemticket',
+            index=models.Index(fields=['campus', 'status', 'date_submitted'], name='ticket_campus_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:30
+
+from django.db import migrations
+
+
+def create_main_campus(apps, schema_editor):
+    # Everything so far belongs to the one campus this ran for. Admins stay
+    # campus-less, which makes them admins of every campus.
+    Campus = apps.get_model('core', 'Campus')
+    main, _ = Campus.objects.get_or_create(code='main', defaults={'name': 'Main Campus'})
+    for model in ['FoundItem', 'HandInReport', 'LostItemTicket']:
+        apps.get_model('core', model).objects.filter(campus__isnull=True).update(campus=main)
+    apps.get_model('core', 'CustomUser').objects.filter(campus__isnull=True).exclude(role='ADMIN').update(campus=main)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_campuses'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_main_campus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from the backfill: Postgres won't ALTER a table with pending
+    # deferred FK checks from the same transaction.
+
+    dependencies = [
+        ('core', '0014_backfill_campuses'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='founditem',
+            name='campus',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.campus'),
+        ),
+        migrations.AlterField(
+            model_name='handinreport',
+            name='campus',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.campus'),
+        ),
+        migrations.AlterField(
+            model_name='lostitemticket',
+            name='campus',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.campus'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='claimrequest',
+            index=models.Index(fields=['request_date'], name='claim_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='founditem',
+            index=models.Index(fields=['date_found'], name='founditem_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='handinreport',
+            index=models.Index(fields=['date_reported'], name='handin_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lostitemticket',
+            index=models.Index(fields=['date_submitted'], name='ticket_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='handinreport',
+            name='client_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
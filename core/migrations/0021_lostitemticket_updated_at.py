@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_detail_fragment_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lostitemticket',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
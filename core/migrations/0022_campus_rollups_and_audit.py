@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import IntegerField, OuterRef, Subquery
+from django.db.models.functions import Cast
+
+# Where each audit target keeps its campus
+CAMPUS_OF = {
+    'FoundItem': 'campus',
+    'HandInReport': 'campus',
+    'LostItemTicket': 'campus',
+    'ClaimRequest': 'found_item__campus',
+}
+
+
+def backfill_campuses(apps, schema_editor):
+    AuditLog = apps.get_model('core', 'AuditLog')
+    for model_name, path in CAMPUS_OF.items():
+        model = apps.get_model('core', model_name)
+        campus = model._base_manager.filter(
+            pk=Cast(OuterRef('target_object_id'), IntegerField()),
+        ).values(path)[:1]
+        # Bulk entries ('' or old "first-last" ids) span rows and stay campus-less
+        AuditLog.objects.filter(target_model=model_name, target_object_id__regex=r'^[0-9]+$').update(
+            campus=Subquery(campus),
+        )
+
+    # Rollups can only be attributed when there is a single campus. Otherwise
+    # refresh_rollups --full rebuilds them per campus (except frozen days).
+    Campus = apps.get_model('core', 'Campus')
+    if Campus.objects.count() == 1:
+        apps.get_model('core', 'DailyRollup').objects.update(campus=Campus.objects.get())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_lostitemticket_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailyrollup',
+            name='unique_daily_rollup',
+        ),
+        migrations.RemoveIndex(
+            model_name='dailyrollup',
+            name='rollup_metric_day_idx',
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='campus',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.campus'),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='campus',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.campus'),
+        ),
+        migrations.RunPython(backfill_campuses, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['campus', '-timestamp'], name='audit_campus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyrollup',
+            index=models.Index(fields=['campus', 'metric', 'day'], name='rollup_campus_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'metric', 'category', 'location', 'campus'), name='unique_daily_rollup'),
+        ),
+    ]
@@ -1,7 +1,13 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
-import uuid
+from django.utils import timezone
+
+from .refcodes import next_reference_code
+from .tenancy import CampusManager
 
 # 1. ACCOUNTS
 class CustomUser(AbstractUser):
@@ -28,6 +34,21 @@ class CustomUser(AbstractUser):
     )
     program_year = models.CharField(max_length=20, choices=YearLevel.choices, blank=True, null=True)
     contact_number = models.CharField(max_length=15, blank=True, null=True)
+    # Empty only for admins who run every campus
+    campus = models.ForeignKey('Campus', on_delete=models.PROTECT, null=True, blank=True, related_name='users', db_index=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['campus', 'role'], name='user_campus_role_idx'),
+        ]
+        constraints = [
+            # Staff accounts have no student ID, so only enforce it when set
+            models.UniqueConstraint(
+                fields=['student_id'],
+                condition=models.Q(student_id__isnull=False) & ~models.Q(student_id=''),
+                name='unique_student_id',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.role})"
@@ -59,16 +80,34 @@ class HandInReport(models.Model):
     location_found = models.CharField(max_length=255)
     is_received = models.BooleanField(default=False)
     received_at = models.DateTimeField(null=True, blank=True)
+    campus = models.ForeignKey('Campus', on_delete=models.PROTECT, related_name='+', db_index=False)
+    # Idempotency key of a report synced from the desk kiosk (core/kiosk.py)
+    client_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    # Part of the detail fragment's cache key (templates/partials/handin_detail.html)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CampusManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['campus', 'is_received', 'date_reported'], name='handin_campus_idx'),
+            models.Index(fields=['date_reported'], name='handin_date_idx'),  # admin date_hierarchy
+        ]
 
     def save(self, *args, **kwargs):
         if not self.reference_code:
-            self.reference_code = "HND-" + str(uuid.uuid4())[:8].upper()
+            self.reference_code = next_reference_code()
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.item_name} ({self.reference_code})"
 
 # 3. FOUND ITEMS
+class LiveManager(CampusManager):
+    """Hides soft-deleted items and other campuses. `FoundItem.all_objects` still sees them."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 class FoundItem(models.Model):
     class Status(models.TextChoices):
         AVAILABLE = 'AVAILABLE', 'Available'
@@ -89,6 +128,25 @@ class FoundItem(models.Model):
     location_found = models.CharField(max_length=255)
     date_enrolled = models.DateTimeField(auto_now_add=True)
     current_status = models.CharField(max_length=20, choices=Status.choices, default=Status.AVAILABLE)
+    # Set instead of deleting (which took the claims with it); archive_records moves it out later
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # When dispose_unclaimed warned about this item (see core/disposal.py)
+    disposal_notice_at = models.DateTimeField(null=True, blank=True)
+    campus = models.ForeignKey('Campus', on_delete=models.PROTECT, related_name='+', db_index=False)
+    # Part of the detail fragments' cache keys; .update() calls must set it too
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # dispose_unclaimed: available items of one category found before a cutoff
+            models.Index(fields=['current_status', 'category', 'date_found'], name='founditem_aging_idx'),
+            # Gallery and staff lists: one campus's items by status, grouped by category
+            models.Index(fields=['campus', 'current_status', 'category', 'date_found'], name='founditem_campus_idx'),
+            models.Index(fields=['date_found'], name='founditem_date_idx'),  # admin date_hierarchy
+        ]
 
     def __str__(self):
         return f"{self.item_name} - {self.current_status}"
@@ -115,6 +173,17 @@ class LostItemTicket(models.Model):
     date_submitted = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.SEARCHING)
     matched_item = models.ForeignKey('FoundItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='matched_tickets')
+    campus = models.ForeignKey('Campus', on_delete=models.PROTECT, related_name='+', db_index=False)
+    # archive_records counts a ticket's age from here; .update() calls must set it too
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CampusManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['campus', 'status', 'date_submitted'], name='ticket_campus_idx'),
+            models.Index(fields=['date_submitted'], name='ticket_date_idx'),  # admin date_hierarchy
+        ]
 
 # 5. CLAIMS
 class ClaimRequest(models.Model):
@@ -132,14 +201,226 @@ class ClaimRequest(models.Model):
     request_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
     reviewed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='reviewed_claims')
+    reviewed_at = models.DateTimeField(null=True, blank=True)
     rejection_reason = models.TextField(blank=True, null=True)
+    # Part of the review fragment's cache key (templates/partials/claim_detail.html)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Claims follow their item's campus
+    objects = CampusManager('found_item__campus')
+
+    class Meta:
+        constraints = [
+            # A student can't stack pending claims on the same item (double-submit, two tabs)
+            models.UniqueConstraint(
+                fields=['claimant', 'found_item'], condition=models.Q(status='PENDING'),
+                name='one_pending_claim_per_item',
+            ),
+        ]
+        indexes = [models.Index(fields=['request_date'], name='claim_date_idx')]  # admin date_hierarchy
 
 # 6. AUDIT LOG
 class AuditLog(models.Model):
     actor = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=50)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Written by the outbox dispatcher, stamped with the time of the change itself
+    timestamp = models.DateTimeField(default=timezone.now)
     target_model = models.CharField(max_length=50)
     target_object_id = models.CharField(max_length=50)
-    changes = models.JSONField(default=dict, blank=True)
\ No newline at end of file
+    changes = models.JSONField(default=dict, blank=True)
+    # The target's campus; empty for jobs that span campuses, which only campus-less admins see
+    campus = models.ForeignKey('Campus', on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+
+    objects = CampusManager()
+
+    class Meta:
+        indexes = [
+            # Per-object history (core/audit.py); on Postgres `changes` also gets a GIN index, see migration 0012
+            models.Index(fields=['target_model', 'target_object_id', 'timestamp'], name='audit_target_idx'),
+            models.Index(fields=['-timestamp'], name='audit_timestamp_idx'),
+            models.Index(fields=['campus', '-timestamp'], name='audit_campus_idx'),
+        ]
+
+# 7. SEQUENCES
+class SequenceCounter(models.Model):
+    """Block-reserved counter for backends without native sequences (see core/refcodes.py)."""
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} = {self.next_value}"
+
+# 8. DUPLICATE DETECTION (see core/dedup.py)
+class ItemSignature(models.Model):
+    """MinHash signature of an open HandInReport or an unlinked FoundItem."""
+    class Source(models.TextChoices):
+        HAND_IN = 'HANDIN', 'Hand-in Report'
+        FOUND_ITEM = 'ITEM', 'Found Item'
+
+    source = models.CharField(max_length=10, choices=Source.choices)
+    object_id = models.BigIntegerField()
+    minhash = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'object_id'], name='unique_item_signature'),
+        ]
+
+class SignatureBucket(models.Model):
+    """Hash of one LSH band of a signature. Rows sharing a key are duplicate candidates."""
+    signature = models.ForeignKey(ItemSignature, on_delete=models.CASCADE, related_name='buckets')
+    key = models.CharField(max_length=16, db_index=True)
+
+class DuplicateCandidate(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending Review'
+        MERGED = 'MERGED', 'Merged'
+        DISMISSED = 'DISMISSED', 'Not a Duplicate'
+
+    hand_in = models.ForeignKey(HandInReport, on_delete=models.CASCADE, related_name='duplicate_candidates')
+    found_item = models.ForeignKey(FoundItem, on_delete=models.CASCADE, related_name='duplicate_candidates')
+    similarity = models.FloatField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    detected_at = models.DateTimeField(auto_now_add=True)
+    reviewed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_duplicates')
+
+    objects = CampusManager('found_item__campus')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hand_in', 'found_item'], name='unique_duplicate_pair'),
+        ]
+
+# 9. ANALYTICS ROLLUPS (see core/analytics.py)
+class DailyRollup(models.Model):
+    """Per-day counts by category and location; the reports page reads only these."""
+    class Metric(models.TextChoices):
+        FOUND = 'FOUND', 'Items Registered'
+        CLAIMED = 'CLAIMED', 'Items Claimed'
+        TICKET_OPENED = 'TICKET_OPENED', 'Lost Tickets Opened'
+        HAND_IN = 'HAND_IN', 'Hand-in Reports'
+
+    day = models.DateField()
+    metric = models.CharField(max_length=20, choices=Metric.choices)
+    category = models.CharField(max_length=50, choices=ItemCategory.choices)
+    location = models.CharField(max_length=100)
+    count = models.PositiveIntegerField(default=0)
+    # CLAIMED only: {days from date_enrolled to approval: number of items}
+    turnaround_days = models.JSONField(default=dict, blank=True)
+    # Empty only on rows of frozen (archived) days built before rollups had a campus
+    campus = models.ForeignKey('Campus', on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+
+    objects = CampusManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'metric', 'category', 'location', 'campus'], name='unique_daily_rollup'),
+        ]
+        indexes = [models.Index(fields=['campus', 'metric', 'day'], name='rollup_campus_day_idx')]
+
+# 10. ARCHIVE (see core/archive.py)
+class ArchivedRecord(models.Model):
+    """A closed ticket, finished item or old hand-in moved out of the live tables."""
+    class Kind(models.TextChoices):
+        FOUND_ITEM = 'FOUND_ITEM', 'Found Item'
+        LOST_TICKET = 'LOST_TICKET', 'Lost Ticket'
+        HAND_IN = 'HAND_IN', 'Hand-in Report'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.PositiveIntegerField()
+    # Copied out of `data` so the archive search doesn't have to dig through JSON
+    title = models.CharField(max_length=100)
+    reference = models.CharField(max_length=20, blank=True)
+    category = models.CharField(max_length=50, choices=ItemCategory.choices)
+    location = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20)
+    happened_at = models.DateTimeField()  # enrolled / submitted / reported
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # The row as it was, plus its claims
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_archived_record'),
+        ]
+        indexes = [models.Index(fields=['kind', 'happened_at'], name='archive_kind_date_idx')]
+
+# 11. IMAGE FINGERPRINTS (see core/fingerprints.py)
+class ImageFingerprint(models.Model):
+    class Source(models.TextChoices):
+        FOUND_ITEM = 'FOUND_ITEM', 'Found Item Photo'
+        LOST_TICKET = 'LOST_TICKET', 'Lost Ticket Photo'
+        CLAIM_PROOF = 'CLAIM_PROOF', 'Claim Proof Photo'
+
+    source = models.CharField(max_length=20, choices=Source.choices)
+    object_id = models.PositiveIntegerField()
+    image_name = models.CharField(max_length=255)  # recompute only when the file changes
+    # 64-bit hashes stored signed; use phash_u/dhash_u for bit maths
+    phash = models.BigIntegerField(db_index=True)
+    dhash = models.BigIntegerField(db_index=True)
+    histogram = models.JSONField(default=list)  # 64 RGB bins, sums to 1
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'object_id'], name='unique_image_fingerprint'),
+        ]
+
+    @property
+    def phash_u(self):
+        return self.phash & 0xFFFFFFFFFFFFFFFF
+
+    @property
+    def dhash_u(self):
+        return self.dhash & 0xFFFFFFFFFFFFFFFF
+
+# 12. CAMPUSES (see core/tenancy.py)
+class Campus(models.Model):
+    code = models.SlugField(max_length=20, unique=True)  # ?campus=<code>
+    name = models.CharField(max_length=100)
+    # Requests for this host are scoped to the campus (e.g. lostfound-north.example.edu)
+    hostname = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'campuses'
+
+    def __str__(self):
+        return self.name
+
+# 13. OUTBOX (see core/outbox.py)
+class OutboxEvent(models.Model):
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Not before this time: pushed ahead while a dispatcher holds the event, and on retry
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    handled = models.JSONField(default=list, blank=True)  # handlers that already succeeded
+    last_error = models.TextField(blank=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The dispatcher's queue: only undelivered rows, so it stays small however long we keep history
+            models.Index(fields=['available_at', 'id'], name='outbox_pending_idx',
+                         condition=models.Q(dispatched_at__isnull=True)),
+            models.Index(fields=['dispatched_at'], name='outbox_dispatched_idx',
+                         condition=models.Q(dispatched_at__isnull=False)),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.pk}"
+
+# 14. UPLOADS (see core/uploads.py)
+class ChunkedUpload(models.Model):
+    """A photo arriving in pieces; the bytes live in UPLOAD_STAGING_DIR/<token>.part."""
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()  # announced up front; the upload is done when the file has this many bytes
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.token})"
@@ -0,0 +1,228 @@
+"""
+Transactional outbox for the side effects of saves and status changes.
+
+Audit entries, duplicate and photo indexing and dashboard notifications used
+to run inside post_save, in the request's transaction, so a slow photo
+decode or a cache hiccup slowed down or broke the view. Now signals and
+transitions only emit() a small OutboxEvent row in the same transaction as
+the change. The event exists exactly when the change committed.
+`manage.py dispatch_events` drains the table in batches and runs the
+handlers registered for each event type (core/events.py). It runs as its own
+long-lived process next to gunicorn (the `worker` entry in the Procfile);
+without one, nothing is delivered unless OUTBOX_EAGER is on.
+
+With OUTBOX_EAGER (development) the web process drains right after the
+commit instead: one drain per transaction however many events it emitted,
+and events emitted by handlers during a drain are picked up by that drain.
+
+Delivery is at least once:
+- claim() leases a batch by pushing available_at OUTBOX_LEASE_SECONDS
+  ahead. A dispatcher that dies mid-batch only delays those events until the
+  lease runs out. On Postgres, concurrent dispatchers skip each other's rows
+  (SKIP LOCKED).
+- A failing handler is retried with exponential backoff. Handlers that
+  already succeeded for the event are listed in `handled` and not run again.
+  After OUTBOX_MAX_ATTEMPTS the event is dead and waits in the admin for a
+  manual retry.
+- A handler can still see an event twice, e.g. when the dispatcher is killed
+  between running it and the bookkeeping. Handlers must be idempotent;
+  event.idempotency_key and event.created_at stay the same on every delivery.
+
+Each handler runs in its own transaction, unless it is registered with
+atomic=False. Such a handler commits as it goes (the staff import, batch by
+batch) and calls renew() after each step. That keeps its lease, so no other
+dispatcher starts the same work, and saves its progress in the payload for a
+redelivery to resume from.
+
+emit() with an explicit key drops a second event for the same fact (a claim
+is approved once). stats() reports backlog and lag for the dispatcher's log.
+"""
+import datetime
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+_local = threading.local()
+
+
+class LeaseLost(Exception):
+    """The lease on an event ran out and another dispatcher took it over."""
+
+
+def handler(*event_types, atomic=True):
+    """Register the decorated function(event) for these event types.
+
+    atomic=False runs it outside a transaction; it must renew() its lease.
+    """
+    def register(func):
+        func.outbox_atomic = atomic
+        for event_type in event_types:
+            _handlers[event_type].append(func)
+        return func
+    return register
+
+
+def _name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def emit(event_type, key=None, **payload):
+    """Record an event in the current transaction; it is delivered after the commit."""
+    OutboxEvent.objects.bulk_create(
+        [OutboxEvent(event_type=event_type, idempotency_key=key or f'{event_type}:{uuid.uuid4().hex}', payload=payload)],
+        ignore_conflicts=True,
+    )
+    if settings.OUTBOX_EAGER:
+        _schedule_drain()
+
+
+def emit_many(event_type, payloads):
+    """emit() for a bulk_create'd batch: one INSERT for all the events."""
+    if not payloads:
+        return
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(event_type=event_type, idempotency_key=f'{event_type}:{uuid.uuid4().hex}', payload=payload)
+        for payload in payloads
+    ])
+    if settings.OUTBOX_EAGER:
+        _schedule_drain()
+
+
+def _schedule_drain():
+    """OUTBOX_EAGER: drain after the current transaction commits, once."""
+    connection = transaction.get_connection()
+    # Entries are (savepoint ids, func, robust); a rolled back savepoint takes its entry with it
+    if not any(entry[1] is _drain for entry in connection.run_on_commit):
+        transaction.on_commit(_drain)
+
+
+def _drain():
+    if getattr(_local, 'draining', False):
+        _local.more = True  # emitted by a handler of the drain below; it goes round again
+        return
+    _local.draining = True
+    try:
+        while True:
+            _local.more = False
+            taken = dispatch()
+            if taken < settings.OUTBOX_BATCH_SIZE and not _local.more:
+                break
+    finally:
+        _local.draining = False
+
+
+# --- Dispatching ------------------------------------------------------------------
+
+def _due(now):
+    return OutboxEvent.objects.filter(
+        dispatched_at__isnull=True, available_at__lte=now, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+
+
+def claim(batch_size, now=None):
+    """Lease the next due events to this dispatcher, oldest first."""
+    now = now or timezone.now()
+    lease = now + datetime.timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    with transaction.atomic():
+        ids = list(
+            _due(now).select_for_update(skip_locked=True)
+            .order_by('available_at', 'id').values_list('pk', flat=True)[:batch_size]
+        )
+        # Filtering on _due again is the compare-and-swap where there are no row locks (SQLite)
+        _due(now).filter(pk__in=ids).update(available_at=lease, attempts=F('attempts') + 1)
+    return list(OutboxEvent.objects.filter(pk__in=ids, available_at=lease).order_by('id'))
+
+
+def deliver(event):
+    """Run the handlers that haven't succeeded for this event yet. Returns the first error, or None."""
+    error = None
+    for func in _handlers.get(event.event_type, []):
+        name = _name(func)
+        if name in event.handled:
+            continue
+        try:
+            with transaction.atomic() if func.outbox_atomic else nullcontext():
+                func(event)
+        except Exception as e:
+            logger.exception("Outbox handler %s failed on %s", name, event)
+            error = error or f'{name}: {e!r}'
+        else:
+            event.handled.append(name)
+    return error
+
+
+def renew(event, **payload):
+    """Extend this dispatcher's lease on `event`, saving `payload` into the event's payload."""
+    lease = timezone.now() + datetime.timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    event.payload.update(payload)
+    # Compare-and-swap on our own lease: if it ran out and someone else claimed the event, stop
+    if not OutboxEvent.objects.filter(
+        pk=event.pk, available_at=event.available_at, dispatched_at__isnull=True,
+    ).update(available_at=lease, payload=event.payload):
+        raise LeaseLost(f"Lost the lease on {event}")
+    event.available_at = lease
+
+
+def _backoff(attempts):
+    return datetime.timedelta(seconds=min(settings.OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1), 3600))
+
+
+def dispatch(batch_size=None):
+    """Deliver one batch. Returns how many events were taken, delivered or not."""
+    events = claim(batch_size or settings.OUTBOX_BATCH_SIZE)
+    delivered = []
+    for event in events:
+        error = deliver(event)
+        if error is None:
+            delivered.append(event.pk)
+        else:
+            # Only while we still hold the lease; after LeaseLost the event is someone else's
+            OutboxEvent.objects.filter(pk=event.pk, available_at=event.available_at).update(
+                handled=event.handled, last_error=error[:2000],
+                available_at=timezone.now() + _backoff(event.attempts),
+            )
+    if delivered:
+        OutboxEvent.objects.filter(pk__in=delivered).update(dispatched_at=timezone.now(), last_error='')
+    return len(events)
+
+
+def retry(queryset):
+    """Give dead or backed-off events a fresh set of attempts, now."""
+    return queryset.filter(dispatched_at__isnull=True).update(attempts=0, available_at=timezone.now())
+
+
+def purge(days=None, now=None):
+    """Delete delivered events older than OUTBOX_KEEP_DAYS."""
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(days=settings.OUTBOX_KEEP_DAYS if days is None else days)
+    deleted, _ = OutboxEvent.objects.filter(dispatched_at__lt=cutoff).delete()
+    return deleted
+
+
+def stats(now=None):
+    """Backlog numbers: is the dispatcher keeping up?"""
+    now = now or timezone.now()
+    waiting = OutboxEvent.objects.filter(dispatched_at__isnull=True).aggregate(
+        pending=Count('pk', filter=Q(attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)),
+        retrying=Count('pk', filter=Q(attempts__gt=0, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)),
+        dead=Count('pk', filter=Q(attempts__gte=settings.OUTBOX_MAX_ATTEMPTS)),
+        oldest=Min('created_at', filter=Q(attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)),
+    )
+    oldest = waiting.pop('oldest')
+    waiting['lag_seconds'] = round((now - oldest).total_seconds(), 1) if oldest else 0.0
+    waiting['dispatched_last_minute'] = OutboxEvent.objects.filter(
+        dispatched_at__gte=now - datetime.timedelta(minutes=1),
+    ).count()
+    return waiting
@@ -0,0 +1,69 @@
+"""
+Read-replica routing.
+
+Reads only go to the 'replica' alias inside code that opted in with
+`use_replica` (safe read-only views, exports, reports) and only when the
+request isn't pinned to the primary. Everything else, including every write
+and anything inside a transaction, stays on 'default'. ReplicaPinningMiddleware
+pins a browser to the primary for REPLICA_PIN_SECONDS after a POST, so people
+see their own changes even while the replica lags.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA = 'replica'
+
+_replica_allowed = contextvars.ContextVar('replica_allowed', default=False)
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_replica_for_reads():
+    token = _replica_allowed.set(True)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+@contextmanager
+def pinned_to_primary(pinned=True):
+    token = _pinned_to_primary.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+def use_replica(view_func):
+    """Let a read-only view (and its template rendering) read from the replica."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with use_replica_for_reads():
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not (_replica_allowed.get() and replica_configured()) or _pinned_to_primary.get():
+            return None
+        # Reads inside a transaction must see its own uncommitted writes
+        if connections['default'].in_atomic_block:
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.forms.models import model_to_dict
-from .models import FoundItem, ClaimRequest, LostItemTicket, AuditLog
+from .models import FoundItem, ClaimRequest, LostItemTicket, HandInReport, ItemSignature, Campus, CustomUser
+from . import dedup, fingerprints, outbox, suggest, tenancy
 import json
 
 # Helper function to serialize data for the JSON field
@@ -17,50 +18,103 @@ def serialize_instance(instance):
             data[key] = str(value)
     return data
 
+# Saves only record an outbox event here; the audit entry, duplicate check and
+# photo fingerprint are written by the dispatcher (core/events.py).
+def audit_entry(action, actor_id, target_model, target_id, changes, campus_id):
+    return {'action': action, 'actor_id': actor_id, 'target_model': target_model,
+            'target_object_id': str(target_id), 'changes': changes, 'campus_id': campus_id}
+
+def _fields(update_fields):
+    return sorted(update_fields) if update_fields is not None else None
+
 # 1. LOG CHANGES TO FOUND ITEMS
 @receiver(post_save, sender=FoundItem)
-def log_found_item_changes(sender, instance, created, **kwargs):
+def log_found_item_changes(sender, instance, created, update_fields=None, **kwargs):
     action = "CREATED_ITEM" if created else "UPDATED_ITEM"
     
     # Who did it? (If registered_by is set)
-    actor = instance.registered_by
+    actor = instance.registered_by_id
     
-    AuditLog.objects.create(
-        actor=actor,
-        action=action,
-        target_model="FoundItem",
-        target_object_id=str(instance.id),
-        changes=serialize_instance(instance) # Snapshot of the item
+    outbox.emit(
+        'ItemSaved', id=instance.pk, fields=_fields(update_fields),
+        audit=audit_entry(action, actor, "FoundItem", instance.id, serialize_instance(instance),  # Snapshot of the item
+                          instance.campus_id),
     )
 
 # 2. LOG CLAIM PROCESSING
 @receiver(post_save, sender=ClaimRequest)
-def log_claim_changes(sender, instance, created, **kwargs):
+def log_claim_changes(sender, instance, created, update_fields=None, **kwargs):
+    audit = None
     # We only care about updates (Approvals/Rejections), not initial creation by student
     if not created: 
         action = f"CLAIM_{instance.status}" # e.g., CLAIM_APPROVED
         
-        # Who did it? (The staff reviewer)
-        actor = instance.reviewed_by 
-        
-        # If reviewed_by isn't set yet (rare), fallback to None
-        
-        AuditLog.objects.create(
-            actor=actor,
-            action=action,
-            target_model="ClaimRequest",
-            target_object_id=str(instance.id),
-            changes={'status': instance.status, 'item': instance.found_item.item_name}
-        )
+        # Who did it? (The staff reviewer; None if not reviewed yet)
+        actor = instance.reviewed_by_id
+        audit = audit_entry(action, actor, "ClaimRequest", instance.id,
+                            {'status': instance.status, 'item': instance.found_item.item_name},
+                            instance.found_item.campus_id)
+
+    outbox.emit('ClaimSaved', id=instance.pk, fields=_fields(update_fields), audit=audit)
 
 # 3. LOG TICKET MATCHING
 @receiver(post_save, sender=LostItemTicket)
-def log_ticket_changes(sender, instance, created, **kwargs):
+def log_ticket_changes(sender, instance, created, update_fields=None, **kwargs):
+    audit = None
     if not created and instance.status == 'MATCH_FOUND':
-        AuditLog.objects.create(
-            actor=instance.owner, # Or System
-            action="MATCH_LINKED",
-            target_model="LostItemTicket",
-            target_object_id=str(instance.id),
-            changes={'status': instance.status, 'matched_item_id': str(instance.matched_item.id if instance.matched_item else 'None')}
-        )
\ No newline at end of file
+        audit = audit_entry(
+            "MATCH_LINKED", instance.owner_id, "LostItemTicket", instance.id,  # Or System
+            {'status': instance.status, 'matched_item_id': str(instance.matched_item_id or 'None')},
+            instance.campus_id,
+        )
+    outbox.emit('TicketSaved', id=instance.pk, fields=_fields(update_fields), audit=audit)
+
+# 4. DUPLICATE DETECTION (Hand-in vs directly registered item)
+@receiver(post_save, sender=HandInReport)
+def log_handin_changes(sender, instance, **kwargs):
+    outbox.emit('HandInSaved', id=instance.pk)
+
+@receiver(post_delete, sender=HandInReport)
+@receiver(post_delete, sender=FoundItem)
+def forget_duplicate_signature(sender, instance, **kwargs):
+    source = ItemSignature.Source.HAND_IN if sender is HandInReport else ItemSignature.Source.FOUND_ITEM
+    dedup.forget(source, instance.pk)
+
+# 5. PHOTO FINGERPRINTS
+@receiver(post_delete, sender=FoundItem)
+@receiver(post_delete, sender=LostItemTicket)
+@receiver(post_delete, sender=ClaimRequest)
+def forget_photo(sender, instance, **kwargs):
+    source, _ = fingerprints.IMAGE_FIELDS[sender]
+    fingerprints.forget(source, instance.pk)
+
+# 6. TYPEAHEAD INDEX
+@receiver(post_save, sender=FoundItem)
+@receiver(post_save, sender=HandInReport)
+def update_suggestions(sender, instance, **kwargs):
+    suggest.record(instance)
+
+@receiver(post_delete, sender=FoundItem)
+@receiver(post_delete, sender=HandInReport)
+def drop_suggestions(sender, instance, **kwargs):
+    suggest.record(instance, deleted=True)
+
+# 7. CAMPUS (see core/tenancy.py)
+@receiver(pre_save, sender=FoundItem)
+@receiver(pre_save, sender=HandInReport)
+@receiver(pre_save, sender=LostItemTicket)
+def assign_campus(sender, instance, **kwargs):
+    # New records belong to the campus of the request that made them
+    if instance.campus_id is None:
+        instance.campus = tenancy.current() or tenancy.default()
+
+@receiver(pre_save, sender=CustomUser)
+def assign_user_campus(sender, instance, **kwargs):
+    # Users created outside a campus (createsuperuser) stay campus-less
+    if instance._state.adding and instance.campus_id is None:
+        instance.campus = tenancy.current()
+
+@receiver(post_save, sender=Campus)
+@receiver(post_delete, sender=Campus)
+def forget_campuses(sender, **kwargs):
+    tenancy.forget_campuses()
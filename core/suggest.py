@@ -0,0 +1,255 @@
+"""
+Typeahead suggestions for the search boxes.
+
+Suggestions come from an in-memory prefix trie in each worker process, one
+per field:
+- item: names of items in the public gallery (available, not deleted)
+- location: where those items were found (normalised like the Reports
+  hotspots)
+- reference: hand-in reference codes (staff only)
+
+Every word of a name is a key, so "wal" finds "Black Leather Wallet".
+Reference codes are keyed with and without the HND prefix, and dashes
+don't matter.
+
+The trie only goes MAX_DEPTH characters deep. Each leaf keeps its full
+keys, and longer prefixes are filtered against them. That keeps memory
+flat for long names while still answering after one or two keystrokes.
+
+Each campus has its own indexes (plus one across all campuses for admins
+who aren't narrowed to one), built from the campus-scoped managers.
+
+Saves (see signals.py) patch the index of the worker that handled them and
+bump a version counter in the cache. Other workers notice the new version
+and rebuild their copy in a background thread, at most once every
+REBUILD_INTERVAL seconds, and keep answering from the old copy until the new
+one is swapped in. A suggestion can be a few seconds stale. Answering one
+costs no query; only the first lookup of a field in a fresh worker waits
+for a build.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+
+from . import tenancy
+from .analytics import normalize_location
+from .models import FoundItem, HandInReport
+
+MAX_DEPTH = 8
+REBUILD_INTERVAL = 10
+LIMIT = 8
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('item', 'location', 'reference')
+STAFF_FIELDS = {'reference'}
+
+
+class Trie:
+    """Prefix tree of key -> {term: count}, capped at MAX_DEPTH levels."""
+
+    def __init__(self):
+        self.root = {}
+
+    def _node(self, key, create=False):
+        node = self.root
+        for char in key[:MAX_DEPTH]:
+            child = node.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node[char] = {}
+            node = child
+        return node
+
+    def add(self, key, term):
+        leaf = self._node(key, create=True).setdefault('', {}).setdefault(key, {})
+        leaf[term] = leaf.get(term, 0) + 1
+
+    def remove(self, key, term):
+        node = self._node(key)
+        leaf = node and node.get('', {}).get(key)
+        if not leaf or term not in leaf:
+            return
+        leaf[term] -= 1
+        if not leaf[term]:
+            del leaf[term]
+            if not leaf:
+                del node[''][key]  # empty branches are left; a rebuild trims them
+
+    def complete(self, prefix, limit=LIMIT):
+        start = self._node(prefix)
+        results, seen = [], set()
+        stack = [start] if start else []
+        while stack and len(results) < limit:
+            node = stack.pop()
+            for key in sorted(node.get('', ())):
+                if not key.startswith(prefix):
+                    continue
+                for term in sorted(node[''][key]):
+                    if term.casefold() not in seen:
+                        seen.add(term.casefold())
+                        results.append(term)
+            # Reversed so the stack pops children in alphabetical order
+            stack.extend(node[char] for char in sorted((c for c in node if c), reverse=True))
+        return results[:limit]
+
+
+def _words(text):
+    words = text.casefold().split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+def _reference_keys(code):
+    compact = code.upper().replace('-', '')
+    return {compact, compact.removeprefix('HND')}
+
+
+def normalize_query(field, query):
+    query = ' '.join((query or '').split())
+    if field == 'reference':
+        return query.upper().replace('-', '').replace(' ', '')
+    return query.casefold()
+
+
+def _entries(field, instance):
+    """{(key, term)} that `instance` contributes to the `field` index."""
+    if field == 'reference':
+        if isinstance(instance, HandInReport) and instance.reference_code:
+            return {(key, instance.reference_code) for key in _reference_keys(instance.reference_code)}
+        return set()
+    if not isinstance(instance, FoundItem):
+        return set()
+    if instance.current_status != FoundItem.Status.AVAILABLE or instance.deleted_at:
+        return set()
+    if field == 'item':
+        name = ' '.join(instance.item_name.split())
+        return {(key, name) for key in _words(name)}
+    location = normalize_location(instance.location_found)
+    return {(key, location) for key in _words(location)}
+
+
+class PrefixIndex:
+    def __init__(self, field):
+        self.field = field
+        self.trie = Trie()
+        self.rows = {}  # (model label, pk) -> entries, so an update knows what to take out
+        self.version = None
+        self.built_at = 0
+
+    def update(self, instance, deleted=False):
+        row = (instance._meta.label, instance.pk)
+        old = self.rows.pop(row, set())
+        new = set() if deleted else _entries(self.field, instance)
+        for key, term in old - new:
+            self.trie.remove(key, term)
+        for key, term in new - old:
+            self.trie.add(key, term)
+        if new:
+            self.rows[row] = new
+
+    def build(self):
+        if self.field == 'reference':
+            rows = HandInReport.objects.only('reference_code')
+        else:
+            rows = FoundItem.objects.filter(current_status=FoundItem.Status.AVAILABLE).only(
+                'item_name', 'location_found', 'current_status', 'deleted_at',
+            )
+        for instance in rows.iterator(chunk_size=2000):
+            self.update(instance)
+
+
+def _version_key(field, campus_id):
+    return f'suggest:{field}:{campus_id or "all"}:version'
+
+
+_lock = threading.Lock()
+_indexes = {}
+_rebuilding = set()
+
+
+def _build(field, campus, version):
+    index = PrefixIndex(field)
+    with tenancy.activate(campus):
+        index.build()  # through the scoped managers, so only this campus
+    index.version, index.built_at = version, time.monotonic()
+    return index
+
+
+def _rebuild(slot, campus, version):
+    try:
+        index = _build(slot[0], campus, version)
+        with _lock:
+            _indexes[slot] = index
+    except Exception:
+        logger.exception("Rebuilding the %s suggestions failed", slot[0])
+    finally:
+        with _lock:
+            _rebuilding.discard(slot)
+        connections.close_all()  # this thread's own connections
+
+
+def get_index(field):
+    campus = tenancy.current()
+    slot = (field, campus.pk if campus else None)
+    version = cache.get(_version_key(*slot), 0)
+    index = _indexes.get(slot)
+    if index is None:
+        with _lock:
+            index = _indexes.get(slot)
+            if index is None:
+                index = _indexes[slot] = _build(field, campus, version)
+        return index
+    if index.version != version and time.monotonic() - index.built_at >= REBUILD_INTERVAL:
+        with _lock:
+            start = slot not in _rebuilding
+            _rebuilding.add(slot)
+        if start:
+            threading.Thread(target=_rebuild, args=(slot, campus, version), daemon=True).start()
+    return index
+
+
+def suggest(field, query, limit=LIMIT):
+    prefix = normalize_query(field, query)
+    if not prefix:
+        return []
+    return get_index(field).trie.complete(prefix, limit)
+
+
+def _fields_for(instance):
+    return ('reference',) if isinstance(instance, HandInReport) else ('item', 'location')
+
+
+def _bump(field, campus_id):
+    key = _version_key(field, campus_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def record(instance, deleted=False):
+    """A FoundItem/HandInReport changed: patch this worker's indexes and tell the others."""
+    for field in _fields_for(instance):
+        for slot in ((field, instance.campus_id), (field, None)):
+            version = _bump(*slot)
+            with _lock:
+                index = _indexes.get(slot)
+                if index is None:
+                    continue
+                index.update(instance, deleted)
+                # Only skip the next rebuild if nobody else changed anything in between
+                if version == (index.version or 0) + 1:
+                    index.version = version
+
+
+def invalidate(*fields):
+    """After bulk updates that send no signals: every worker rebuilds."""
+    campus_ids = [campus.pk for campus in tenancy.campuses().values()] + [None]
+    for field in fields or FIELDS:
+        for campus_id in campus_ids:
+            _bump(field, campus_id)
@@ -0,0 +1,110 @@
+"""
+Multi-campus tenancy.
+
+One deployment serves several campuses. Items, tickets, hand-ins and users
+carry a campus, and CampusMiddleware picks the campus for each request:
+- signed-in users get their own campus;
+- a campus-less admin can switch with ?campus=<code>. Without a choice
+  they see every campus;
+- everyone else gets the campus whose hostname they came in on, the one
+  they picked with ?campus=<code> (remembered in the session), or
+  settings.DEFAULT_CAMPUS.
+
+Within the request, the default managers of the campus models
+(CampusManager) only return rows of that campus, so every view is scoped
+without touching its queries. Outside a request (management commands,
+cron) nothing is active and queries see every campus. all_campuses()
+switches the scoping off explicitly, e.g. for cross-campus matching.
+
+Users are not scoped through their manager, because login has to find
+accounts of every campus. manage_users filters on request.campus itself.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+
+SESSION_KEY = 'campus'
+ALL = 'all'
+CACHE_KEY = 'tenancy:campuses'
+
+_campus = contextvars.ContextVar('campus', default=None)
+
+
+def current():
+    """The campus queries are scoped to right now, or None for all campuses."""
+    return _campus.get()
+
+
+@contextmanager
+def activate(campus):
+    token = _campus.set(campus)
+    try:
+        yield campus
+    finally:
+        _campus.reset(token)
+
+
+def all_campuses():
+    return activate(None)
+
+
+class CampusManager(models.Manager):
+    """Default manager that only sees the active campus (through `campus_field`)."""
+
+    def __init__(self, campus_field='campus'):
+        super().__init__()
+        self.campus_field = campus_field
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        campus = _campus.get()
+        return queryset.filter(**{self.campus_field: campus}) if campus else queryset
+
+
+# --- Resolving the campus -------------------------------------------------------
+
+def campuses():
+    """{code: Campus}, cached; the table is tiny and changes about once a year."""
+    def load():
+        from .models import Campus
+        return {campus.code: campus for campus in Campus.objects.all()}
+    return cache.get_or_set(CACHE_KEY, load, timeout=300)
+
+
+def forget_campuses():
+    cache.delete(CACHE_KEY)
+
+
+def by_code(code):
+    return campuses().get(code)
+
+
+def by_id(campus_id):
+    return next((c for c in campuses().values() if c.pk == campus_id), None)
+
+
+def default():
+    all_ = campuses()
+    return all_.get(settings.DEFAULT_CAMPUS) or min(all_.values(), key=lambda c: c.pk, default=None)
+
+
+def resolve(request):
+    user = request.user
+    if user.is_authenticated and user.campus_id:
+        return by_id(user.campus_id)
+
+    chosen = request.GET.get('campus')
+    if chosen and (chosen in campuses() or chosen == ALL):
+        request.session[SESSION_KEY] = chosen
+    chosen = request.session.get(SESSION_KEY)
+
+    if user.is_authenticated and user.role == 'ADMIN':
+        # Admins without a campus run the whole deployment unless they narrowed it down
+        return by_code(chosen) if chosen != ALL else None
+
+    host = request.get_host().split(':')[0].lower()
+    by_host = next((c for c in campuses().values() if c.hostname and c.hostname.lower() == host), None)
+    return by_host or by_code(chosen) or default()
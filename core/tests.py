@@ -1,3 +1,1582 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import random
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, transaction
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import (
+    analytics, archive, audit, dedup, disposal, fingerprints, importers, kiosk, live, media, outbox, refcodes, routers,
+    suggest, tenancy, throttling, transitions, uploads,
+)
+from .forms import StudentSignUpForm
+from .middleware import PIN_COOKIE, ReplicaPinningMiddleware
+from .models import (
+    ArchivedRecord, AuditLog, Campus, ChunkedUpload, ClaimRequest, CustomUser, DailyRollup, DuplicateCandidate,
+    FoundItem, HandInReport, ImageFingerprint, LostItemTicket, OutboxEvent, SequenceCounter,
+)
+from .transitions import TransitionError
+
+# Pages render {% static %}, and tests have no collectstatic manifest
+PLAIN_STATIC = {**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+
+# ==============================================================================
+# Reference codes (core/refcodes.py)
+# ==============================================================================
+
+class ReferenceCodeTests(TestCase):
+    def test_encode_round_trips_through_normalize(self):
+        for number in (0, 1, 31, 32, 12345, 32 ** 6 - 1):
+            code = refcodes.encode(number)
+            self.assertRegex(code, r'^HND-[0-9A-Z]{6}-[0-9A-Z]$')
+            self.assertEqual(refcodes.normalize(code), code)
+
+    def test_encode_rejects_out_of_range(self):
+        with self.assertRaises(ValueError):
+            refcodes.encode(-1)
+        with self.assertRaises(ValueError):
+            refcodes.encode(32 ** 6)
+
+    def test_normalize_forgives_case_spacing_and_lookalikes(self):
+        code = refcodes.encode(1000)  # HND-000Z8-...
+        body = code[4:10]
+        self.assertEqual(refcodes.normalize(code.lower()), code)
+        self.assertEqual(refcodes.normalize(f" hnd {body} {code[-1]} "), code)
+        self.assertEqual(refcodes.normalize(body + code[-1]), code)  # prefix optional
+        self.assertEqual(refcodes.normalize(code.replace('0', 'O')), code)
+
+    def test_check_digit_catches_every_single_substitution(self):
+        code = refcodes.encode(123456)
+        raw = code.replace('-', '')[3:]
+        for position, original in enumerate(raw):
+            for char in refcodes.ALPHABET:
+                if char == original:
+                    continue
+                typo = raw[:position] + char + raw[position + 1:]
+                self.assertIsNone(refcodes.normalize(typo), typo)
+
+    def test_legacy_codes_need_their_prefix(self):
+        self.assertEqual(refcodes.normalize('hnd-1234abcd'), 'HND-1234ABCD')
+        # Eight bare digits are a student ID or a phone fragment, not a hand-in
+        self.assertIsNone(refcodes.normalize('12345678'))
+        self.assertIsNone(refcodes.normalize('1234abcd'))
+
+    def test_normalize_rejects_junk(self):
+        for junk in ('', None, 'wallet', 'HND-', 'HND-000000-1'):
+            self.assertIsNone(refcodes.normalize(junk))
+
+    def test_values_taken_in_a_rolled_back_transaction_are_reused(self):
+        allocator = refcodes.BlockAllocator('test_rollback', 10)
+        first = allocator.take(2)
+        try:
+            with transaction.atomic():
+                lost = allocator.take(3)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # Inside an atomic block nothing is cached, so the rollback gave the values back
+        self.assertEqual(allocator.take(3), lost)
+        self.assertEqual(lost[0], first[-1] + 1)
+
+
+class BlockAllocatorTests(TransactionTestCase):
+    def test_one_write_per_block(self):
+        allocator = refcodes.BlockAllocator('test_blocks', 5)
+        values = allocator.take(2) + allocator.take(2)
+        start = values[0]
+        self.assertEqual(values, list(range(start, start + 4)))
+        self.assertEqual(SequenceCounter.objects.get(name='test_blocks').next_value, start + 5)
+
+        # A request bigger than the rest of the block reserves what it needs in one go
+        self.assertEqual(allocator.take(8), list(range(start + 4, start + 12)))
+        self.assertEqual(SequenceCounter.objects.get(name='test_blocks').next_value, start + 12)
+
+    def test_codes_are_unique_and_increasing(self):
+        codes = refcodes.next_reference_codes(25) + [refcodes.next_reference_code()]
+        self.assertEqual(len(set(codes)), 26)
+        self.assertEqual(codes, sorted(codes))
+
+
+# ==============================================================================
+# Duplicate detection (core/dedup.py)
+# ==============================================================================
+
+class MinHashTests(TestCase):
+    def test_similarity_estimates_jaccard(self):
+        shared = {f'w{i}' for i in range(40)}
+        a = shared | {f'a{i}' for i in range(20)}
+        b = shared | {f'b{i}' for i in range(20)}  # Jaccard 40/80
+        self.assertEqual(dedup.similarity(dedup.minhash(a), dedup.minhash(a)), 1.0)
+        self.assertAlmostEqual(dedup.similarity(dedup.minhash(a), dedup.minhash(b)), 0.5, delta=0.2)
+        self.assertLess(dedup.similarity(dedup.minhash({'x', 'y'}), dedup.minhash({'p', 'q'})), 0.2)
+        self.assertEqual(dedup.similarity(dedup.minhash(set()), dedup.minhash(a)), 0.0)
+
+    def test_shingles_keep_colour_and_location_apart_from_text(self):
+        tokens = dedup.shingles('The Black Wallet', 'black leather', 'Black', 'Library', None)
+        self.assertIn('black', tokens)
+        self.assertIn('color:black', tokens)
+        self.assertIn('loc:library', tokens)
+        self.assertNotIn('the', tokens)
+
+    def test_band_keys_only_change_with_their_band(self):
+        signature = dedup.minhash({'red', 'umbrella', 'loc:gym'})
+        keys = dedup.band_keys(signature)
+        self.assertEqual(len(keys), dedup.BANDS)
+        self.assertEqual(len(set(keys)), dedup.BANDS)  # bands are hashed in, so no cross-band collisions
+
+        changed = list(signature)
+        changed[0] += 1  # first row of the first band
+        self.assertEqual(dedup.band_keys(changed)[1:], keys[1:])
+        self.assertNotEqual(dedup.band_keys(changed)[0], keys[0])
+
+
+class DuplicateMergeTests(TestCase):
+    def setUp(self):
+        self.campus = Campus.objects.get(code='main')
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.campus)
+
+    def hand_in(self, **fields):
+        return HandInReport.objects.create(**{
+            'finder_name': 'Finder', 'category': 'BAGS', 'item_name': 'Black leather wallet',
+            'description': 'Black leather wallet with a bus card', 'color': 'Black',
+            'location_found': 'Main Library', 'campus': self.campus, **fields,
+        })
+
+    def found_item(self, **fields):
+        return FoundItem.objects.create(**{
+            'category': 'BAGS', 'item_name': 'Black leather wallet',
+            'description': 'Black leather wallet with a bus card', 'color': 'Black',
+            'date_found': timezone.localdate(), 'location_found': 'Main Library', 'campus': self.campus, **fields,
+        })
+
+    def test_index_pairs_near_duplicates_on_the_same_campus(self):
+        item = self.found_item()
+        other = self.found_item(campus=Campus.objects.create(code='north', name='North'))
+        dedup.index(item)
+        dedup.index(other)
+        report = self.hand_in(description='Black leather wallet, bus card inside')
+
+        found = dedup.index(report)
+        self.assertEqual([candidate.found_item_id for candidate in found], [item.pk])
+        self.assertGreaterEqual(found[0].similarity, dedup.SIMILARITY_THRESHOLD)
+
+    def test_unrelated_records_are_not_paired(self):
+        dedup.index(self.found_item())
+        report = self.hand_in(item_name='Blue umbrella', description='Folding umbrella', color='Blue',
+                              location_found='Gym')
+        self.assertEqual(dedup.index(report), [])
+
+    def test_merge_links_once(self):
+        item = self.found_item()
+        dedup.index(item)
+        first, second = self.hand_in(), self.hand_in()
+        [candidate] = dedup.index(first)
+        [other] = dedup.index(second)
+
+        dedup.merge(candidate, self.staff)
+        item.refresh_from_db()
+        first.refresh_from_db()
+        self.assertEqual(item.hand_in_ref_id, first.pk)
+        self.assertTrue(first.is_received)
+
+        # Merging the same pair again, or another hand-in into the same item, changes nothing
+        with self.assertRaises(TransitionError):
+            dedup.merge(DuplicateCandidate.objects.get(pk=candidate.pk), self.staff)
+        with self.assertRaises(TransitionError):
+            dedup.merge(other, self.staff)
+        item.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(item.hand_in_ref_id, first.pk)
+        self.assertFalse(second.is_received)
+        self.assertEqual(DuplicateCandidate.objects.get(pk=other.pk).status, DuplicateCandidate.Status.PENDING)
+
+
+# ==============================================================================
+# Status transitions (core/transitions.py)
+# ==============================================================================
+
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.campus = Campus.objects.get(code='main')
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.campus)
+        self.item = FoundItem.objects.create(
+            category='KEYS', item_name='Car keys', description='Two keys on a red lanyard', color='Red',
+            date_found=timezone.localdate(), location_found='Cafeteria', campus=self.campus,
+        )
+
+    def student(self, username):
+        return CustomUser.objects.create_user(username, f'{username}@example.com', 'pw', role='STUDENT', campus=self.campus)
+
+    def claim(self, student):
+        return transitions.open_claim(ClaimRequest(proof_of_ownership='Red lanyard'), self.item, student)
+
+    def test_second_approval_loses(self):
+        winner, loser = self.claim(self.student('ana')), self.claim(self.student('ben'))
+
+        claim, rejected = transitions.approve_claim(winner.pk, self.staff)
+        self.assertEqual(claim.status, ClaimRequest.Status.APPROVED)
+        self.assertEqual(rejected, [loser.claimant_id])
+
+        with self.assertRaises(TransitionError):
+            transitions.approve_claim(winner.pk, self.staff)
+        with self.assertRaises(TransitionError):
+            transitions.approve_claim(loser.pk, self.staff)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.current_status, FoundItem.Status.CLAIMED)
+        self.assertEqual(ClaimRequest.objects.get(pk=loser.pk).status, ClaimRequest.Status.REJECTED)
+
+    def test_stale_instance_cannot_overwrite(self):
+        report = HandInReport.objects.create(
+            category='KEYS', item_name='Car keys', description='Red lanyard', color='Red',
+            location_found='Cafeteria', campus=self.campus,
+        )
+        mine, theirs = HandInReport.objects.get(pk=report.pk), HandInReport.objects.get(pk=report.pk)
+        transitions.mark_received(theirs)
+        # `mine` still says not received, but the UPDATE ... WHERE is_received = false matches nothing
+        with self.assertRaisesMessage(TransitionError, 'changed by someone else'):
+            transitions.mark_received(mine)
+
+    def test_receive_handin_twice(self):
+        report = HandInReport.objects.create(
+            category='KEYS', item_name='Car keys', description='Red lanyard', color='Red',
+            location_found='Cafeteria', campus=self.campus,
+        )
+        item = transitions.receive_handin(report.pk, self.staff)
+        with self.assertRaises(TransitionError):
+            transitions.receive_handin(report.pk, self.staff)
+        self.assertEqual(list(FoundItem.objects.filter(hand_in_ref=report)), [item])
+
+    def test_moves_not_in_the_table_are_refused(self):
+        FoundItem.objects.filter(pk=self.item.pk).update(current_status=FoundItem.Status.CLAIMED)
+        self.item.refresh_from_db()
+        with self.assertRaises(TransitionError):
+            transitions._move(self.item, 'current_status', FoundItem.Status.DONATED)
+
+    def test_one_pending_claim_per_student(self):
+        student = self.student('ana')
+        self.claim(student)
+        with self.assertRaises(TransitionError):
+            self.claim(student)
+        self.assertEqual(ClaimRequest.objects.filter(claimant=student).count(), 1)
+
+    def test_claim_links_the_students_open_ticket(self):
+        student = self.student('ana')
+        ticket = LostItemTicket.objects.create(
+            owner=student, category='KEYS', item_name='Keys', description='Red lanyard', color='Red',
+            date_lost=timezone.localdate(), location_lost='Cafeteria', campus=self.campus,
+        )
+        claim = self.claim(student)
+        ticket.refresh_from_db()
+        self.assertEqual(claim.ticket_id, ticket.pk)
+        self.assertEqual(ticket.status, LostItemTicket.Status.CLAIM_PENDING)
+
+        transitions.approve_claim(claim.pk, self.staff)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, LostItemTicket.Status.CLOSED)
+
+    def test_withdrawn_item_cannot_be_claimed(self):
+        pending = self.claim(self.student('ana'))
+        affected = transitions.withdraw_item(self.item.pk, self.staff)
+        self.assertEqual(affected, {pending.claimant_id})
+        with self.assertRaises(TransitionError):
+            self.claim(self.student('ben'))
+        with self.assertRaises(TransitionError):
+            transitions.withdraw_item(self.item.pk, self.staff)
+
+
+class StressClaimsTests(TestCase):
+    def test_student_ids_fit_the_field_and_skip_real_students(self):
+        from .management.commands.stress_claims import free_student_ids
+        CustomUser.objects.create_user('real', 'real@example.com', 'pw', role='STUDENT', student_id='9999998')
+        ids = free_student_ids(3)
+        self.assertEqual(ids, ['9999999', '9999997', '9999996'])
+        max_length = CustomUser._meta.get_field('student_id').max_length
+        self.assertTrue(all(len(sid) == max_length and sid.isdigit() for sid in ids))
+
+
+# ==============================================================================
+# Throttling (core/throttling.py)
+# ==============================================================================
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('30/m'), (30, 60))
+        self.assertEqual(throttling.parse_rate('10/hour'), (10, 3600))
+
+    def test_burst_then_one_token_per_interval(self):
+        # 3/m: a burst of 3, then one more every 20 seconds
+        self.assertEqual([throttling.hit('t', 'a', '3/m', now=1000) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(throttling.hit('t', 'a', '3/m', now=1000), 20)
+        self.assertEqual(throttling.hit('t', 'a', '3/m', now=1015), 5)
+        self.assertEqual(throttling.hit('t', 'a', '3/m', now=1020), 0)
+        self.assertEqual(throttling.hit('t', 'a', '3/m', now=1020), 20)
+
+    def test_refused_requests_do_not_cost_a_token(self):
+        for _ in range(3):
+            throttling.hit('t', 'a', '3/m', now=1000)
+        for _ in range(5):
+            throttling.hit('t', 'a', '3/m', now=1000)
+        self.assertEqual(throttling.hit('t', 'a', '3/m', now=1020), 0)
+
+    def test_idle_bucket_refills_to_capacity_only(self):
+        throttling.hit('t', 'a', '3/m', now=1000)
+        self.assertEqual([throttling.hit('t', 'a', '3/m', now=5000) for _ in range(4)], [0, 0, 0, 20])
+
+    def test_buckets_are_per_scope_and_client(self):
+        for _ in range(3):
+            throttling.hit('t', 'a', '3/m', now=1000)
+        self.assertEqual(throttling.hit('t', 'b', '3/m', now=1000), 0)
+        self.assertEqual(throttling.hit('other', 'a', '3/m', now=1000), 0)
+
+    def test_cache_outage_lets_requests_through(self):
+        with mock.patch.object(throttling.cache, 'get', side_effect=ConnectionError):
+            self.assertEqual(throttling.hit('t', 'a', '1/h', now=1000), 0)
+
+    @override_settings(
+        THROTTLE_RATES={'t': '1/h'}, THROTTLE_ENABLED=True, THROTTLE_PROXY_COUNT=0, STORAGES=PLAIN_STATIC,
+    )
+    def test_decorator_answers_429_with_retry_after(self):
+        view = throttling.throttle('t', methods=['POST'])(lambda request: HttpResponse('ok'))
+        factory = RequestFactory()
+        self.assertEqual(view(factory.post('/')).status_code, 200)
+        self.assertEqual(view(factory.get('/')).status_code, 200)  # GETs aren't counted
+
+        response = view(factory.post('/'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 3600)
+        self.assertEqual(view(factory.post('/', REMOTE_ADDR='10.0.0.2')).status_code, 200)
+
+    @override_settings(
+        THROTTLE_RATES={'t': '1/h'}, THROTTLE_ENABLED=True, THROTTLE_PROXY_COUNT=0, STORAGES=PLAIN_STATIC,
+    )
+    def test_json_clients_get_a_json_429(self):
+        view = throttling.throttle('t')(lambda request: HttpResponse('ok'))
+        factory = RequestFactory()
+        view(factory.get('/'))
+        for headers in ({'HTTP_ACCEPT': 'application/json'}, {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}):
+            response = view(factory.get('/', **headers))
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertJSONEqual(response.content, {'error': 'Too many requests.', 'retry_after': 3600})
+            self.assertEqual(response['Retry-After'], '3600')
+        # A page load accepts anything, HTML first
+        response = view(factory.get('/', HTTP_ACCEPT='text/html,*/*;q=0.8'))
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+    @override_settings(THROTTLE_RATES={'suggest': '1/h'}, THROTTLE_ENABLED=True, THROTTLE_PROXY_COUNT=0)
+    def test_api_views_always_answer_json(self):
+        self.assertEqual(self.client.get('/search/suggest/', {'q': 'um'}).status_code, 200)
+        response = self.client.get('/search/suggest/', {'q': 'um'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['retry_after'], int(response['Retry-After']))
+
+
+# ==============================================================================
+# Photo fingerprints (core/fingerprints.py)
+# ==============================================================================
+
+def _photo(size=(400, 300), flip=False, quality=90):
+    image = Image.new('RGB', size, (240, 240, 235))
+    draw = ImageDraw.Draw(image)
+    w, h = size
+    draw.ellipse((w * 0.1, h * 0.2, w * 0.55, h * 0.9), fill=(180, 30, 30))
+    draw.rectangle((w * 0.6, h * 0.1, w * 0.9, h * 0.5), fill=(20, 60, 160))
+    if flip:
+        image = image.transpose(Image.Transpose.ROTATE_180)
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=quality)
+    out.seek(0)
+    return out
+
+
+class FingerprintTests(TestCase):
+    def test_hamming(self):
+        self.assertEqual(fingerprints.hamming(0, 0), 0)
+        self.assertEqual(fingerprints.hamming(0b1011, 0b0001), 2)
+        self.assertEqual(fingerprints.hamming(0, (1 << 64) - 1), 64)
+        # Stored hashes are signed; hamming works on the unsigned value
+        self.assertEqual(fingerprints._signed((1 << 64) - 1), -1)
+
+    def test_resized_and_recompressed_copy_is_the_same_photo(self):
+        original = fingerprints.compute(_photo())
+        copy = fingerprints.compute(_photo(size=(200, 150), quality=60))
+        other = fingerprints.compute(_photo(flip=True))
+        self.assertLessEqual(fingerprints.hamming(original[0], copy[0]), fingerprints.SAME_PHOTO_DISTANCE)
+        self.assertGreater(fingerprints.hamming(original[0], other[0]), fingerprints.SAME_PHOTO_DISTANCE)
+        self.assertEqual(len(original[2]), 64)
+        self.assertAlmostEqual(sum(original[2]), 1, places=2)
+
+    def test_similarity_ranks_the_copy_first(self):
+        def fingerprint(photo):
+            phash, dhash, histogram = fingerprints.compute(photo)
+            return SimpleNamespace(phash_u=phash, dhash_u=dhash, histogram=histogram)
+        original, copy, other = fingerprint(_photo()), fingerprint(_photo(size=(200, 150))), fingerprint(_photo(flip=True))
+        self.assertGreater(fingerprints.similarity(original, copy), 0.9)
+        self.assertGreater(fingerprints.similarity(original, copy), fingerprints.similarity(original, other))
+
+    def test_bk_tree_matches_a_linear_scan(self):
+        rng = random.Random(7)
+        base = rng.getrandbits(64)
+        values = [base ^ rng.getrandbits(64) for _ in range(200)]
+        values += [base ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for _ in range(50)]  # near misses
+        tree = fingerprints.BKTree()
+        for i, value in enumerate(values):
+            tree.add(value, i)
+        self.assertEqual(tree.size, len(values))
+        for radius in (0, 2, 10, 20, 64):
+            expected = sorted((fingerprints.hamming(base, v), i) for i, v in enumerate(values)
+                              if fingerprints.hamming(base, v) <= radius)
+            self.assertEqual(sorted(tree.search(base, radius)), expected)
+        self.assertEqual(fingerprints.BKTree().search(base, 64), [])
+
+
+class SimilarItemsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(fingerprints, '_tree', (None, None))  # no tree from another test
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.campus = Campus.objects.get(code='main')
+
+    def item(self, status, phash):
+        item = FoundItem.objects.create(
+            category='BAGS', item_name='Backpack', description='Grey backpack', color='Grey',
+            date_found=timezone.localdate(), location_found='Gym', campus=self.campus, current_status=status,
+        )
+        ImageFingerprint.objects.create(
+            source=ImageFingerprint.Source.FOUND_ITEM, object_id=item.pk, image_name=f'found_items/{item.pk}.jpg',
+            phash=fingerprints._signed(phash), dhash=0, histogram=[1 / 64] * 64,
+        )
+        return item
+
+    def test_visible_items_are_picked_before_the_limit(self):
+        phash = 0x0123456789ABCDEF
+        claimed = [self.item(FoundItem.Status.CLAIMED, phash) for _ in range(3)]
+        available = self.item(FoundItem.Status.AVAILABLE, phash ^ 0b111)  # a little further away
+        fingerprints._bump_tree()
+        query = SimpleNamespace(phash_u=phash, dhash_u=0, histogram=[1 / 64] * 64)
+
+        self.assertEqual(set(fingerprints.similar_items(query, limit=3)), {item.pk for item in claimed})
+        visible = FoundItem.objects.filter(current_status=FoundItem.Status.AVAILABLE)
+        self.assertEqual(list(fingerprints.similar_items(query, limit=1, among=visible)), [available.pk])
+        self.assertEqual(fingerprints.similar_items(query, exclude={available.pk}, among=visible), {})
+
+
+# ==============================================================================
+# Media delivery (core/media.py)
+# ==============================================================================
+
+class MediaTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for name in ('found_items/bag.jpg', 'claims_evidence/proof.jpg'):
+            os.makedirs(os.path.join(root, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(root, name), 'wb') as fh:
+                fh.write(b'jpeg')
+        patcher = override_settings(MEDIA_ROOT=root, MEDIA_ACCEL_REDIRECT_PREFIX='', MEDIA_SENDFILE_HEADER='')
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.factory = RequestFactory()
+
+    def get(self, path, **params):
+        return media.serve_media(self.factory.get('/media/' + path, params), path)
+
+    def test_public_photos_need_no_signature(self):
+        response = self.get('found_items/bag.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], media.PUBLIC_CACHE)
+
+    def test_private_files_need_a_valid_signature(self):
+        name = 'claims_evidence/proof.jpg'
+        with self.assertRaises(Http404):
+            self.get(name)
+        with self.assertRaises(Http404):
+            self.get(name, t=media.sign('claims_evidence/other.jpg'))
+        response = self.get(name, t=media.sign(name))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+    def test_expired_signature(self):
+        name = 'claims_evidence/proof.jpg'
+        with mock.patch('time.time', return_value=1_000_000):
+            token = media.sign(name)
+        with self.assertRaises(Http404):
+            self.get(name, t=token)
+
+    def test_traversal_out_of_the_public_folder(self):
+        for path in ('found_items/../claims_evidence/proof.jpg', 'found_items/./../claims_evidence/proof.jpg',
+                     '../found_items/bag.jpg', '/etc/passwd', 'found_items\\..\\claims_evidence\\proof.jpg'):
+            with self.assertRaises(Http404, msg=path):
+                self.get(path)
+        # Even a valid signature for the real name doesn't open a disguised path
+        with self.assertRaises(Http404):
+            self.get('found_items/../claims_evidence/proof.jpg', t=media.sign('claims_evidence/proof.jpg'))
+
+    def test_accel_redirect_uses_the_normalised_name(self):
+        with override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected/'):
+            response = self.get('found_items//./bag.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/found_items/bag.jpg')
+
+
+# ==============================================================================
+# Archival (core/archive.py)
+# ==============================================================================
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.campus = Campus.objects.get(code='main')
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.campus)
+        self.student = CustomUser.objects.create_user('ana', 'ana@example.com', 'pw', role='STUDENT', campus=self.campus)
+        self.report = HandInReport.objects.create(
+            category='BAGS', item_name='Blue backpack', description='Laptop sleeve inside', color='Blue',
+            location_found='Gym', campus=self.campus,
+        )
+        self.item = transitions.receive_handin(self.report.pk, self.staff)
+        self.ticket = LostItemTicket.objects.create(
+            owner=self.student, category='BAGS', item_name='Backpack', description='Blue, laptop sleeve',
+            color='Blue', date_lost=timezone.localdate(), location_lost='Gym', campus=self.campus,
+        )
+        self.claim = transitions.open_claim(ClaimRequest(proof_of_ownership='My initials inside'), self.item, self.student)
+
+    def later(self, days):
+        return timezone.now() + datetime.timedelta(days=days)
+
+    def run_archive(self, days):
+        with mock.patch.object(archive.timezone, 'now', return_value=self.later(days)):
+            return archive.run()
+
+    def archived(self, kind):
+        return set(ArchivedRecord.objects.filter(kind=kind).values_list('object_id', flat=True))
+
+    def test_picked_up_item_ticket_and_hand_in_are_archived_in_order(self):
+        transitions.approve_claim(self.claim.pk, self.staff)
+        transitions.complete_claim(self.claim.pk, self.staff)
+        # Tickets wait for the item that holds their claim, hand-ins for their item
+        self.assertEqual(archive.pending(self.later(400)), {
+            ArchivedRecord.Kind.LOST_TICKET: 0, ArchivedRecord.Kind.FOUND_ITEM: 1, ArchivedRecord.Kind.HAND_IN: 0,
+        })
+
+        moved = self.run_archive(400)
+        self.assertEqual(set(moved.values()), {1})
+        self.assertEqual(self.archived(ArchivedRecord.Kind.FOUND_ITEM), {self.item.pk})
+        self.assertEqual(self.archived(ArchivedRecord.Kind.LOST_TICKET), {self.ticket.pk})
+        self.assertEqual(self.archived(ArchivedRecord.Kind.HAND_IN), {self.report.pk})
+        record = ArchivedRecord.objects.get(kind=ArchivedRecord.Kind.FOUND_ITEM)
+        self.assertEqual([claim['status'] for claim in record.data['claims']], ['COMPLETED'])
+        self.assertFalse(FoundItem.all_objects.filter(pk=self.item.pk).exists())
+
+    def test_approved_claim_counts_as_finished_once_past_the_cutoff(self):
+        transitions.approve_claim(self.claim.pk, self.staff)
+        self.assertEqual(sum(self.run_archive(30).values()), 0)
+        self.assertEqual(self.run_archive(400)[ArchivedRecord.Kind.FOUND_ITEM], 1)
+
+    def test_recent_approval_keeps_an_old_item(self):
+        transitions.approve_claim(self.claim.pk, self.staff)
+        FoundItem.all_objects.filter(pk=self.item.pk).update(updated_at=self.later(-400))
+        self.assertEqual(self.run_archive(0)[ArchivedRecord.Kind.FOUND_ITEM], 0)
+
+    def test_pending_claim_keeps_everything(self):
+        FoundItem.all_objects.filter(pk=self.item.pk).update(current_status=FoundItem.Status.DONATED)
+        self.assertEqual(sum(self.run_archive(400).values()), 0)
+
+    def test_closed_ticket_without_claims(self):
+        transitions.reject_claim(self.claim.pk, self.staff)
+        ClaimRequest.objects.filter(pk=self.claim.pk).delete()
+        LostItemTicket.objects.filter(pk=self.ticket.pk).update(status=LostItemTicket.Status.CLOSED)
+        self.assertEqual(self.run_archive(400)[ArchivedRecord.Kind.LOST_TICKET], 1)
+        # The item is still available, so its hand-in stays too
+        self.assertEqual(self.archived(ArchivedRecord.Kind.FOUND_ITEM), set())
+        self.assertEqual(self.archived(ArchivedRecord.Kind.HAND_IN), set())
+
+    def test_completing_needs_an_approved_claim(self):
+        with self.assertRaises(TransitionError):
+            transitions.complete_claim(self.claim.pk, self.staff)
+
+
+# ==============================================================================
+# Staff imports (core/importers.py, run by the outbox dispatcher)
+# ==============================================================================
+
+class QueuedImportTests(TransactionTestCase):
+    """Real commits: each batch of a queued import must commit on its own."""
+
+    def setUp(self):
+        self.campus, _ = Campus.objects.get_or_create(code='main', defaults={'name': 'Main Campus'})
+        staging = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, staging)
+        patcher = override_settings(UPLOAD_STAGING_DIR=staging, OUTBOX_EAGER=False)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def queue(self, names):
+        lines = ['category,item_name,description,color,date_found,location_found']
+        lines += [f'CLOTHING,{name},Found on a chair,Grey,2026-01-05,Library' for name in names]
+        upload = SimpleUploadedFile('legacy.csv', '\n'.join(lines).encode())
+        importers.queue_upload(upload, None, batch_size=2, campus=self.campus)
+        return OutboxEvent.objects.get(event_type='ImportRequested')
+
+    def test_a_failing_batch_keeps_the_committed_ones_and_resumes(self):
+        event = self.queue([f'Hoodie {i}' for i in range(5)])  # rows 2-6: batches of 2, 2, 1
+        bulk_create = FoundItem.objects.bulk_create
+        calls = []
+
+        def second_batch_fails(objs, *args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise DatabaseError("disk full")
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(FoundItem.objects, 'bulk_create', side_effect=second_batch_fails), \
+                self.assertLogs('core.outbox', 'ERROR'):
+            outbox.dispatch()
+
+        event.refresh_from_db()
+        self.assertIsNone(event.dispatched_at)
+        self.assertIn('disk full', event.last_error)
+        self.assertEqual(sorted(FoundItem.objects.values_list('item_name', flat=True)), ['Hoodie 0', 'Hoodie 1'])
+        self.assertEqual(event.payload['progress']['row'], 3)
+        self.assertTrue(os.path.exists(event.payload['path']))
+
+        outbox.retry(OutboxEvent.objects.filter(pk=event.pk))
+        outbox.dispatch()
+        event.refresh_from_db()
+        self.assertIsNotNone(event.dispatched_at)
+        self.assertEqual(FoundItem.objects.count(), 5)  # no row imported twice
+        finished = AuditLog.objects.get(action='IMPORT_FINISHED')
+        self.assertEqual(finished.changes['created'], 5)
+        self.assertFalse(os.path.exists(event.payload['path']))
+
+    def test_skipped_rows_are_counted_across_a_resume(self):
+        event = self.queue(['Scarf', '', 'Beanie'])  # row 3 has no name
+        event.payload['progress'] = {'row': 3, 'created': 1, 'batches': 1, 'skipped': 1, 'errors': [[3, 'item_name: required']]}
+        event.save()
+        result = importers.run_queued(event.payload)
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.skipped, 1)
+        self.assertEqual(list(FoundItem.objects.values_list('item_name', flat=True)), ['Beanie'])
+
+
+# ==============================================================================
+# Audit trail (core/audit.py)
+# ==============================================================================
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class AuditTrailTests(TestCase):
+    def setUp(self):
+        self.campus = Campus.objects.get(code='main')
+        self.admin = CustomUser.objects.create_user('boss', 'boss@example.com', 'pw', role='ADMIN')
+
+    def entry(self, timestamp, action='UPDATED_ITEM', target='1', **changes):
+        return AuditLog.objects.create(
+            action=action, target_model='FoundItem', target_object_id=target, timestamp=timestamp,
+            changes=changes, campus=self.campus,
+        )
+
+    def test_cursor_round_trip(self):
+        entry = self.entry(timezone.now())
+        self.assertEqual(audit.parse_cursor(audit.cursor(entry)), (entry.timestamp, entry.pk))
+
+    def test_crafted_cursors_are_ignored(self):
+        for text in ('', 'abc', '12', '1_2_3', '-5_1', '9' * 30 + '_1', '1_' + '9' * 30, '9' * 5000 + '_1'):
+            self.assertIsNone(audit.parse_cursor(text), text[:40])
+        self.client.force_login(self.admin)
+        response = self.client.get('/dashboard/audit-logs/', {'before': '9' * 30 + '_1'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_paging_neither_skips_nor_repeats_entries_sharing_a_timestamp(self):
+        now = timezone.now()
+        # Written late by the dispatcher: ids out of timestamp order, several per timestamp
+        stamps = [now - datetime.timedelta(seconds=s) for s in (3, 1, 1, 2, 1, 3, 2, 1)]
+        ids = [self.entry(stamp).pk for stamp in stamps]
+        seen, before = [], None
+        with mock.patch.object(audit, 'PAGE_SIZE', 3):
+            while True:
+                page, before = audit.search(before=before)
+                seen += page
+                if before is None:
+                    break
+        self.assertEqual(sorted(entry.pk for entry in seen), sorted(ids))
+        self.assertEqual(
+            [(entry.timestamp, entry.pk) for entry in seen],
+            sorted(((entry.timestamp, entry.pk) for entry in seen), reverse=True),
+        )
+
+    def test_search_inside_changes_and_by_target(self):
+        now = timezone.now()
+        approved = self.entry(now, action='CLAIM_APPROVED', target='7', status='APPROVED')
+        self.entry(now, action='CLAIM_REJECTED', target='8', status='REJECTED')
+        self.assertEqual(audit.search(change='status=APPROVED')[0], [approved])
+        self.assertEqual(audit.search(query='FoundItem #7')[0], [approved])
+        self.assertEqual(audit.parse_change('status = APPROVED '), {'status': 'APPROVED'})
+        self.assertIsNone(audit.parse_target('Wallet #7'))
+
+    def test_timeline_shows_only_changed_fields(self):
+        now = timezone.now()
+        self.entry(now - datetime.timedelta(minutes=2), action='CREATED_ITEM', target='5',
+                   item_name='Umbrella', color='Black', current_status='AVAILABLE', description='')
+        self.entry(now - datetime.timedelta(minutes=1), target='5',
+                   item_name='Umbrella', color='Navy', current_status='AVAILABLE', description='')
+        self.entry(now, target='5', item_name='Umbrella', color='Navy', current_status='CLAIMED', description='')
+
+        created, recoloured, claimed = audit.timeline('FoundItem', 5)
+        self.assertEqual({field for field, _, _ in created.diff}, {'item_name', 'color', 'current_status'})
+        self.assertEqual(recoloured.diff, [('color', 'Black', 'Navy')])
+        self.assertEqual(claimed.diff, [('current_status', 'AVAILABLE', 'CLAIMED')])
+
+    def test_audit_pages_are_for_admins(self):
+        staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.campus)
+        self.client.force_login(staff)
+        self.assertRedirects(self.client.get('/dashboard/audit-logs/'), '/staff-dashboard/', fetch_redirect_response=False)
+
+
+# ==============================================================================
+# Student sign-up (core/forms.py)
+# ==============================================================================
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class SignUpTests(TestCase):
+    def data(self, username='newstudent', student_id='2401234'):
+        return {
+            'username': username, 'email': f'{username}@example.com', 'first_name': 'New', 'last_name': 'Student',
+            'student_id': student_id, 'program_year': '', 'password1': 'a-Long-passw0rd', 'password2': 'a-Long-passw0rd',
+        }
+
+    def test_signup_creates_a_student(self):
+        response = self.client.post('/signup/', self.data())
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        user = CustomUser.objects.get(username='newstudent')
+        self.assertEqual((user.role, user.student_id), ('STUDENT', '2401234'))
+
+    def test_taken_student_id_is_a_form_error(self):
+        CustomUser.objects.create_user('first', student_id='2401234')
+        response = self.client.post('/signup/', self.data())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('student_id', response.context['form'].errors)
+        self.assertFalse(CustomUser.objects.filter(username='newstudent').exists())
+
+    def test_race_past_the_form_check_is_caught_by_the_constraint(self):
+        form = StudentSignUpForm(self.data())
+        self.assertTrue(form.is_valid())
+        CustomUser.objects.create_user('quicker', student_id='2401234')  # signed up in between
+
+        self.assertIsNone(form.save())
+        self.assertIn('student_id', form.errors)
+        self.assertEqual(CustomUser.objects.filter(student_id='2401234').count(), 1)
+
+    def test_race_on_the_username_reports_the_username(self):
+        form = StudentSignUpForm(self.data())
+        self.assertTrue(form.is_valid())
+        CustomUser.objects.create_user('newstudent', student_id='2409999')
+
+        self.assertIsNone(form.save())
+        self.assertIn('username', form.errors)
+        self.assertNotIn('student_id', form.errors)
+
+
+# ==============================================================================
+# Analytics rollups (core/analytics.py)
+# ==============================================================================
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.campus = Campus.objects.get(code='main')
+        self.north = Campus.objects.create(code='north', name='North')
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.campus)
+        self.student = CustomUser.objects.create_user('ana', 'ana@example.com', 'pw', role='STUDENT', campus=self.campus)
+        self.today = timezone.localdate()
+
+    def item(self, location, days_ago=0, category='BAGS', campus=None):
+        item = FoundItem.objects.create(
+            item_name='Bag', category=category, description='-', color='Blue', date_found=self.today,
+            location_found=location, registered_by=self.staff, campus=campus or self.campus,
+        )
+        enrolled = timezone.now() - datetime.timedelta(days=days_ago)
+        FoundItem.objects.filter(pk=item.pk).update(date_enrolled=enrolled)
+        item.date_enrolled = enrolled
+        return item
+
+    def counts(self, **filters):
+        return {
+            (row.metric, row.category, row.location): row.count
+            for row in DailyRollup._base_manager.filter(**filters)
+        }
+
+    def test_counts_per_day_category_and_normalised_location(self):
+        self.item('library 2nd FLOOR ')
+        self.item('Library 2nd Floor')
+        self.item('Gym', category='ELECTRONICS')
+        self.item('Gym', days_ago=3)  # outside the window
+        LostItemTicket.objects.create(
+            owner=self.student, category='BAGS', item_name='Bag', description='-', color='Blue',
+            date_lost=self.today, location_lost='gym', campus=self.campus,
+        )
+
+        analytics.refresh(self.today - datetime.timedelta(days=1), self.today)
+        self.assertEqual(self.counts(day=self.today), {
+            ('FOUND', 'BAGS', 'Library 2nd Floor'): 2,
+            ('FOUND', 'ELECTRONICS', 'Gym'): 1,
+            ('TICKET_OPENED', 'BAGS', 'Gym'): 1,
+        })
+        # Days outside the window are left alone
+        self.assertFalse(DailyRollup._base_manager.exclude(day=self.today).exists())
+
+    def test_claims_count_on_the_approval_day_with_turnaround(self):
+        item = self.item('Gym', days_ago=4)
+        claim = transitions.open_claim(ClaimRequest(proof_of_ownership='Mine'), item, self.student)
+        transitions.approve_claim(claim.pk, self.staff)
+
+        analytics.refresh(self.today, self.today)
+        claimed = DailyRollup._base_manager.get(day=self.today, metric='CLAIMED')
+        self.assertEqual((claimed.count, claimed.turnaround_days), (1, {'4': 1}))
+
+    def test_rerunning_replaces_rather_than_adds(self):
+        self.item('Gym')
+        analytics.refresh(self.today, self.today)
+        self.item('Gym')
+        analytics.refresh(self.today, self.today)
+        self.assertEqual(self.counts(), {('FOUND', 'BAGS', 'Gym'): 2})
+
+    def test_rollups_and_report_are_per_campus(self):
+        self.item('Gym')
+        self.item('Gym', campus=self.north)
+        self.item('Gym', campus=self.north)
+        analytics.refresh(self.today, self.today)
+        self.assertEqual(self.counts(campus=self.north), {('FOUND', 'BAGS', 'Gym'): 2})
+
+        with tenancy.activate(self.campus):
+            report = analytics.report(analytics.default_window_start())
+        bags = next(row for row in report['by_category'] if row['category'] == 'Bags & Wallets')
+        self.assertEqual(bags['found'], 1)
+
+    @override_settings(TIME_ZONE='Asia/Manila')
+    def test_window_starts_from_the_local_date(self):
+        # 20:00 UTC is already the next day in Manila
+        now = datetime.datetime(2026, 3, 1, 20, 0, tzinfo=datetime.timezone.utc)
+        with mock.patch.object(timezone, 'now', return_value=now):
+            self.assertEqual(analytics.default_window_start(days=0), datetime.date(2026, 3, 2))
+
+
+# ==============================================================================
+# Transactional outbox (core/outbox.py)
+# ==============================================================================
+
+@override_settings(OUTBOX_EAGER=False, OUTBOX_MAX_ATTEMPTS=3, OUTBOX_LEASE_SECONDS=60, OUTBOX_RETRY_SECONDS=5)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.seen = []
+        patcher = mock.patch.dict(outbox._handlers, {'Test': []})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def on(self, func, atomic=True):
+        outbox.handler('Test', atomic=atomic)(func)
+        return func
+
+    def recorder(self):
+        def record(event):
+            self.seen.append(event.payload['n'])
+        return self.on(record)
+
+    def backdate(self, **filters):
+        # Let the lease or the backoff run out
+        OutboxEvent.objects.filter(**filters).update(available_at=timezone.now() - datetime.timedelta(seconds=1))
+
+    def test_claim_leases_oldest_first_and_skips_leased_events(self):
+        for n in range(3):
+            outbox.emit('Test', n=n)
+        now = timezone.now()
+        first = outbox.claim(2, now=now)
+        self.assertEqual([event.payload['n'] for event in first], [0, 1])
+        self.assertTrue(all(event.attempts == 1 and event.available_at > now for event in first))
+        self.assertEqual([event.payload['n'] for event in outbox.claim(10, now=now)], [2])
+        self.assertEqual(outbox.claim(10, now=now), [])
+        # A dispatcher that died mid-batch: its events come back when the lease runs out
+        later = now + datetime.timedelta(seconds=61)
+        self.assertEqual(len(outbox.claim(10, now=later)), 3)
+
+    def test_explicit_key_drops_the_second_event(self):
+        outbox.emit('Test', key='claim-approved:1', n=1)
+        outbox.emit('Test', key='claim-approved:1', n=2)
+        self.assertEqual(OutboxEvent.objects.filter(event_type='Test').count(), 1)
+
+    def test_failed_handler_is_retried_alone_after_a_backoff(self):
+        record = self.recorder()
+        failures = iter([RuntimeError('cache down')])
+
+        @self.on
+        def flaky(event):
+            error = next(failures, None)
+            if error:
+                raise error
+
+        outbox.emit('Test', n=1)
+        with self.assertLogs('core.outbox', 'ERROR'):
+            outbox.dispatch()
+        event = OutboxEvent.objects.get(event_type='Test')
+        self.assertIsNone(event.dispatched_at)
+        self.assertIn('cache down', event.last_error)
+        self.assertEqual(event.handled, [outbox._name(record)])
+        self.assertAlmostEqual((event.available_at - timezone.now()).total_seconds(), 5, delta=2)
+
+        self.assertEqual(outbox.dispatch(), 0)  # still backing off
+        self.backdate(pk=event.pk)
+        outbox.dispatch()
+        event.refresh_from_db()
+        self.assertIsNotNone(event.dispatched_at)
+        self.assertEqual(event.last_error, '')
+        self.assertEqual(self.seen, [1])  # the handler that succeeded didn't run again
+
+    def test_event_is_dead_after_max_attempts_until_retried(self):
+        @self.on
+        def broken(event):
+            raise RuntimeError('bug')
+
+        outbox.emit('Test', n=1)
+        with self.assertLogs('core.outbox', 'ERROR'):
+            for _ in range(3):
+                outbox.dispatch()
+                self.backdate(event_type='Test')
+        self.assertEqual(outbox.dispatch(), 0)
+        self.assertEqual(outbox.stats()['dead'], 1)
+
+        self.assertEqual(outbox.retry(OutboxEvent.objects.all()), 1)
+        self.assertEqual(outbox.stats()['dead'], 0)
+        self.assertEqual(OutboxEvent.objects.get().attempts, 0)
+
+    def test_failing_handler_rolls_back_only_its_own_writes(self):
+        @self.on
+        def half_done(event):
+            SequenceCounter.objects.create(name='outbox-test')
+            raise RuntimeError('late failure')
+
+        outbox.emit('Test', n=1)
+        with self.assertLogs('core.outbox', 'ERROR'):
+            outbox.dispatch()
+        self.assertFalse(SequenceCounter.objects.filter(name='outbox-test').exists())
+
+    def test_renew_extends_the_lease_and_saves_progress(self):
+        outbox.emit('Test', n=1)
+        event, = outbox.claim(1)
+        leased = event.available_at
+        outbox.renew(event, progress={'row': 500})
+        stored = OutboxEvent.objects.get(pk=event.pk)
+        self.assertEqual(stored.payload, {'n': 1, 'progress': {'row': 500}})
+        self.assertGreaterEqual(stored.available_at, leased)
+
+        # The lease ran out and another dispatcher claimed the event
+        self.backdate(pk=event.pk)
+        outbox.claim(1)
+        with self.assertRaises(outbox.LeaseLost):
+            outbox.renew(event, progress={'row': 1000})
+        self.assertEqual(OutboxEvent.objects.get(pk=event.pk).payload['progress'], {'row': 500})
+
+    def test_purge_keeps_undelivered_and_recent_events(self):
+        outbox.emit('Test', n=1)
+        outbox.emit('Test', n=2)
+        old, recent = OutboxEvent.objects.order_by('id')
+        OutboxEvent.objects.filter(pk=old.pk).update(dispatched_at=timezone.now() - datetime.timedelta(days=30))
+        self.assertEqual(outbox.purge(days=7), 1)
+        self.assertEqual(list(OutboxEvent.objects.values_list('pk', flat=True)), [recent.pk])
+
+
+@override_settings(OUTBOX_EAGER=True)
+class EagerOutboxTests(TransactionTestCase):
+    # Real commits: on_commit never fires inside TestCase's transaction
+    def setUp(self):
+        self.seen = []
+        patcher = mock.patch.dict(outbox._handlers, {'Test': []})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        @outbox.handler('Test')
+        def record(event):
+            self.seen.append(event.payload['n'])
+            if event.payload['n'] == 0:
+                outbox.emit('Test', n=99)  # emitted during the drain: picked up by it
+
+    def test_one_drain_per_transaction_after_commit(self):
+        with mock.patch.object(outbox, 'dispatch', wraps=outbox.dispatch) as dispatch:
+            with transaction.atomic():
+                for n in range(3):
+                    outbox.emit('Test', n=n)
+                self.assertEqual(self.seen, [])  # nothing before the commit
+            self.assertEqual(sorted(self.seen), [0, 1, 2, 99])
+            # The batch, then once more for the event its handler emitted
+            self.assertEqual(dispatch.call_count, 2)
+        self.assertFalse(OutboxEvent.objects.filter(dispatched_at__isnull=True).exists())
+
+    def test_rolled_back_transaction_drains_nothing(self):
+        with mock.patch.object(outbox, 'dispatch') as dispatch:
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                outbox.emit('Test', n=1)
+                raise DatabaseError
+        dispatch.assert_not_called()
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+# ==============================================================================
+# Chunked uploads (core/uploads.py)
+# ==============================================================================
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        staging = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, staging)
+        patcher = override_settings(
+            UPLOAD_STAGING_DIR=staging, UPLOAD_CHUNK_BYTES=4096, UPLOAD_MAX_BYTES=64 * 1024, THROTTLE_ENABLED=False,
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.student = CustomUser.objects.create_user(
+            'ana', 'ana@example.com', 'pw', role='STUDENT', campus=Campus.objects.get(code='main'),
+        )
+        self.client.force_login(self.student)
+        self.photo = _photo().getvalue()
+
+    def start(self, size=None):
+        response = self.client.post('/uploads/', {'filename': 'proof.jpg', 'size': size or len(self.photo)})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['token']
+
+    def send(self, token, offset, data):
+        return self.client.post(f'/uploads/{token}/?offset={offset}', data, content_type='application/octet-stream')
+
+    def test_chunks_in_order_complete_the_upload(self):
+        token = self.start()
+        for offset in range(0, len(self.photo), 4096):
+            response = self.send(token, offset, self.photo[offset:offset + 4096])
+            self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['complete'])
+        staged = uploads.staged_file(token)
+        self.assertEqual(staged.read(), self.photo)
+        staged.close()
+
+    def test_resume_after_a_dropped_connection(self):
+        token = self.start()
+        self.send(token, 0, self.photo[:4096])
+        # The browser lost track; it asks how far the server got
+        self.assertEqual(self.client.get(f'/uploads/{token}/').json()['offset'], 4096)
+        self.assertIsNone(uploads.staged_file(token))
+        offset = 4096
+        while offset < len(self.photo):
+            self.assertEqual(self.send(token, offset, self.photo[offset:offset + 4096]).status_code, 200)
+            offset += 4096
+        self.assertIsNotNone(uploads.staged_file(token))
+
+    def test_wrong_offset_is_refused_and_nothing_is_written(self):
+        token = self.start()
+        self.send(token, 0, self.photo[:4096])
+        for offset in (0, 8192):  # a retried chunk, a skipped chunk
+            response = self.send(token, offset, self.photo[offset:offset + 4096])
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.json()['offset'], 4096)
+
+    def test_size_caps(self):
+        response = self.client.post('/uploads/', {'filename': 'huge.jpg', 'size': 64 * 1024 + 1})
+        self.assertEqual(response.status_code, 413)
+        token = self.start()
+        self.assertEqual(self.send(token, 0, self.photo[:4097]).status_code, 413)  # over a chunk
+        token = self.start(size=100)
+        self.assertEqual(self.send(token, 0, self.photo[:101]).status_code, 413)  # over the announced size
+        self.assertEqual(uploads.received(ChunkedUpload.objects.get(token=token)), 0)
+
+    def test_a_finished_file_that_is_not_a_photo_is_thrown_away(self):
+        token = self.start(size=10)
+        response = self.send(token, 0, b'not a jpg!')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['offset'], 0)
+
+    def test_uploads_belong_to_their_owner(self):
+        token = self.start()
+        other = CustomUser.objects.create_user('ben', 'ben@example.com', 'pw', role='STUDENT')
+        self.client.force_login(other)
+        self.assertEqual(self.send(token, 0, self.photo[:4096]).status_code, 404)
+
+
+# ==============================================================================
+# Kiosk hand-in sync (core/kiosk.py)
+# ==============================================================================
+
+@override_settings(THROTTLE_ENABLED=False)
+class KioskSyncTests(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(
+            'desk', 'desk@example.com', 'pw', role='STAFF', campus=Campus.objects.get(code='main'),
+        )
+        self.client.force_login(self.staff)
+
+    def entry(self, key, **fields):
+        return {'key': key, 'category': 'BAGS', 'item_name': 'Backpack', 'description': 'Blue',
+                'color': 'Blue', 'location_found': 'Gym', **fields}
+
+    def sync(self, *entries):
+        return self.client.post('/kiosk/handins/sync/', {'handins': list(entries)}, content_type='application/json')
+
+    def test_resent_batch_returns_the_same_codes_without_creating_again(self):
+        batch = [self.entry('k1'), self.entry('k2', item_name='Umbrella'), self.entry('k3', item_name='')]
+        first = self.sync(*batch).json()
+        self.assertEqual([r['status'] for r in first['results']], ['created', 'created', 'invalid'])
+        self.assertEqual(first['created'], 2)
+        self.assertIn('item_name', first['results'][2]['errors'])
+
+        again = self.sync(*batch).json()  # the answer was lost; the kiosk retries
+        self.assertEqual([r['status'] for r in again['results']], ['duplicate', 'duplicate', 'invalid'])
+        self.assertEqual(again['created'], 0)
+        self.assertEqual(
+            [r['reference_code'] for r in again['results'][:2]], [r['reference_code'] for r in first['results'][:2]],
+        )
+        self.assertEqual(HandInReport.objects.count(), 2)
+        self.assertEqual(OutboxEvent.objects.filter(event_type='HandInSaved').count(), 2)
+
+    def test_repeated_key_within_a_batch_is_created_once(self):
+        results = self.sync(self.entry('k1'), self.entry('k1')).json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'duplicate'])
+        self.assertEqual(results[0]['reference_code'], results[1]['reference_code'])
+
+    def test_losing_a_race_with_the_same_batch_reports_duplicates(self):
+        winner = kiosk.sync([self.entry('k1')])[0]
+        # Our lookup ran before the other request committed
+        lookups = [HandInReport._base_manager.none()]
+        real_filter = HandInReport._base_manager.filter
+        with mock.patch.object(HandInReport._base_manager, 'filter',
+                               side_effect=lambda *a, **kw: lookups.pop() if lookups else real_filter(*a, **kw)):
+            result = kiosk.sync([self.entry('k1')])[0]
+        self.assertEqual((result['status'], result['reference_code']), ('duplicate', winner['reference_code']))
+        self.assertEqual(HandInReport.objects.count(), 1)
+
+    def test_unusable_requests(self):
+        response = self.client.post('/kiosk/handins/sync/', 'nope', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.sync(self.entry('')).json()['results'][0]['status'], 'invalid')
+        with override_settings(KIOSK_SYNC_MAX_BATCH=1):
+            self.assertEqual(self.sync(self.entry('k1'), self.entry('k2')).status_code, 400)
+        self.client.force_login(CustomUser.objects.create_user('ana', 'ana@example.com', 'pw', role='STUDENT'))
+        self.assertEqual(self.sync(self.entry('k1')).status_code, 403)
+        self.assertFalse(HandInReport.objects.exists())
+
+
+# ==============================================================================
+# Campus tenancy (core/tenancy.py)
+# ==============================================================================
+
+@override_settings(STORAGES=PLAIN_STATIC, ALLOWED_HOSTS=['*'], CROSS_CAMPUS_MATCHING=False)
+class CampusScopingTests(TestCase):
+    def setUp(self):
+        self.main = Campus.objects.get(code='main')
+        self.north = Campus.objects.create(code='north', name='North', hostname='north.example.edu')
+        tenancy.forget_campuses()
+        self.addCleanup(tenancy.forget_campuses)
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.main)
+        self.north_staff = CustomUser.objects.create_user('nd', 'nd@example.com', 'pw', role='STAFF', campus=self.north)
+        student = CustomUser.objects.create_user('ana', 'ana@example.com', 'pw', role='STUDENT', campus=self.main)
+        self.item = self.found('Main umbrella', self.main)
+        self.north_item = self.found('North umbrella', self.north)
+        self.claim = transitions.open_claim(ClaimRequest(proof_of_ownership='Mine'), self.item, student)
+
+    def found(self, name, campus):
+        return FoundItem.objects.create(
+            item_name=name, category='OTHERS', description='-', color='Black', date_found=timezone.localdate(),
+            location_found='Gate', registered_by=self.staff, campus=campus,
+        )
+
+    def test_managers_only_see_the_active_campus(self):
+        with tenancy.activate(self.north):
+            self.assertEqual(list(FoundItem.objects.all()), [self.north_item])
+            self.assertFalse(ClaimRequest.objects.exists())  # scoped through its item
+            with self.assertRaises(FoundItem.DoesNotExist):
+                FoundItem.objects.get(pk=self.item.pk)
+            with tenancy.all_campuses():
+                self.assertEqual(FoundItem.objects.count(), 2)
+            self.assertEqual(FoundItem._base_manager.count(), 2)
+        # Nothing active (commands, cron): every campus
+        self.assertEqual(FoundItem.objects.count(), 2)
+        self.assertEqual(list(ClaimRequest.objects.all()), [self.claim])
+
+    def test_soft_deleted_items_stay_hidden_per_campus(self):
+        FoundItem.objects.filter(pk=self.north_item.pk).update(deleted_at=timezone.now())
+        with tenancy.activate(self.north):
+            self.assertFalse(FoundItem.objects.exists())
+            self.assertEqual(FoundItem.all_objects.filter(campus=self.north).count(), 1)
+
+    def test_staff_pages_list_their_own_campus(self):
+        self.client.force_login(self.north_staff)
+        response = self.client.get('/dashboard/items/')
+        self.assertEqual(list(response.context['items']), [self.north_item])
+        # Another campus's claim doesn't exist as far as this desk is concerned
+        response = self.client.get(f'/staff/process-claim/{self.claim.pk}/approve/')
+        self.assertEqual(response.status_code, 404)
+        self.claim.refresh_from_db()
+        self.assertEqual(self.claim.status, 'PENDING')
+
+    def test_visitors_get_the_campus_of_the_host_or_their_choice(self):
+        response = self.client.get('/browse-found-items/', HTTP_HOST='north.example.edu')
+        self.assertEqual(list(response.context['items']), [self.north_item])
+        response = self.client.get('/browse-found-items/')
+        self.assertEqual(list(response.context['items']), [self.item])  # DEFAULT_CAMPUS
+        self.client.get('/browse-found-items/', {'campus': 'north'})
+        response = self.client.get('/browse-found-items/')  # remembered in the session
+        self.assertEqual(list(response.context['items']), [self.north_item])
+
+    def test_signed_in_users_cannot_switch_campus(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/dashboard/items/', {'campus': 'north'})
+        self.assertEqual(list(response.context['items']), [self.item])
+
+
+# ==============================================================================
+# Disposal of unclaimed items (core/disposal.py)
+# ==============================================================================
+
+@override_settings(DISPOSAL_RETENTION_DAYS={'default': 30}, DISPOSAL_NOTICE_DAYS=7)
+class DisposalTests(TestCase):
+    def setUp(self):
+        self.campus = Campus.objects.get(code='main')
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.campus)
+        self.owner = CustomUser.objects.create_user('ana', 'ana@example.com', 'pw', role='STUDENT', campus=self.campus)
+        self.now = timezone.now()
+        self.old = self.found('Old umbrella', days=40)
+        self.nearly = self.found('Scarf', days=25)  # inside the notice window, not yet due
+        self.young = self.found('New bottle', days=5)
+        self.claimed = self.found('Old jacket', days=40)
+        self.ticket = LostItemTicket.objects.create(
+            owner=self.owner, category='OTHERS', item_name='My umbrella', description='-', color='Black',
+            date_lost=self.old.date_found, location_lost='Gate', campus=self.campus,
+            status=LostItemTicket.Status.MATCH_FOUND, matched_item=self.old,
+        )
+        claimant = CustomUser.objects.create_user('ben', 'ben@example.com', 'pw', role='STUDENT', campus=self.campus)
+        transitions.open_claim(ClaimRequest(proof_of_ownership='Mine'), self.claimed, claimant)
+
+    def found(self, name, days):
+        return FoundItem.objects.create(
+            item_name=name, category='OTHERS', description='-', color='Black', location_found='Gate',
+            date_found=self.now.date() - datetime.timedelta(days=days), registered_by=self.staff, campus=self.campus,
+        )
+
+    def status(self, item):
+        item.refresh_from_db()
+        return item.current_status
+
+    def test_notice_first_then_disposal_after_the_notice_period(self):
+        noticed, tickets, disposed = disposal.run(now=self.now)
+        self.assertEqual(set(noticed), {self.old.pk, self.nearly.pk, self.claimed.pk})
+        self.assertEqual(tickets, [self.ticket.pk])
+        self.assertEqual(disposed, {})  # nobody has been warned long enough
+
+        later = self.now + datetime.timedelta(days=8)
+        noticed, _, disposed = disposal.run(now=later)
+        self.assertEqual(noticed, [])  # each item is warned once
+        self.assertEqual(sorted(disposed['OTHERS']), sorted([self.old.pk, self.nearly.pk]))
+        self.assertEqual(self.status(self.old), 'DONATED')
+        self.assertEqual(self.status(self.young), 'AVAILABLE')
+        self.assertEqual(self.status(self.claimed), 'AVAILABLE')  # a pending claim holds it for staff
+
+        self.ticket.refresh_from_db()
+        self.assertEqual((self.ticket.status, self.ticket.matched_item), ('SEARCHING', None))
+        self.assertEqual(AuditLog.objects.filter(action='BULK_DISPOSAL').count(), 2)
+
+    def test_owners_of_matched_tickets_are_emailed_and_refreshed(self):
+        with mock.patch.object(disposal.live, 'bump') as bump:
+            disposal.send_notices(now=self.now)
+        bump.assert_called_once_with(self.owner.pk)
+        self.assertEqual([message.to for message in mail.outbox], [['ana@example.com']])
+        deadline = self.now.date() + datetime.timedelta(days=7)
+        self.assertIn(f'{deadline:%B %d, %Y}', mail.outbox[0].subject)
+
+    def test_unnoticed_items_are_never_disposed(self):
+        self.assertEqual(disposal.dispose(now=self.now + datetime.timedelta(days=60)), {})
+        self.assertEqual(self.status(self.old), 'AVAILABLE')
+
+    def test_retention_per_category(self):
+        with override_settings(DISPOSAL_RETENTION_DAYS={'default': 30, 'OTHERS': 60}):
+            noticed, _ = disposal.send_notices(now=self.now)
+        self.assertEqual(noticed, [])
+
+
+# ==============================================================================
+# Search suggestions (core/suggest.py)
+# ==============================================================================
+
+@override_settings(THROTTLE_ENABLED=False)
+class SuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.dict(suggest._indexes, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.campus = Campus.objects.get(code='main')
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.campus)
+
+    def found(self, name, location='Main Library', campus=None):
+        return FoundItem.objects.create(
+            item_name=name, category='OTHERS', description='-', color='Black', date_found=timezone.localdate(),
+            location_found=location, registered_by=self.staff, campus=campus or self.campus,
+        )
+
+    def test_trie_matches_every_word_and_prefixes_past_max_depth(self):
+        trie = suggest.Trie()
+        for name in ('Black Leather Wallet', 'Black Leather Watch', 'Blue Umbrella', 'black leather wallet'):
+            for key in suggest._words(name):
+                trie.add(key, name)
+        self.assertEqual(trie.complete('wal'), ['Black Leather Wallet'])  # case variants count once
+        self.assertEqual(trie.complete('black leather wa'), ['Black Leather Wallet', 'Black Leather Watch'])
+        self.assertEqual(trie.complete('black leather wat'), ['Black Leather Watch'])  # past MAX_DEPTH
+        self.assertEqual(trie.complete('b', limit=2), ['Black Leather Wallet', 'Black Leather Watch'])
+        self.assertEqual(trie.complete('green'), [])
+
+    def test_suggestions_follow_saves(self):
+        wallet = self.found('Black Leather Wallet', location='  main LIBRARY ')
+        self.assertEqual(suggest.suggest('item', 'Lea'), ['Black Leather Wallet'])
+        self.assertEqual(suggest.suggest('location', 'lib'), ['Main Library'])
+
+        # Built already: a save patches the index in place
+        self.found('Leather Gloves')
+        self.assertEqual(suggest.suggest('item', 'leather'), ['Leather Gloves', 'Black Leather Wallet'])  # by matched words
+        wallet.current_status = FoundItem.Status.CLAIMED
+        wallet.save()
+        self.assertEqual(suggest.suggest('item', 'leather'), ['Leather Gloves'])
+
+    def test_reference_codes_with_or_without_prefix_and_dashes(self):
+        report = HandInReport.objects.create(
+            category='OTHERS', item_name='Keys', description='-', color='Silver', location_found='Gate',
+            campus=self.campus,
+        )
+        code = report.reference_code
+        for query in (code, code[:6], code[4:8], code.replace('-', '').lower()):
+            self.assertEqual(suggest.suggest('reference', query), [code], query)
+
+    def test_each_campus_has_its_own_index(self):
+        north = Campus.objects.create(code='north', name='North')
+        self.found('Red Scarf')
+        self.found('Red Kettle', campus=north)
+        with tenancy.activate(north):
+            self.assertEqual(suggest.suggest('item', 'red'), ['Red Kettle'])
+        with tenancy.all_campuses():
+            self.assertEqual(suggest.suggest('item', 'red'), ['Red Kettle', 'Red Scarf'])
+
+    def test_endpoint_hides_reference_codes_from_the_public(self):
+        self.found('Blue Umbrella')
+        response = self.client.get('/search/suggest/', {'field': 'item', 'q': 'umb'})
+        self.assertEqual(response.json(), {'field': 'item', 'results': ['Blue Umbrella']})
+        self.assertEqual(self.client.get('/search/suggest/', {'field': 'reference', 'q': 'HND'}).status_code, 403)
+        self.assertEqual(self.client.get('/search/suggest/', {'field': 'owner', 'q': 'a'}).status_code, 400)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/search/suggest/', {'field': 'reference', 'q': 'HND'}).status_code, 200)
+
+
+# ==============================================================================
+# Read replica routing (core/routers.py)
+# ==============================================================================
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        # As if a replica were configured and we were outside any transaction
+        self.outside = SimpleNamespace(in_atomic_block=False)
+        for patcher in (
+            mock.patch.object(routers, 'replica_configured', return_value=True),
+            mock.patch.object(routers, 'connections', {'default': self.outside}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def read(self):
+        return self.router.db_for_read(FoundItem)
+
+    def test_reads_use_the_replica_only_where_allowed(self):
+        self.assertIsNone(self.read())
+        with routers.use_replica_for_reads():
+            self.assertEqual(self.read(), 'replica')
+            with routers.pinned_to_primary():
+                self.assertIsNone(self.read())
+            self.outside.in_atomic_block = True
+            self.assertIsNone(self.read())  # must see the transaction's own writes
+        self.assertIsNone(self.read())
+
+    def test_no_replica_configured(self):
+        with mock.patch.object(routers, 'replica_configured', return_value=False), routers.use_replica_for_reads():
+            self.assertIsNone(self.read())
+
+    def test_writes_always_go_to_the_primary(self):
+        with routers.use_replica_for_reads():
+            self.assertEqual(self.router.db_for_write(FoundItem), 'default')
+
+    def test_decorated_view_reads_from_the_replica(self):
+        view = routers.use_replica(lambda request: self.read())
+        self.assertEqual(view(None), 'replica')
+        self.assertIsNone(self.read())
+
+    @override_settings(REPLICA_PIN_SECONDS=10)
+    def test_a_post_pins_the_browser_to_the_primary(self):
+        middleware = ReplicaPinningMiddleware(routers.use_replica(lambda request: HttpResponse(self.read() or 'default')))
+        factory = RequestFactory()
+
+        self.assertEqual(middleware(factory.get('/')).content, b'replica')
+        response = middleware(factory.post('/'))
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual((cookie['max-age'], cookie['httponly']), (10, True))
+
+        request = factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        response = middleware(request)
+        self.assertEqual(response.content, b'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)  # a GET doesn't extend the pin
+
+
+# ==============================================================================
+# Metrics endpoint (core/metrics.py)
+# ==============================================================================
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        campus = Campus.objects.get(code='main')
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=campus)
+        self.student = CustomUser.objects.create_user('ana', 'ana@example.com', 'pw', role='STUDENT', campus=campus)
+
+    def scrape(self, **headers):
+        return self.client.get('/metrics', **headers)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='s3cret').status_code, 403)
+        # Staff sessions don't replace the token
+        self.client.force_login(self.staff)
+        self.assertEqual(self.scrape().status_code, 403)
+
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE http_requests_total counter', response.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_without_a_token_only_staff_can_read(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.client.force_login(self.student)
+        self.assertEqual(self.scrape().status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.scrape().status_code, 200)
+
+
+# ==============================================================================
+# Detail modal fragments (views.detail_fragment)
+# ==============================================================================
+
+@override_settings(CROSS_CAMPUS_MATCHING=False)
+class DetailFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.campus = Campus.objects.get(code='main')
+        self.north = Campus.objects.create(code='north', name='North')
+        tenancy.forget_campuses()
+        self.addCleanup(tenancy.forget_campuses)
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=self.campus)
+        self.student = CustomUser.objects.create_user('ana', 'ana@example.com', 'pw', role='STUDENT', campus=self.campus)
+        self.item = FoundItem.objects.create(
+            item_name='Umbrella', category='OTHERS', description='Black, wooden handle', color='Black',
+            date_found=timezone.localdate(), location_found='Gate', registered_by=self.staff, campus=self.campus,
+        )
+        self.claim = transitions.open_claim(ClaimRequest(proof_of_ownership='Initials on the handle'), self.item, self.student)
+
+    def fragment(self, kind, object_id):
+        return self.client.get(f'/dashboard/detail/{kind}/{object_id}/')
+
+    def test_staff_get_the_fragments(self):
+        self.client.force_login(self.staff)
+        self.assertContains(self.fragment('item', self.item.pk), 'wooden handle')
+        self.assertContains(self.fragment('claim', self.claim.pk), 'Initials on the handle')
+        self.assertEqual(self.fragment('thing', self.item.pk).status_code, 404)
+        self.assertEqual(self.fragment('item', self.item.pk + 100).status_code, 404)
+
+    def test_students_and_visitors_are_refused(self):
+        response = self.fragment('claim', self.claim.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response['Location'])
+        self.client.force_login(self.student)  # not even for their own claim
+        for kind, pk in (('item', self.item.pk), ('claim', self.claim.pk)):
+            response = self.fragment(kind, pk)
+            self.assertEqual(response.status_code, 403)
+            self.assertNotContains(response, 'Initials', status_code=403)
+
+    def test_other_campuses_objects_are_not_found(self):
+        north_staff = CustomUser.objects.create_user('nd', 'nd@example.com', 'pw', role='STAFF', campus=self.north)
+        self.client.force_login(north_staff)
+        self.assertEqual(self.fragment('item', self.item.pk).status_code, 404)
+        self.assertEqual(self.fragment('claim', self.claim.pk).status_code, 404)
+        with override_settings(CROSS_CAMPUS_MATCHING=True):  # the match tool shows every campus's items
+            self.assertEqual(self.fragment('item', self.item.pk).status_code, 200)
+
+    def test_cached_text_changes_with_the_object(self):
+        self.client.force_login(self.staff)
+        self.fragment('item', self.item.pk)
+        self.item.description = 'Navy, wooden handle'
+        self.item.save()
+        self.assertContains(self.fragment('item', self.item.pk), 'Navy, wooden handle')
+
+
+# ==============================================================================
+# Student dashboard short poll (core/live.py)
+# ==============================================================================
+
+@override_settings(LIVE_UPDATES=True, OUTBOX_EAGER=False)
+class LiveStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        campus = Campus.objects.get(code='main')
+        self.staff = CustomUser.objects.create_user('desk', 'desk@example.com', 'pw', role='STAFF', campus=campus)
+        self.student = CustomUser.objects.create_user('ana', 'ana@example.com', 'pw', role='STUDENT', campus=campus)
+        self.item = FoundItem.objects.create(
+            item_name='Umbrella', category='OTHERS', description='-', color='Black', date_found=timezone.localdate(),
+            location_found='Gate', registered_by=self.staff, campus=campus,
+        )
+        self.client.force_login(self.student)
+
+    def poll(self, since=''):
+        return self.client.get('/dashboard/status/', {'since': since}).json()
+
+    def test_unchanged_until_a_transition_touches_the_student(self):
+        first = self.poll()
+        self.assertTrue(first['changed'])  # a fresh page has no version yet
+        self.assertEqual(self.poll(first['version']), {'version': first['version'], 'changed': False})
+
+        claim = transitions.open_claim(ClaimRequest(proof_of_ownership='Mine'), self.item, self.student)
+        transitions.approve_claim(claim.pk, self.staff)
+        self.assertFalse(self.poll(first['version'])['changed'])  # nothing until the dispatcher runs
+        outbox.dispatch()
+        self.assertTrue(self.poll(first['version'])['changed'])
+
+    def test_versions_are_per_student(self):
+        mine = self.poll()['version']
+        live.bump(self.staff.pk)
+        self.assertFalse(self.poll(mine)['changed'])
+        live.bump(self.student.pk)
+        self.assertEqual(self.poll(mine)['version'], mine + 1)
+
+    def test_a_cache_flush_never_repeats_an_old_version(self):
+        mine = self.poll()['version']
+        cache.clear()
+        self.assertGreaterEqual(self.poll(mine)['version'], mine)
+
+    def test_poll_is_off_without_live_updates(self):
+        with override_settings(LIVE_UPDATES=False):
+            self.assertEqual(self.client.get('/dashboard/status/').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get('/dashboard/status/').status_code, 302)
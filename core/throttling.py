@@ -0,0 +1,112 @@
+"""
+Request throttling for the public endpoints.
+
+Token bucket per client, kept in the default cache. A rate of '10/h' means a
+bucket of 10 tokens that refills at 10 per hour. Each bucket is stored as
+one timestamp, the moment it will be full again (the GCRA form of a token
+bucket), so a check is one cache get and one set.
+
+    @throttle('hand_in', methods=['POST'])
+    def hand_in_item(request): ...
+
+Rates come from settings.THROTTLE_RATES by scope name. key='ip' buckets by
+client address. key='user' buckets by account when logged in, otherwise by
+address. When a bucket is empty the view isn't called and the client gets a
+429 with Retry-After: the throttled.html page, or {"error", "retry_after"}
+JSON for api=True views and for requests that ask for JSON (fetch/XHR).
+
+The get/set pair isn't atomic, so two requests racing on the same bucket can
+both get through. That is fine for abuse control. A cache outage lets
+everything through instead of taking the site down.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import render
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'30/m' -> (30, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0].lower()]
+
+
+def client_ip(request):
+    """Client address, trusting THROTTLE_PROXY_COUNT hops of X-Forwarded-For."""
+    proxies = settings.THROTTLE_PROXY_COUNT
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        return hops[-min(proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_key(request, key):
+    if key == 'user' and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+def hit(scope, ident, rate, now=None):
+    """Take a token from the bucket. Returns 0 if allowed, else seconds until one is free."""
+    count, period = parse_rate(rate)
+    interval = period / count          # time to refill one token
+    capacity = period - interval       # how far ahead of now a full-minus-one bucket can be
+    now = time.time() if now is None else now
+    cache_key = f'throttle:{scope}:{ident}'
+
+    try:
+        full_at = max(cache.get(cache_key) or now, now)
+        if full_at - now > capacity:
+            return full_at - now - capacity
+        cache.set(cache_key, full_at + interval, timeout=math.ceil(full_at + interval - now))
+    except Exception:
+        pass
+    return 0
+
+
+def wants_json(request):
+    # A page load accepts */* too, so look for JSON named explicitly
+    return (
+        'application/json' in request.headers.get('Accept', '')
+        or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    )
+
+
+def throttled(request, retry_after, api=False):
+    """The 429 for an empty bucket: JSON for API clients, the throttled page otherwise."""
+    if api or wants_json(request):
+        response = JsonResponse({'error': 'Too many requests.', 'retry_after': retry_after}, status=429)
+    else:
+        response = render(request, 'throttled.html', {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def throttle(scope, key='ip', methods=None, only_if=None, api=False):
+    """Throttle a view with settings.THROTTLE_RATES[scope].
+
+    `methods` limits it to e.g. POSTs, `only_if(request)` to the expensive requests.
+    api=True for views that only ever answer JSON.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            rate = settings.THROTTLE_RATES.get(scope)
+            if (
+                rate and settings.THROTTLE_ENABLED
+                and (methods is None or request.method in methods)
+                and (only_if is None or only_if(request))
+            ):
+                wait = hit(scope, client_key(request, key), rate)
+                if wait:
+                    return throttled(request, math.ceil(wait), api)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
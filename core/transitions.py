@@ -0,0 +1,291 @@
+"""
+Status transitions for found items, claims, tickets and hand-ins.
+
+Every change of status goes through here so two staff members acting on the
+same item at the same time can't both win. Each transition:
+
+1. runs in transaction.atomic()
+2. locks the rows it reads with select_for_update(). The item is always
+   locked before its claims, so concurrent approvals queue up behind one
+   lock instead of deadlocking.
+3. writes with a compare-and-swap `UPDATE ... WHERE status = <expected>`.
+   If that matches no row, someone else got there first and we raise
+   TransitionError. This still holds on SQLite, where select_for_update is
+   a no-op.
+
+The CAS writes use .update(), so post_save is sent by hand to keep the audit
+log and duplicate index receivers working as they did with save().
+
+Transitions that change what a student sees emit an outbox event naming
+them (`notify`), and the dispatcher refreshes their dashboards after the
+commit (core/events.py).
+"""
+from django.db import IntegrityError, router, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from . import metrics, outbox
+from .models import FoundItem, ClaimRequest, LostItemTicket, HandInReport
+
+
+class TransitionError(Exception):
+    """The object isn't in a state that allows this change (usually: someone beat us to it)."""
+
+
+# Allowed moves, per model and status field. Anything not listed is refused.
+TRANSITIONS = {
+    (FoundItem, 'current_status'): {
+        FoundItem.Status.AVAILABLE: {FoundItem.Status.CLAIMED, FoundItem.Status.DONATED},
+    },
+    (ClaimRequest, 'status'): {
+        ClaimRequest.Status.PENDING: {ClaimRequest.Status.APPROVED, ClaimRequest.Status.REJECTED},
+        ClaimRequest.Status.APPROVED: {ClaimRequest.Status.COMPLETED},
+    },
+    (LostItemTicket, 'status'): {
+        LostItemTicket.Status.SEARCHING: {
+            LostItemTicket.Status.MATCH_FOUND, LostItemTicket.Status.CLAIM_PENDING, LostItemTicket.Status.CLOSED,
+        },
+        LostItemTicket.Status.MATCH_FOUND: {
+            LostItemTicket.Status.MATCH_FOUND, LostItemTicket.Status.CLAIM_PENDING, LostItemTicket.Status.CLOSED,
+        },
+        LostItemTicket.Status.CLAIM_PENDING: {LostItemTicket.Status.CLOSED},
+    },
+    (HandInReport, 'is_received'): {
+        False: {True},
+    },
+}
+
+
+def _sources(model, field, target):
+    return [src for src, targets in TRANSITIONS[(model, field)].items() if target in targets]
+
+
+def _move(instance, field, target, **extra):
+    """Compare-and-swap `field` to `target` from any state allowed to reach it."""
+    model = type(instance)
+    sources = _sources(model, field, target)
+    current = getattr(instance, field)
+    if current not in sources:
+        raise TransitionError(f"{model.__name__} #{instance.pk} can't go from {current} to {target}.")
+
+    changes = {field: target, **extra}
+    if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+        changes['updated_at'] = timezone.now()  # .update() skips auto_now
+    updated = model._base_manager.filter(pk=instance.pk, **{f'{field}__in': sources}).update(**changes)
+    if not updated:
+        raise TransitionError(f"{model.__name__} #{instance.pk} was changed by someone else.")
+
+    return _saved(instance, changes)
+
+
+def _saved(instance, changes):
+    """Apply a CAS write's `changes` to the instance and send the post_save it skipped."""
+    model = type(instance)
+    for name, value in changes.items():
+        setattr(instance, name, value)
+    post_save.send(
+        sender=model, instance=instance, created=False, raw=False,
+        using=router.db_for_write(model), update_fields=frozenset(changes),
+    )
+    return instance
+
+
+def _available(item):
+    return item.current_status == FoundItem.Status.AVAILABLE and item.deleted_at is None
+
+
+def _lock(model, pk):
+    return model._base_manager.select_for_update().get(pk=pk)
+
+
+def approve_claim(claim_id, reviewer):
+    """Approve one claim, release the item and reject the other pending claims on it.
+
+    Returns (claim, ids of the claimants whose claims were auto-rejected).
+    """
+    with transaction.atomic():
+        item_id = ClaimRequest.objects.values_list('found_item_id', flat=True).get(pk=claim_id)
+        item = _lock(FoundItem, item_id)
+        claim = _lock(ClaimRequest, claim_id)
+        claim.found_item = item
+
+        if claim.status != ClaimRequest.Status.PENDING:
+            raise TransitionError(f"Claim #{claim.pk} was already {claim.get_status_display().lower()}.")
+        if not _available(item):
+            raise TransitionError(f"{item.item_name} is no longer available.")
+
+        now = timezone.now()
+        _move(item, 'current_status', FoundItem.Status.CLAIMED)
+        _move(claim, 'status', ClaimRequest.Status.APPROVED, reviewed_by=reviewer, reviewed_at=now)
+
+        if claim.ticket_id:
+            ticket = _lock(LostItemTicket, claim.ticket_id)
+            if ticket.status != LostItemTicket.Status.CLOSED:
+                _move(ticket, 'status', LostItemTicket.Status.CLOSED)
+            claim.ticket = ticket
+
+        others = ClaimRequest.objects.select_for_update().filter(
+            found_item=item, status=ClaimRequest.Status.PENDING,
+        ).exclude(pk=claim.pk)
+        rejected = list(others.values_list('claimant_id', flat=True))
+        others.update(status=ClaimRequest.Status.REJECTED, reviewed_by=reviewer, reviewed_at=now, updated_at=now)
+        outbox.emit(
+            'ClaimApproved', key=f'ClaimApproved:{claim.pk}', claim=claim.pk, item=item.pk,
+            notify=[claim.claimant_id, claim.ticket.owner_id if claim.ticket_id else None, *rejected],
+        )
+        transaction.on_commit(lambda: metrics.inc('claims_approved_total'))
+    return claim, rejected
+
+
+def reject_claim(claim_id, reviewer, reason=None):
+    with transaction.atomic():
+        claim = _lock(ClaimRequest, claim_id)
+        _move(claim, 'status', ClaimRequest.Status.REJECTED,
+              reviewed_by=reviewer, reviewed_at=timezone.now(), rejection_reason=reason)
+        outbox.emit(
+            'ClaimRejected', key=f'ClaimRejected:{claim.pk}', claim=claim.pk,
+            notify=[claim.claimant_id, claim.ticket.owner_id if claim.ticket_id else None],
+        )
+        transaction.on_commit(lambda: metrics.inc('claims_rejected_total'))
+    return claim
+
+
+def complete_claim(claim_id, staff):
+    """The claimant collected the item. After this the claim no longer keeps the item out of the archive."""
+    with transaction.atomic():
+        claim = _lock(ClaimRequest, claim_id)
+        _move(claim, 'status', ClaimRequest.Status.COMPLETED)
+        outbox.emit('ClaimCompleted', key=f'ClaimCompleted:{claim.pk}', claim=claim.pk, notify=[claim.claimant_id])
+        transaction.on_commit(lambda: metrics.inc('claims_completed_total'))
+    return claim
+
+
+def confirm_match(ticket_id, item_id):
+    """Point a ticket at an inventory item; the item must still be available."""
+    with transaction.atomic():
+        item = _lock(FoundItem, item_id)
+        ticket = _lock(LostItemTicket, ticket_id)
+        if not _available(item):
+            raise TransitionError(f"{item.item_name} is no longer available.")
+        _move(ticket, 'status', LostItemTicket.Status.MATCH_FOUND, matched_item=item)
+        outbox.emit(
+            'MatchConfirmed', key=f'MatchConfirmed:{ticket.pk}:{item.pk}', ticket=ticket.pk, item=item.pk,
+            notify=[ticket.owner_id],
+        )
+    return ticket
+
+
+def open_claim(claim, item, claimant):
+    """Save a new claim. A unique constraint allows one pending claim per student and item."""
+    try:
+        with transaction.atomic():
+            item = _lock(FoundItem, item.pk)
+            if not _available(item):
+                raise TransitionError(f"{item.item_name} is no longer available.")
+
+            claim.found_item = item
+            claim.claimant = claimant
+            # Auto-link: an open ticket of the same category moves to claim verification
+            ticket = LostItemTicket.objects.select_for_update().filter(
+                owner=claimant, category=item.category,
+                status__in=_sources(LostItemTicket, 'status', LostItemTicket.Status.CLAIM_PENDING),
+            ).first()
+            if ticket:
+                _move(ticket, 'status', LostItemTicket.Status.CLAIM_PENDING, matched_item=item)
+                claim.ticket = ticket
+            claim.save()
+    except IntegrityError:
+        raise TransitionError("You already have a pending claim for this item.")
+    return claim
+
+
+def withdraw_item(item_id, staff):
+    """Soft-delete an inventory item.
+
+    Pending claims on it are rejected and tickets waiting on it go back to
+    searching. Returns the ids of the students affected.
+    """
+    with transaction.atomic():
+        item = _lock(FoundItem, item_id)
+        if item.deleted_at:
+            raise TransitionError(f"{item.item_name} was already deleted.")
+        now = timezone.now()
+        item.deleted_at = now
+        item.save(update_fields=['deleted_at', 'updated_at'])
+
+        pending = ClaimRequest.objects.select_for_update().filter(found_item=item, status=ClaimRequest.Status.PENDING)
+        affected = set(pending.values_list('claimant_id', flat=True))
+        pending.update(status=ClaimRequest.Status.REJECTED, reviewed_by=staff, reviewed_at=now, updated_at=now,
+                       rejection_reason="The item was removed from inventory.")
+
+        waiting = LostItemTicket.objects.select_for_update().filter(
+            matched_item=item, status__in=[LostItemTicket.Status.MATCH_FOUND, LostItemTicket.Status.CLAIM_PENDING],
+        )
+        affected.update(waiting.values_list('owner_id', flat=True))
+        waiting.update(status=LostItemTicket.Status.SEARCHING, matched_item=None, updated_at=now)
+        outbox.emit('ItemWithdrawn', key=f'ItemWithdrawn:{item.pk}', item=item.pk, notify=sorted(affected))
+    return affected
+
+
+def dispose_items(item_ids):
+    """Bulk AVAILABLE -> DONATED for the disposal job.
+
+    Items that picked up a pending claim in the meantime are skipped, and
+    tickets still matched to a disposed item go back to searching. No per-row
+    post_save: the job writes one aggregated audit record instead.
+    Returns (ids actually disposed, owners of the reset tickets).
+    """
+    with transaction.atomic():
+        items = FoundItem.objects.select_for_update().filter(
+            pk__in=item_ids,
+            current_status__in=_sources(FoundItem, 'current_status', FoundItem.Status.DONATED),
+        ).exclude(claims__status=ClaimRequest.Status.PENDING)
+        ids = list(items.values_list('pk', flat=True))
+        now = timezone.now()
+        FoundItem.objects.filter(pk__in=ids, current_status=FoundItem.Status.AVAILABLE).update(
+            current_status=FoundItem.Status.DONATED, updated_at=now,
+        )
+
+        waiting = LostItemTicket.objects.select_for_update().filter(
+            matched_item_id__in=ids,
+            status__in=[LostItemTicket.Status.MATCH_FOUND, LostItemTicket.Status.CLAIM_PENDING],
+        )
+        owners = set(waiting.values_list('owner_id', flat=True))
+        waiting.update(status=LostItemTicket.Status.SEARCHING, matched_item=None, updated_at=now)
+    return ids, owners
+
+
+def mark_received(report):
+    """Flip a hand-in to received exactly once; raises if another desk already did."""
+    return _move(report, 'is_received', True, received_at=timezone.now())
+
+
+def link_hand_in(item, report):
+    """Point an inventory item at the hand-in that reported it; an item keeps its first link."""
+    changes = {'hand_in_ref': report, 'updated_at': timezone.now()}
+    if not FoundItem._base_manager.filter(pk=item.pk, hand_in_ref__isnull=True).update(**changes):
+        raise TransitionError(f"{item.item_name} is already linked to another hand-in.")
+    return _saved(item, changes)
+
+
+def receive_handin(report_id, staff):
+    """Turn a hand-in report into an inventory item."""
+    with transaction.atomic():
+        report = _lock(HandInReport, report_id)
+        if report.is_received:
+            raise TransitionError(f"{report.reference_code} was already received.")
+        mark_received(report)
+        item = FoundItem.objects.create(
+            category=report.category,
+            item_name=report.item_name,
+            description=report.description,
+            color=report.color,
+            date_found=report.date_reported.date(), # Convert datetime to date
+            location_found=report.location_found,
+            registered_by=staff,
+            hand_in_ref=report,
+            current_status=FoundItem.Status.AVAILABLE,
+            campus_id=report.campus_id,
+        )
+        transaction.on_commit(lambda: metrics.inc('handins_received_total'))
+    return item
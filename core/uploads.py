@@ -0,0 +1,240 @@
+"""
+Photo uploads: size caps, header checks and resumable chunked uploads.
+
+Phone photos are several MB and mobile connections are slow. Three layers
+keep them from tying up a worker or its memory:
+
+1. Plain multipart posts (the no-JS path):
+   - UploadLimitMiddleware answers 413 before reading a body that is far
+     over UPLOAD_MAX_BYTES.
+   - Files stream to a temp file past FILE_UPLOAD_MAX_MEMORY_SIZE.
+   - CappedUploadHandler stops storing a file once it passes the cap and
+     hands the form an OversizedFile, so the form can say why the photo
+     went missing.
+2. PhotoField reads only the header (format and dimensions) before anything
+   decodes the image. It refuses other formats and anything over
+   PHOTO_MAX_PIXELS, and downscales photos bigger than PHOTO_MAX_EDGE.
+3. Chunked uploads (templates/partials/uploads.html):
+   - The browser first downscales the photo itself.
+   - It sends the photo in UPLOAD_CHUNK_BYTES pieces to
+     /uploads/<token>/?offset=N. Each request is short.
+   - After a dropped connection, it asks the server how far it got and
+     resumes from there.
+   - The form then only submits the token, in the hidden
+     `<field>_upload` input.
+   - Staged files live in UPLOAD_STAGING_DIR, which must be shared by the
+     web processes. `manage.py purge_uploads` clears the abandoned ones.
+"""
+import datetime
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: no locking, one uploader at a time anyway
+    fcntl = None
+
+from .models import ChunkedUpload
+
+FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+# Room for the other form fields next to the file before the middleware refuses a body
+FORM_OVERHEAD = 1024 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _mb(size):
+    return f"{size / (1024 * 1024):g} MB"
+
+
+# --- Plain multipart posts --------------------------------------------------------
+
+class OversizedFile(UploadedFile):
+    """Stands in for a file CappedUploadHandler stopped storing; validate_size() reports it."""
+    oversized = True
+
+    def __init__(self, name, content_type, size):
+        super().__init__(io.BytesIO(), name, content_type, size)
+
+
+class CappedUploadHandler(FileUploadHandler):
+    """First in FILE_UPLOAD_HANDLERS: stops passing a file's bytes on once it is over UPLOAD_MAX_BYTES."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        return raw_data if self.received <= settings.UPLOAD_MAX_BYTES else None
+
+    def file_complete(self, file_size):
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            return OversizedFile(self.file_name, self.content_type, self.received)
+        return None
+
+
+def request_too_large(request):
+    """True for multipart bodies the handler would only throw away."""
+    length = request.META.get('CONTENT_LENGTH') or ''
+    return (
+        request.content_type == 'multipart/form-data'
+        and length.isdigit() and int(length) > settings.UPLOAD_MAX_BYTES + FORM_OVERHEAD
+    )
+
+
+def validate_size(file):
+    if getattr(file, 'oversized', False) or file.size > settings.UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            f"The file is too large; the limit is {_mb(settings.UPLOAD_MAX_BYTES)}.", code='file_too_large',
+        )
+
+
+# --- Photos -----------------------------------------------------------------------
+
+def inspect(file):
+    """Check size, format and pixel count from the header alone. Returns (format, width, height)."""
+    validate_size(file)
+    file.seek(0)
+    try:
+        with Image.open(file) as image:  # lazy: nothing is decoded yet
+            kind, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise ValidationError("Upload a valid photo (JPEG, PNG, WebP or GIF).", code='invalid_image')
+    finally:
+        file.seek(0)
+    if kind not in FORMATS:
+        raise ValidationError("Upload a valid photo (JPEG, PNG, WebP or GIF).", code='invalid_image')
+    if width * height > settings.PHOTO_MAX_PIXELS:
+        raise ValidationError(
+            f"That photo is {width}x{height} pixels; the limit is "
+            f"{settings.PHOTO_MAX_PIXELS // 1_000_000} megapixels.", code='too_many_pixels',
+        )
+    return kind, width, height
+
+
+def downscale(file):
+    """Re-encode a photo larger than PHOTO_MAX_EDGE as a JPEG that fits. Smaller ones pass through untouched."""
+    edge = settings.PHOTO_MAX_EDGE
+    with Image.open(file) as image:
+        if max(image.size) <= edge:
+            file.seek(0)
+            return file
+        image.draft('RGB', (edge, edge))  # JPEG: decode straight at 1/2, 1/4 or 1/8 scale
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((edge, edge))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=85, optimize=True)
+    name = os.path.splitext(os.path.basename(file.name))[0] + '.jpg'
+    size = out.tell()
+    out.seek(0)
+    return InMemoryUploadedFile(out, None, name, 'image/jpeg', size, None)
+
+
+# --- Chunked uploads --------------------------------------------------------------
+
+class StagedFile(UploadedFile):
+    """A finished chunked upload. temporary_file_path() lets storage move it instead of copying."""
+
+    def __init__(self, upload):
+        self.path = staging_path(upload)
+        super().__init__(open(self.path, 'rb'), upload.filename, None, upload.size)
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def staging_path(upload):
+    return os.path.join(settings.UPLOAD_STAGING_DIR, f'{upload.token}.part')
+
+
+def received(upload):
+    try:
+        return os.path.getsize(staging_path(upload))
+    except FileNotFoundError:
+        return 0
+
+
+def status(upload):
+    offset = received(upload)
+    return {'token': str(upload.token), 'offset': offset, 'size': upload.size,
+            'complete': offset == upload.size, 'chunk_size': settings.UPLOAD_CHUNK_BYTES}
+
+
+def start(owner, filename, size):
+    if size <= 0:
+        raise UploadError("Empty file.")
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise UploadError(f"The file is too large; the limit is {_mb(settings.UPLOAD_MAX_BYTES)}.", status=413)
+    os.makedirs(settings.UPLOAD_STAGING_DIR, exist_ok=True)
+    upload = ChunkedUpload.objects.create(owner=owner, filename=os.path.basename(filename)[:255] or 'photo', size=size)
+    open(staging_path(upload), 'wb').close()
+    return upload
+
+
+def append(upload, offset, stream, length):
+    """Write one chunk at `offset`. The file on disk is the only record of progress."""
+    if length > settings.UPLOAD_CHUNK_BYTES:
+        raise UploadError(f"Chunks are at most {settings.UPLOAD_CHUNK_BYTES} bytes.", status=413)
+    path = staging_path(upload)
+    try:
+        out = open(path, 'r+b')
+    except FileNotFoundError:
+        raise UploadError("This upload expired; start again.", status=404)
+    with out:
+        if fcntl:
+            fcntl.flock(out, fcntl.LOCK_EX)  # two retries of the same chunk must not both append
+        current = os.fstat(out.fileno()).st_size
+        if offset != current:
+            raise UploadError("Wrong offset.", status=409)
+        if offset + length > upload.size:
+            raise UploadError("More data than announced.", status=413)
+        out.seek(offset)
+        for block in iter(lambda: stream.read(64 * 1024), b''):
+            out.write(block)
+        if out.tell() == upload.size:
+            try:
+                with open(path, 'rb') as staged:
+                    inspect(UploadedFile(staged, upload.filename, None, upload.size))
+            except ValidationError as e:
+                out.truncate(0)
+                raise UploadError(e.messages[0], status=422)
+    return status(upload)
+
+
+def staged_file(token):
+    """The finished upload for a form's `<field>_upload` token, or None."""
+    try:
+        upload = ChunkedUpload.objects.filter(token=token).first()
+    except ValidationError:  # not a UUID
+        return None
+    if upload is None or received(upload) != upload.size:
+        return None
+    return StagedFile(upload)
+
+
+def purge(hours=None, now=None):
+    """Forget uploads older than UPLOAD_STAGING_HOURS, used or not."""
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(hours=settings.UPLOAD_STAGING_HOURS if hours is None else hours)
+    stale = list(ChunkedUpload.objects.filter(created_at__lt=cutoff))
+    for upload in stale:
+        try:
+            os.remove(staging_path(upload))
+        except FileNotFoundError:
+            pass  # moved into media by the form that used it
+    ChunkedUpload.objects.filter(pk__in=[u.pk for u in stale]).delete()
+    return len(stale)
@@ -7,9 +7,14 @@ urlpatterns = [
     path('signup/', views.signup, name='signup'),
     path('browse-found-items/', views.item_gallery, name='item_gallery'),
     path('hand-in/', views.hand_in_item, name='hand_in'),
+    path('search/suggest/', views.search_suggestions, name='search_suggestions'),
+    path('uploads/', views.start_upload, name='start_upload'),
+    path('uploads/<uuid:token>/', views.upload_chunk, name='upload_chunk'),
+    path('metrics', views.metrics_view, name='metrics'),
 
     # --- STUDENT DASHBOARD ---
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/status/', views.student_status, name='student_status'),
     path('report-lost/', views.submit_lost_ticket, name='submit_ticket'),
     path('request-claim/<int:item_id>/', views.submit_claim, name='submit_claim'),
 
@@ -26,6 +31,7 @@ urlpatterns = [
     # 1. Found Items
     path('dashboard/items/', views.manage_found_items, name='manage_found_items'),
     path('dashboard/items/add/', views.add_found_item, name='add_found_item'),
+    path('dashboard/items/import/', views.import_found_items, name='import_found_items'),
     path('dashboard/items/delete/<int:item_id>/', views.delete_found_item, name='delete_found_item'),
 
     # 2. Lost Tickets
@@ -34,9 +40,14 @@ urlpatterns = [
     # 3. Hand-ins
     path('dashboard/handins/', views.manage_handins, name='manage_handins'),
     path('dashboard/handins/receive/<int:report_id>/', views.receive_handin, name='receive_handin'),
+    path('kiosk/handins/sync/', views.kiosk_sync_handins, name='kiosk_sync_handins'),
+    path('dashboard/duplicates/', views.duplicate_queue, name='duplicate_queue'),
+    path('dashboard/duplicates/<int:candidate_id>/<str:action>/', views.resolve_duplicate, name='resolve_duplicate'),
+    path('dashboard/archive/', views.archive_search, name='archive_search'),
 
     # 4. Claims
     path('dashboard/claims/', views.manage_claims, name='manage_claims'),
+    path('dashboard/detail/<str:kind>/<int:object_id>/', views.detail_fragment, name='detail_fragment'),
 
     # 5. Users (Replaces manage_staff and manage_students)
     path('dashboard/users/', views.manage_users, name='manage_users'),
@@ -45,4 +56,8 @@ urlpatterns = [
 
     # 6. Logs
     path('dashboard/audit-logs/', views.view_audit_logs, name='view_audit_logs'),
+    path('dashboard/audit-logs/<str:model>/<int:object_id>/', views.object_history, name='object_history'),
+
+    # 7. Reports
+    path('dashboard/reports/', views.analytics_report, name='analytics_report'),
 ]
\ No newline at end of file
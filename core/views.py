@@ -1,28 +1,46 @@
+import logging
+from contextlib import nullcontext
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import connection
+from django.db import connection, transaction
 from django.db.models import Count, Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 
+from . import refcodes, importers, dedup, analytics, live, transitions, fingerprints, suggest, audit, tenancy, uploads, kiosk, metrics
+from .routers import use_replica
+from .throttling import throttle
+from .transitions import TransitionError
 from .forms import (
     StudentSignUpForm, LostItemForm, HandInForm, 
-    ClaimForm, FoundItemAdminForm, StaffCreationForm
+    ClaimForm, FoundItemAdminForm, StaffCreationForm, FoundItemImportForm
 )
 from .models import (
     LostItemTicket, HandInReport, FoundItem, 
-    ClaimRequest, AuditLog, CustomUser
+    ClaimRequest, AuditLog, CustomUser, DuplicateCandidate, ArchivedRecord, ChunkedUpload
 )
 
+logger = logging.getLogger(__name__)
+
 # ==============================================================================
 # 1. PUBLIC VIEWS (Home, Gallery, Hand-in)
 # ==============================================================================
 
+@use_replica
 def home(request):
     """Landing page showing recent available items."""
     items = FoundItem.objects.filter(current_status='AVAILABLE').order_by('-date_found')[:8]
     return render(request, 'home.html', {'items': items})
 
+@use_replica
+@throttle('search', key='user', only_if=lambda request: bool(request.GET.get('q')))
 def item_gallery(request):
     """Full catalogue of found items."""
     # 1. Fetch Items
@@ -43,12 +61,30 @@ def item_gallery(request):
     
     return render(request, 'items/gallery.html', {'items': items})
 
+@require_GET
+@throttle('suggest', key='user', api=True)
+def search_suggestions(request):
+    """Typeahead for the search boxes: ?field=item|location|reference&q=<prefix>"""
+    field = request.GET.get('field', 'item')
+    if field not in suggest.FIELDS:
+        return JsonResponse({'error': 'Unknown field.'}, status=400)
+    if field in suggest.STAFF_FIELDS and getattr(request.user, 'role', None) not in ['STAFF', 'ADMIN']:
+        return JsonResponse({'error': 'Staff only.'}, status=403)
+    return JsonResponse({'field': field, 'results': suggest.suggest(field, request.GET.get('q', ''))})
+
+@throttle('hand_in', methods=['POST'])
 def hand_in_item(request):
     """Public form for reporting found items (Stranger/Guest)."""
     if request.method == 'POST':
         form = HandInForm(request.POST)
         if form.is_valid():
-            report = form.save()
+            report = form.save(commit=False)
+            # Taken outside the transaction so it comes from this worker's reserved block
+            report.reference_code = refcodes.next_reference_code()
+            # The row and its outbox event commit together (post_save runs after the INSERT)
+            with transaction.atomic():
+                report.save()
+            metrics.inc('handins_reported_total', source='form')
             return render(request, 'items/hand_in_success.html', {'report': report})
     else:
         form = HandInForm()
@@ -62,8 +98,8 @@ def hand_in_item(request):
 def signup(request):
     if request.method == 'POST':
         form = StudentSignUpForm(request.POST)
-        if form.is_valid():
-            user = form.save()
+        user = form.save() if form.is_valid() else None
+        if user is not None:
             login(request, user)
             messages.success(request, f"Account created! Welcome, {user.username}.")
             return redirect('home')
@@ -90,14 +126,38 @@ def dashboard(request):
 
 @login_required
 def student_dashboard(request):
+    # Read the version first so a change made while we render still triggers a refresh
+    version = live.version(request.user.id)
     my_tickets = LostItemTicket.objects.filter(owner=request.user).order_by('-date_submitted')
-    my_claims = ClaimRequest.objects.filter(claimant=request.user).order_by('-request_date')
+    # The claims table shows the item name, so join it instead of one query per row.
+    # Unscoped: a claim can be on an item held at another campus (cross-campus match).
+    my_claims = (
+        ClaimRequest._base_manager.filter(claimant=request.user)
+        .select_related('found_item').only('id', 'status', 'request_date', 'found_item__item_name')
+        .order_by('-request_date')
+    )
     
     return render(request, 'dashboard/student.html', {
         'tickets': my_tickets, 
-        'claims': my_claims
+        'claims': my_claims,
+        'live_version': version,
+        'live_updates': settings.LIVE_UPDATES,
+        'live_poll_ms': settings.LIVE_POLL_SECONDS * 1000,
     })
 
+@login_required
+@require_GET
+def student_status(request):
+    """Short poll: has anything on the student's dashboard changed since `since`?"""
+    if not settings.LIVE_UPDATES:
+        raise Http404
+    try:
+        since = int(request.GET.get('since', ''))
+    except ValueError:
+        since = None
+    current = live.version(request.user.id)
+    return JsonResponse({'version': current, 'changed': current != since})
+
 @login_required
 def submit_lost_ticket(request):
     if request.method == 'POST':
@@ -105,7 +165,8 @@ def submit_lost_ticket(request):
         if form.is_valid():
             ticket = form.save(commit=False)
             ticket.owner = request.user
-            ticket.save()
+            with transaction.atomic():
+                ticket.save()
             messages.success(request, "Lost item ticket submitted!")
             return redirect('dashboard')
     else:
@@ -115,34 +176,25 @@ def submit_lost_ticket(request):
 @login_required
 def submit_claim(request, item_id):
     """Student claiming a specific item."""
-    item = get_object_or_404(FoundItem, id=item_id)
+    # Staff may have matched one of the student's tickets to an item at another campus
+    with tenancy.all_campuses():
+        claimable = FoundItem.objects.filter(Q(campus=request.campus) | Q(matched_tickets__owner=request.user))
+        item = get_object_or_404(claimable.distinct(), id=item_id)
     
-    # Prevent duplicate claims
-    if ClaimRequest.objects.filter(claimant=request.user, found_item=item, status='PENDING').exists():
+    # Prevent duplicate claims (early exit; the one_pending_claim_per_item constraint is the real guard)
+    if ClaimRequest._base_manager.filter(claimant=request.user, found_item=item, status='PENDING').exists():
         messages.warning(request, "You already have a pending claim for this item.")
         return redirect('item_gallery')
 
     if request.method == 'POST':
         form = ClaimForm(request.POST, request.FILES)
         if form.is_valid():
-            claim = form.save(commit=False)
-            claim.found_item = item
-            claim.claimant = request.user
-            
-            # Auto-Link logic: If user has an open ticket matching this category
-            existing_ticket = LostItemTicket.objects.filter(
-                owner=request.user, 
-                category=item.category,
-                status__in=['SEARCHING', 'MATCH_FOUND']
-            ).first()
-            
-            if existing_ticket:
-                claim.ticket = existing_ticket
-                existing_ticket.matched_item = item
-                existing_ticket.status = LostItemTicket.Status.CLAIM_PENDING 
-                existing_ticket.save()
-
-            claim.save()
+            try:
+                # Also auto-links an open ticket of the same category
+                transitions.open_claim(form.save(commit=False), item, request.user)
+            except TransitionError as e:
+                messages.warning(request, str(e))
+                return redirect('item_gallery')
             messages.success(request, "Claim submitted! Staff will review your proof.")
             return redirect('dashboard')
     else:
@@ -156,6 +208,7 @@ def submit_claim(request, item_id):
 # ==============================================================================
 
 @login_required
+@use_replica
 def staff_dashboard(request):
     # ... [KEEP AS IS] ...
     if request.user.role not in ['STAFF', 'ADMIN']: return redirect('home')
@@ -190,35 +243,62 @@ def ticket_match_view(request, ticket_id):
     ai_matches = []
     ai_ids = []
 
-    # 1. PRIMARY SEARCH: AI / Stored Procedure (Trigram)
-    with connection.cursor() as cursor:
-        try:
-            cursor.callproc('find_potential_matches', [ticket_id])
-            results = cursor.fetchall() 
-            for row in results:
-                # row[0]=id, row[1]=name, row[2]=score
-                item = FoundItem.objects.get(id=row[0])
-                item.score = round(row[2] * 100, 1) 
-                ai_matches.append(item)
-                ai_ids.append(item.id)
-        except Exception as e:
-            print(f"Error calling stored procedure: {e}")
-
-    # 2. SECONDARY SEARCH: "Other Findings" (Category + Keyword Safety Net)
-    # Find items in same category OR matching name, excluding the ones already found by AI
-    other_findings = FoundItem.objects.filter(
-        current_status='AVAILABLE'
-    ).exclude(
-        id__in=ai_ids
-    ).filter(
-        Q(category=ticket.category) | 
-        Q(item_name__icontains=ticket.item_name.split()[0]) # Match first word of name at least
-    ).order_by('-date_found')[:10] # Limit to 10 to keep UI clean
+    # Other campuses' inventory only when the deployment allows it and staff asked for it
+    cross_campus = settings.CROSS_CAMPUS_MATCHING and request.GET.get('scope') == 'all'
+    timer = metrics.timer('match_tool_duration_seconds', scope='all' if cross_campus else 'campus')
+    with timer, tenancy.all_campuses() if cross_campus else nullcontext():
+        # 1. PRIMARY SEARCH: AI / Stored Procedure (Trigram)
+        with connection.cursor() as cursor:
+            try:
+                cursor.callproc('find_potential_matches', [ticket_id])
+                results = cursor.fetchall() 
+                # One query for every row; it also drops other campuses' items unless cross_campus
+                items = FoundItem.objects.select_related('campus').in_bulk([row[0] for row in results])
+                for row in results:
+                    # row[0]=id, row[1]=name, row[2]=score
+                    item = items.get(row[0])
+                    if item is None:  # deleted since the procedure last saw it
+                        continue
+                    item.score = round(row[2] * 100, 1) 
+                    ai_matches.append(item)
+                    ai_ids.append(item.id)
+            except Exception as e:
+                logger.warning("find_potential_matches failed for ticket %s: %s", ticket_id, e)
+
+        # 2. SECONDARY SEARCH: "Other Findings" (Category + Keyword Safety Net)
+        # Find items in same category OR matching name, excluding the ones already found by AI
+        other_findings = FoundItem.objects.select_related('campus').filter(
+            current_status='AVAILABLE'
+        ).exclude(
+            id__in=ai_ids
+        ).filter(
+            Q(category=ticket.category) | 
+            Q(item_name__icontains=ticket.item_name.split()[0]) # Match first word of name at least
+        ).order_by('-date_found')[:10] # Limit to 10 to keep UI clean
+        other_findings = list(other_findings)
+
+        # 3. PHOTO SEARCH: items whose photo looks like the one on the ticket
+        # The dispatcher may not have fingerprinted a fresh upload yet
+        fingerprint = (fingerprints.fingerprint_for(ticket) or fingerprints.index(ticket)) if ticket.item_image else None
+        if fingerprint:
+            photo_scores = fingerprints.similar_items(
+                fingerprint, among=FoundItem.objects.filter(current_status='AVAILABLE'),  # this campus unless cross_campus
+            )
+            shown = set(ai_ids) | {item.id for item in other_findings}
+            other_findings += FoundItem.objects.select_related('campus').filter(
+                current_status='AVAILABLE', id__in=set(photo_scores) - shown,
+            )
+            for item in ai_matches + other_findings:
+                if item.id in photo_scores:
+                    item.photo_score = round(photo_scores[item.id] * 100)
+            other_findings.sort(key=lambda item: getattr(item, 'photo_score', 0), reverse=True)
 
     return render(request, 'dashboard/match_tool.html', {
         'ticket': ticket, 
         'matches': ai_matches,
-        'other_findings': other_findings
+        'other_findings': other_findings,
+        'cross_campus': cross_campus,
+        'cross_campus_allowed': settings.CROSS_CAMPUS_MATCHING,
     })
 
 @login_required
@@ -227,52 +307,38 @@ def confirm_match(request, ticket_id, item_id):
     if request.user.role not in ['STAFF', 'ADMIN']: return redirect('home')
 
     try:
-        ticket = LostItemTicket.objects.get(id=ticket_id)
-        found_item = FoundItem.objects.get(id=item_id)
-        
-        ticket.status = LostItemTicket.Status.MATCH_FOUND
-        ticket.matched_item = found_item
-        ticket.save()
+        transitions.confirm_match(ticket_id, item_id)
         
         messages.success(request, f"Match confirmed! Student notified.")
     except (LostItemTicket.DoesNotExist, FoundItem.DoesNotExist):
         messages.error(request, "Error finding records.")
+    except TransitionError as e:
+        messages.error(request, str(e))
 
     return redirect('staff_dashboard')
 
 @login_required
 def process_claim(request, claim_id, action):
-    """Approve or Reject a student's claim."""
+    """Approve or Reject a student's claim, or record that the student picked the item up."""
     if request.user.role not in ['STAFF', 'ADMIN']: return redirect('home')
 
     claim = get_object_or_404(ClaimRequest, id=claim_id)
-    item = claim.found_item
 
-    if action == 'approve':
-        # Approve Claim
-        claim.status = ClaimRequest.Status.APPROVED
-        claim.reviewed_by = request.user
-        claim.save()
-        
-        # Mark Item as Claimed
-        item.current_status = FoundItem.Status.CLAIMED
-        item.save() # Triggers Audit Log
-
-        # Close Ticket
-        if claim.ticket:
-            claim.ticket.status = LostItemTicket.Status.CLOSED
-            claim.ticket.save()
-        
-        # Auto-reject duplicate claims for this item
-        ClaimRequest.objects.filter(found_item=item, status='PENDING').exclude(id=claim.id).update(status=ClaimRequest.Status.REJECTED)
+    try:
+        if action == 'approve':
+            # Locks the item, releases it, closes the ticket and rejects competing claims
+            claim, _ = transitions.approve_claim(claim.id, request.user)
+            messages.success(request, f"Claim Approved. Item released to {claim.claimant.username}.")
 
-        messages.success(request, f"Claim Approved. Item released to {claim.claimant.username}.")
+        elif action == 'reject':
+            claim = transitions.reject_claim(claim.id, request.user)
+            messages.info(request, "Claim Rejected.")
 
-    elif action == 'reject':
-        claim.status = ClaimRequest.Status.REJECTED
-        claim.reviewed_by = request.user
-        claim.save()
-        messages.info(request, "Claim Rejected.")
+        elif action == 'complete':
+            claim = transitions.complete_claim(claim.id, request.user)
+            messages.success(request, f"{claim.found_item.item_name} marked as picked up.")
+    except TransitionError as e:
+        messages.error(request, str(e))
 
     # Redirect back to list if coming from manage page, or dashboard if coming from dashboard
     if 'claims' in request.META.get('HTTP_REFERER', ''):
@@ -287,22 +353,12 @@ def receive_handin(request, report_id):
     report = get_object_or_404(HandInReport, id=report_id)
     
     if request.method == 'POST':
-        # Create the Found Item
-        item = FoundItem.objects.create(
-            category=report.category,
-            item_name=report.item_name,
-            description=report.description,
-            color=report.color,
-            date_found=report.date_reported.date(), # Convert datetime to date
-            location_found=report.location_found,
-            registered_by=request.user,
-            hand_in_ref=report,
-            current_status='AVAILABLE'
-        )
-        
-        # Update Report Status
-        report.is_received = True
-        report.save()
+        # Creates the Found Item and flips the report to received, once
+        try:
+            item = transitions.receive_handin(report.id, request.user)
+        except TransitionError as e:
+            messages.warning(request, str(e))
+            return redirect('manage_handins')
         
         messages.success(request, f"Item received! Inventory ID: {item.id}")
         return redirect('manage_handins')
@@ -316,6 +372,7 @@ def receive_handin(request, report_id):
 
 # --- A. Found Items ---
 @login_required
+@use_replica
 def manage_found_items(request):
     if request.user.role not in ['ADMIN', 'STAFF']: return redirect('home')
     
@@ -342,27 +399,55 @@ def add_found_item(request):
         if form.is_valid():
             item = form.save(commit=False)
             item.registered_by = request.user
-            item.save()
+            with transaction.atomic():
+                item.save()
             messages.success(request, "Item added to inventory.")
             return redirect('manage_found_items')
     else:
         form = FoundItemAdminForm()
     return render(request, 'dashboard/form_page.html', {'form': form, 'title': 'Add Found Item'})
 
+@login_required
+def import_found_items(request):
+    """Bulk upload of legacy inventory from CSV/JSONL."""
+    if request.user.role not in ['ADMIN', 'STAFF']: return redirect('home')
+
+    if request.method == 'POST':
+        form = FoundItemImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            importers.queue_upload(
+                upload, request.user, form.cleaned_data['batch_size'],
+                campus=request.campus or request.user.campus,
+            )
+            messages.success(request, f"{upload.name} is being imported. The items appear here as it runs; "
+                                      "skipped rows are listed in the audit trail (IMPORT_FINISHED).")
+            return redirect('manage_found_items')
+    else:
+        form = FoundItemImportForm()
+    return render(request, 'dashboard/form_page.html', {'form': form, 'title': 'Import Found Items'})
+
 @login_required
 def delete_found_item(request, item_id):
     if request.user.role != 'ADMIN': 
         messages.error(request, "Permission denied.")
         return redirect('manage_found_items')
         
-    item = get_object_or_404(FoundItem, id=item_id)
-    item.delete()
+    # Soft delete: the item leaves every list but its claims and history stay
+    try:
+        transitions.withdraw_item(item_id, request.user)
+    except FoundItem.DoesNotExist:
+        raise Http404
+    except TransitionError as e:
+        messages.warning(request, str(e))
+        return redirect('manage_found_items')
     messages.success(request, "Item deleted.")
     return redirect('manage_found_items')
 
 
 # --- B. Lost Tickets ---
 @login_required
+@use_replica
 def manage_lost_tickets(request):
     if request.user.role not in ['ADMIN', 'STAFF']: return redirect('home')
     
@@ -380,7 +465,21 @@ def manage_lost_tickets(request):
 
 
 # --- C. Hand-in Reports ---
+def _code_lookup(queryset, field, query):
+    """
+    The rows whose reference code is the one typed (typos forgiven), as a
+    single unique-index lookup; None when the query isn't a code or no code
+    matches. A query can pass the check digit by chance (an ID, a phone
+    fragment), so no match means "search the text" rather than "nothing".
+    """
+    code = refcodes.normalize(query)
+    if not code:
+        return None
+    exact = queryset.filter(**{field: code})
+    return exact if exact.exists() else None
+
 @login_required
+@use_replica
 def manage_handins(request):
     if request.user.role not in ['ADMIN', 'STAFF']: return redirect('home')
     
@@ -388,7 +487,10 @@ def manage_handins(request):
     
     # Search Logic
     query = request.GET.get('q')
-    if query:
+    exact = _code_lookup(reports, 'reference_code', query)
+    if exact is not None:
+        reports = exact
+    elif query:
         reports = reports.filter(
             Q(reference_code__icontains=query) | 
             Q(item_name__icontains=query) |
@@ -397,8 +499,72 @@ def manage_handins(request):
     return render(request, 'dashboard/manage_handins.html', {'reports': reports})
 
 
+# --- C2. Duplicate Merge Queue ---
+@login_required
+def duplicate_queue(request):
+    """Hand-ins that look like items staff already registered directly."""
+    if request.user.role not in ['ADMIN', 'STAFF']: return redirect('home')
+
+    candidates = DuplicateCandidate.objects.filter(
+        status=DuplicateCandidate.Status.PENDING
+    ).select_related('hand_in', 'found_item').order_by('-similarity', '-detected_at')
+    return render(request, 'dashboard/duplicate_queue.html', {'candidates': candidates})
+
+@login_required
+def resolve_duplicate(request, candidate_id, action):
+    if request.user.role not in ['ADMIN', 'STAFF']: return redirect('home')
+
+    candidate = get_object_or_404(DuplicateCandidate, id=candidate_id, status=DuplicateCandidate.Status.PENDING)
+    if request.method == 'POST':
+        if action == 'merge':
+            try:
+                dedup.merge(candidate, request.user)
+            except TransitionError as e:
+                messages.warning(request, str(e))
+                return redirect('duplicate_queue')
+            messages.success(request, f"{candidate.hand_in.reference_code} linked to inventory item #{candidate.found_item_id}.")
+        elif action == 'dismiss':
+            candidate.status = DuplicateCandidate.Status.DISMISSED
+            candidate.reviewed_by = request.user
+            candidate.save()
+            messages.info(request, "Marked as not a duplicate.")
+    return redirect('duplicate_queue')
+
+
+# --- C3. Archive (historical lookups) ---
+@login_required
+@use_replica
+def archive_search(request):
+    """Closed tickets, finished items and old hand-ins moved out by archive_records."""
+    if request.user.role not in ['ADMIN', 'STAFF']: return redirect('home')
+
+    records = ArchivedRecord.objects.all().order_by('-happened_at')
+    if request.campus:
+        # The archived row keeps its campus; records from before campuses existed have none
+        records = records.filter(Q(data__campus=request.campus.pk) | Q(data__campus__isnull=True))
+
+    query = request.GET.get('q')
+    kind = request.GET.get('kind')
+    exact = _code_lookup(records, 'reference', query)
+    if exact is not None:
+        records = exact
+    elif query:
+        records = records.filter(
+            Q(title__icontains=query) |
+            Q(reference__icontains=query) |
+            Q(location__icontains=query)
+        )
+    if kind in ArchivedRecord.Kind.values:
+        records = records.filter(kind=kind)
+    return render(request, 'dashboard/archive.html', {
+        'records': records[:100],
+        'kinds': ArchivedRecord.Kind.choices,
+    })
+
+
 # --- D. Claims ---
 @login_required
+@use_replica
 def manage_claims(request):
     if request.user.role not in ['ADMIN', 'STAFF']: return redirect('home')
     
@@ -417,17 +583,50 @@ def manage_claims(request):
     
     if status_filter:
         claims = claims.filter(status=status_filter)
+
+    # The verify modal is loaded on demand (detail_fragment), so only the row fields are needed
+    claims = claims.select_related('found_item', 'claimant')
         
     return render(request, 'dashboard/manage_claims.html', {'claims': claims})
 
 
+# --- D2. Detail modals, loaded when opened ---
+@login_required
+@require_GET
+@use_replica
+def detail_fragment(request, kind, object_id):
+    """Body of a list page's detail modal (partials/detail_modal.html), cached per object and update time."""
+    if request.user.role not in ['ADMIN', 'STAFF']:
+        return HttpResponse("Staff only.", status=403)
+
+    if kind == 'item':
+        # The match tool may show other campuses' items
+        with tenancy.all_campuses() if settings.CROSS_CAMPUS_MATCHING else nullcontext():
+            context = {'item': get_object_or_404(FoundItem, id=object_id)}
+    elif kind == 'claim':
+        claim = get_object_or_404(ClaimRequest.objects.select_related('found_item'), id=object_id)
+        if claim.status == 'PENDING':
+            fingerprints.score_claims([claim])  # proof photo vs inventory photo
+        context = {'claim': claim}
+    elif kind == 'handin':
+        context = {'report': get_object_or_404(HandInReport, id=object_id)}
+    else:
+        raise Http404
+    context['fragment_ttl'] = settings.FRAGMENT_CACHE_SECONDS
+    return render(request, f'partials/{kind}_detail.html', context)
+
+
 # --- E. User Management (Admin Only) ---
 @login_required
+@use_replica
 def manage_users(request):
     if request.user.role != 'ADMIN': return redirect('staff_dashboard')
     
     role_filter = request.GET.get('role', 'STAFF')
     users = CustomUser.objects.filter(role=role_filter)
+    if request.campus:
+        # Users aren't scoped by their manager (login must find everyone), so filter here
+        users = users.filter(campus=request.campus)
     
     # Search Logic
     query = request.GET.get('q')
@@ -446,13 +645,13 @@ def add_staff(request):
     if request.user.role != 'ADMIN': return redirect('staff_dashboard')
 
     if request.method == 'POST':
-        form = StaffCreationForm(request.POST)
+        form = StaffCreationForm(request.POST, campus=request.campus)
         if form.is_valid():
             form.save()
             messages.success(request, "New Staff account created.")
             return redirect('manage_users')
     else:
-        form = StaffCreationForm()
+        form = StaffCreationForm(campus=request.campus)
     return render(request, 'dashboard/form_page.html', {'form': form, 'title': 'Add New Staff'})
 
 @login_required
@@ -460,7 +659,8 @@ def edit_user(request, user_id):
     if request.user.role != 'ADMIN':
         return redirect('staff_dashboard')
         
-    user_to_edit = get_object_or_404(CustomUser, id=user_id)
+    users = CustomUser.objects.filter(campus=request.campus) if request.campus else CustomUser.objects.all()
+    user_to_edit = get_object_or_404(users, id=user_id)
     
     if request.method == 'POST':
         user_to_edit.first_name = request.POST.get('first_name')
@@ -479,17 +679,114 @@ def edit_user(request, user_id):
 
 # --- F. Audit Logs ---
 @login_required
+@use_replica
 def view_audit_logs(request):
     if request.user.role != 'ADMIN': return redirect('staff_dashboard')
     
-    logs = AuditLog.objects.all().order_by('-timestamp')[:100]
-    
-    # Search Logic
-    query = request.GET.get('q')
-    if query:
-        logs = logs.filter(
-            Q(actor__username__icontains=query) | 
-            Q(action__icontains=query) | 
-            Q(target_model__icontains=query)
-        )
-    return render(request, 'dashboard/audit_logs.html', {'logs': logs})
\ No newline at end of file
+    # Search Logic: "FoundItem #12" jumps to one object, "status=APPROVED" looks inside the changes
+    logs, older = audit.search(
+        query=request.GET.get('q', ''),
+        action=request.GET.get('action', ''),
+        change=request.GET.get('change', ''),
+        before=request.GET.get('before'),
+    )
+    return render(request, 'dashboard/audit_logs.html', {'logs': logs, 'older': older, 'actions': audit.ACTIONS})
+
+@login_required
+@use_replica
+def object_history(request, model, object_id):
+    """Timeline of one record with field-level changes between snapshots."""
+    if request.user.role != 'ADMIN': return redirect('staff_dashboard')
+    if model not in audit.TARGET_MODELS.values(): raise Http404
+
+    entries = audit.timeline(model, object_id)
+    return render(request, 'dashboard/object_history.html', {
+        'model': model, 'object_id': object_id, 'entries': entries[::-1],
+    })
+
+
+# --- G. Reports ---
+@login_required
+@use_replica
+def analytics_report(request):
+    """Recovery rate, turnaround, hotspots and monthly volumes, read from the rollups only."""
+    if request.user.role != 'ADMIN': return redirect('staff_dashboard')
+
+    try:
+        days = int(request.GET.get('days', 365))
+    except ValueError:
+        days = 365
+    report = analytics.report(analytics.default_window_start(days))
+    return render(request, 'dashboard/reports.html', {'report': report, 'days': days})
+
+
+# ==============================================================================
+# 6. UPLOADS (resumable photo uploads, see core/uploads.py)
+# ==============================================================================
+
+@login_required
+@require_POST
+@throttle('upload', key='user', api=True)
+def start_upload(request):
+    """Announce a photo: ?filename=&size= -> token to send the chunks to."""
+    try:
+        upload = uploads.start(request.user, request.POST.get('filename', ''), int(request.POST.get('size', '')))
+    except ValueError:
+        return JsonResponse({'error': 'Missing size.'}, status=400)
+    except uploads.UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(uploads.status(upload), status=201)
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+@throttle('upload', key='user', api=True)
+def upload_chunk(request, token):
+    """GET: how far did we get? POST ?offset=N with the raw bytes: append one chunk."""
+    upload = get_object_or_404(ChunkedUpload, token=token, owner=request.user)
+    if request.method == 'GET':
+        return JsonResponse(uploads.status(upload))
+    try:
+        offset = int(request.GET.get('offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Missing offset.'}, status=400)
+    try:
+        # Streams the body to disk; never loads it into memory
+        return JsonResponse(uploads.append(upload, offset, request, length))
+    except uploads.UploadError as e:
+        return JsonResponse({'error': str(e), **uploads.status(upload)}, status=e.status)
+
+
+# ==============================================================================
+# 7. KIOSK (batch hand-in sync, see core/kiosk.py)
+# ==============================================================================
+
+@login_required
+@require_POST
+@throttle('kiosk_sync', key='user', api=True)
+def kiosk_sync_handins(request):
+    """The desk kiosk's queued hand-ins: {"handins": [...]} -> a result and reference code per entry."""
+    if request.user.role not in ['STAFF', 'ADMIN']:
+        return JsonResponse({'error': 'Staff only.'}, status=403)
+    try:
+        entries = kiosk.parse(request.body)
+    except kiosk.SyncError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    results = kiosk.sync(entries)
+    return JsonResponse({'results': results, 'created': sum(r['status'] == 'created' for r in results)})
+
+
+# ==============================================================================
+# 8. METRICS (Prometheus scrape target, see core/metrics.py)
+# ==============================================================================
+
+@require_GET
+def metrics_view(request):
+    """Request, database, cache and domain metrics in the Prometheus text format."""
+    if settings.METRICS_TOKEN:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}')
+    else:
+        allowed = getattr(request.user, 'role', None) in ['STAFF', 'ADMIN']
+    if not allowed:
+        return HttpResponse("Forbidden.", status=403, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,76 @@
+"""
+Gunicorn settings, picked up automatically from the working directory:
+
+    gunicorn
+
+Worker and thread counts follow the CPUs this container may use (its
+affinity mask and its cgroup CPU quota, whichever is smaller) unless
+WEB_CONCURRENCY / GUNICORN_THREADS are set. Size DB_POOL_MAX_SIZE (or the
+pgbouncer pool) to match: one connection per thread per worker.
+
+This is the `web` process of the Procfile. The `worker` process next to it
+(`manage.py dispatch_events`) delivers the outbox events: audit entries,
+duplicate and photo indexing, dashboard refreshes and staff imports.
+"""
+import math
+import os
+
+
+def _cgroup_cpus():
+    """The container's CPU quota, or None when it has none."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as fh:  # cgroup v2: "<quota> <period>" or "max <period>"
+            quota, period = fh.read().split()[:2]
+        if quota == 'max':
+            return None
+        quota, period = int(quota), int(period)
+    except (OSError, ValueError):
+        try:  # cgroup v1
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as fh:
+                quota = int(fh.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as fh:
+                period = int(fh.read())
+        except (OSError, ValueError):
+            return None
+        if quota <= 0:
+            return None
+    return max(1, math.ceil(quota / period))
+
+
+try:
+    cpus = len(os.sched_getaffinity(0))
+except AttributeError:  # macOS
+    cpus = os.cpu_count() or 1
+cpus = min(cpus, _cgroup_cpus() or cpus)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+wsgi_app = 'config.wsgi:application'
+
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', cpus + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Load Django once in the master so workers fork with it already imported
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to cap slow memory growth
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+
+
+def on_starting(server):
+    # Refuse to boot a misconfigured production release
+    import django
+    from django.core.management import call_command
+    from django.db import connections
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+    call_command('check', deploy=True, fail_level='ERROR')
+    # Don't let forked workers inherit the master's DB sockets
+    connections.close_all()
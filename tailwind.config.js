@@ -0,0 +1,12 @@
+/** Compiled by build.sh with the Tailwind standalone CLI (no Node needed).
+ *  Only classes that appear in these files end up in static/css/app.css. */
+module.exports = {
+  content: [
+    './templates/**/*.html',
+    './core/**/*.py',
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+}